@@ -1,7 +1,7 @@
 """Application configuration utilities."""
 
 from functools import lru_cache
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -24,25 +24,303 @@ class Settings(BaseSettings):
         default=8000,
         description="Port number for the FastAPI server",
     )
+    max_upload_bytes: int = Field(
+        default=50 * 1024 * 1024,
+        description="Largest accepted request body; 0 disables the limit",
+        ge=0,
+    )
+    enable_metrics: bool = Field(
+        default=True,
+        description="Serve Prometheus metrics on /metrics and add Server-Timing headers",
+    )
+    enable_ollama: bool = Field(
+        default=True,
+        description="Serve the /ollama routes and start the Ollama client",
+    )
+    enable_yolo: bool = Field(
+        default=True,
+        description="Serve the /yolo routes and load YOLO services (imports torch, cv2)",
+    )
+    enable_jobs: bool = Field(
+        default=True,
+        description="Serve the asynchronous /jobs API for the enabled services",
+    )
+    jobs_db_path: Optional[str] = Field(
+        default=None,
+        description="sqlite file for job status and results; unset keeps them in memory",
+    )
+    jobs_ttl_seconds: float = Field(
+        default=3600.0,
+        description="How long a finished job and its result can be fetched",
+        gt=0.0,
+    )
+    jobs_concurrency: int = Field(
+        default=4,
+        description="Jobs run at once; each still goes through YOLO batching or admission",
+        ge=1,
+    )
+    jobs_max_queue: int = Field(
+        default=256,
+        description="Jobs allowed to wait before submissions return 429",
+        ge=0,
+    )
+    jobs_max_queue_bytes: int = Field(
+        default=256 * 1024 * 1024,
+        description="Uploaded payload bytes allowed to wait before submissions return 429",
+        ge=0,
+    )
     ollama_host: str = Field(
         default="127.0.0.1",
         description="Hostname where the Ollama daemon listens",
     )
     ollama_port: int = Field(default=11434, description="Port for the Ollama API")
+    ollama_backends: Optional[str] = Field(
+        default=None,
+        description="Comma-separated Ollama base URLs; overrides ollama_host/ollama_port",
+    )
+    ollama_health_interval_seconds: float = Field(
+        default=10.0,
+        description="Seconds between health probes when several Ollama backends are set",
+        gt=0.0,
+    )
+    ollama_hedge_delay_ms: Optional[float] = Field(
+        default=None,
+        description="Send deterministic requests to a second backend after this delay",
+        ge=0.0,
+    )
     ollama_model: str = Field(
         default="phi3",
         description="Default Ollama model when none is supplied",
     )
+    ollama_cache_max_entries: int = Field(
+        default=1024,
+        description="Cached deterministic Ollama responses; 0 disables the cache",
+        ge=0,
+    )
+    ollama_cache_max_bytes: int = Field(
+        default=32 * 1024 * 1024,
+        description="Approximate memory budget for cached Ollama responses",
+        ge=0,
+    )
+    ollama_cache_ttl_seconds: float = Field(
+        default=600.0,
+        description="Lifetime of a cached Ollama response",
+        gt=0.0,
+    )
+    ollama_request_timeout_seconds: float = Field(
+        default=120.0,
+        description="Upstream timeout and default deadline for Ollama requests",
+        gt=0.0,
+    )
+    ollama_max_concurrency_per_model: int = Field(
+        default=2,
+        description="Requests forwarded to Ollama at once for each model",
+        ge=1,
+    )
+    ollama_max_queue_per_model: int = Field(
+        default=32,
+        description="Requests allowed to wait per model before returning 429",
+        ge=0,
+    )
+    ollama_keep_alive: str = Field(
+        default="5m",
+        description="How long Ollama keeps a session's model loaded between turns",
+    )
+    ollama_session_idle_seconds: float = Field(
+        default=1800.0,
+        description="Chat sessions are dropped after this long without a turn",
+        gt=0.0,
+    )
+    ollama_session_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        description="Approximate memory cap for all chat sessions",
+        ge=0,
+    )
+    ollama_embed_model: str = Field(
+        default="nomic-embed-text",
+        description="Embedding model used by /ollama/embed and the vector index",
+    )
+    ollama_embed_batch_size: int = Field(
+        default=32,
+        description="Inputs sent to Ollama's /api/embed per call",
+        ge=1,
+    )
+    ollama_embed_cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        description="Memory budget for cached embeddings; 0 disables the cache",
+        ge=0,
+    )
+    ollama_embed_index_path: Optional[str] = Field(
+        default=None,
+        description="Optional .npy file that memory-maps and persists the vector index",
+    )
+    ollama_embed_ivf_threshold: int = Field(
+        default=50_000,
+        description="Index size at which search switches from exact to IVF; 0 keeps it exact",
+        ge=0,
+    )
+    ollama_embed_ivf_probes: int = Field(
+        default=8,
+        description="IVF lists scanned per search; more is slower and more accurate",
+        ge=1,
+    )
     yolo_model: str = Field(
         default="yolov8n.pt",
         description="Ultralytics YOLO weights identifier to load at startup",
     )
+    yolo_models: Optional[str] = Field(
+        default=None,
+        description=(
+            "Comma-separated models clients may request besides yolo_model; unset allows "
+            "only yolo_model, and '*' allows any name the backend can load"
+        ),
+    )
+    yolo_models_max_bytes: int = Field(
+        default=1024 * 1024 * 1024,
+        description="Weight memory budget before least recently used models are unloaded",
+        ge=0,
+    )
     yolo_confidence: float = Field(
         default=0.35,
         description="Default confidence threshold for YOLO detections",
         ge=0.0,
         le=1.0,
     )
+    yolo_backend: Literal["ultralytics", "onnxruntime", "openvino"] = Field(
+        default="ultralytics",
+        description="YOLO inference backend; onnxruntime/openvino run an ONNX export on CPU",
+    )
+    yolo_imgsz: int = Field(
+        default=640,
+        description="Model input size; ONNX backends letterbox to this square",
+        ge=32,
+    )
+    yolo_reduced_decode: bool = Field(
+        default=True,
+        description="Decode JPEGs far larger than yolo_imgsz at 1/2, 1/4 or 1/8 scale",
+    )
+    yolo_onnx_intra_op_threads: int = Field(
+        default=0,
+        description="ONNX Runtime threads used inside one operator; 0 lets it decide",
+        ge=0,
+    )
+    yolo_onnx_inter_op_threads: int = Field(
+        default=0,
+        description="ONNX Runtime threads running independent operators; 0 lets it decide",
+        ge=0,
+    )
+    yolo_onnx_quantize: bool = Field(
+        default=False,
+        description="Run an INT8 dynamically quantized copy of the ONNX model",
+    )
+    yolo_inference_address: Optional[str] = Field(
+        default=None,
+        description=(
+            "Unix socket of a shared inference process (python -m app.services.yolo_remote); "
+            "when set, HTTP workers send decoded frames there instead of loading models"
+        ),
+    )
+    yolo_inference_authkey: Optional[str] = Field(
+        default=None,
+        description=(
+            "Secret the HTTP workers and the shared inference process authenticate "
+            "each other with; required when yolo_inference_address is set"
+        ),
+    )
+    yolo_remote_timeout_seconds: float = Field(
+        default=60.0,
+        description=(
+            "Longest an HTTP worker waits for the shared inference process to answer "
+            "one batch; requests are given up earlier when their callers leave"
+        ),
+        gt=0,
+    )
+    yolo_remote_slots: int = Field(
+        default=8,
+        description="Shared-memory frame slots per HTTP worker in remote inference mode",
+        ge=1,
+    )
+    yolo_remote_slot_bytes: int = Field(
+        default=8 * 1024 * 1024,
+        description="Size of one frame slot; larger frames are sent over the socket",
+        ge=1024,
+    )
+    yolo_workers: int = Field(
+        default=1,
+        description=(
+            "Number of worker threads running YOLO inference (in remote mode, "
+            "batches each HTTP worker keeps in flight)"
+        ),
+        ge=1,
+    )
+    yolo_queue_size: int = Field(
+        default=8,
+        description="Maximum YOLO jobs waiting for a worker before requests are rejected",
+        ge=0,
+    )
+    yolo_max_batch_size: int = Field(
+        default=8,
+        description="Maximum images coalesced into one YOLO predict call",
+        ge=1,
+    )
+    yolo_max_batch_wait_ms: float = Field(
+        default=5.0,
+        description="Longest time to hold a request while a YOLO batch fills up",
+        ge=0.0,
+    )
+    yolo_archive_max_member_bytes: int = Field(
+        default=32 * 1024 * 1024,
+        description="Largest uncompressed image accepted from a zip/tar in /yolo/detect/batch",
+        ge=1,
+    )
+    yolo_archive_max_total_bytes: int = Field(
+        default=512 * 1024 * 1024,
+        description="Most uncompressed bytes read from all archives of one batch request",
+        ge=1,
+    )
+    yolo_tile_size: int = Field(
+        default=640,
+        description="Edge of the square tiles cut in tiled /yolo/detect mode",
+        ge=64,
+    )
+    yolo_tile_overlap: float = Field(
+        default=0.2,
+        description="Fraction of a tile shared with its neighbour in tiled mode",
+        ge=0.0,
+        lt=1.0,
+    )
+    yolo_tile_merge_threshold: float = Field(
+        default=0.5,
+        description="Overlap (intersection over smaller box) at which tile detections merge",
+        gt=0.0,
+        le=1.0,
+    )
+    yolo_video_root: Optional[str] = Field(
+        default=None,
+        description="Directory /yolo/video may read local paths from; unset disables paths",
+    )
+    yolo_cache_max_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        description="Memory budget for cached YOLO detections; 0 disables the cache",
+        ge=0,
+    )
+    yolo_cache_path: Optional[str] = Field(
+        default=None,
+        description="Optional sqlite file that persists cached detections across restarts",
+    )
+    yolo_cache_disk_max_entries: int = Field(
+        default=100_000,
+        description="Row limit for the on-disk detection cache",
+        ge=1,
+    )
+    warmup_on_startup: bool = Field(
+        default=False,
+        description="Load models and run warm-up inference before reporting ready",
+    )
+    yolo_warmup_sizes: str = Field(
+        default="640x480",
+        description="Comma-separated WIDTHxHEIGHT input sizes used for YOLO warm-up",
+    )
     ngrok_authtoken: Optional[str] = Field(
         default=None,
         description="Optional ngrok auth token used by helper scripts",
@@ -54,6 +332,74 @@ class Settings(BaseSettings):
 
         return f"http://{self.ollama_host}:{self.ollama_port}"
 
+    @property
+    def ollama_backend_urls(self) -> List[str]:
+        """All configured Ollama endpoints, falling back to ``ollama_base_url``."""
+
+        if self.ollama_backends:
+            urls = [url.strip() for url in self.ollama_backends.split(",") if url.strip()]
+            if urls:
+                return urls
+        return [self.ollama_base_url]
+
+    @property
+    def yolo_model_allowlist(self) -> Optional[List[str]]:
+        """``yolo_model`` plus the parsed ``yolo_models``; ``None`` only for ``"*"``."""
+
+        if self.yolo_models is not None and self.yolo_models.strip() == "*":
+            return None
+        extra = [name.strip() for name in (self.yolo_models or "").split(",") if name.strip()]
+        return [self.yolo_model, *(name for name in extra if name != self.yolo_model)]
+
+    @property
+    def yolo_backend_options(self) -> Dict[str, Any]:
+        """Constructor options for the configured ``yolo_backend``."""
+
+        if self.yolo_backend == "ultralytics":
+            return {}
+        return {
+            "imgsz": self.yolo_imgsz,
+            "intra_op_threads": self.yolo_onnx_intra_op_threads,
+            "inter_op_threads": self.yolo_onnx_inter_op_threads,
+            "quantize": self.yolo_onnx_quantize,
+        }
+
+    @property
+    def yolo_cache_namespace(self) -> str:
+        """The settings besides model and image that a cached detection depends on."""
+
+        parts = [self.yolo_backend, f"imgsz={self.yolo_imgsz}"]
+        if self.yolo_reduced_decode:
+            parts.append("reduced")
+        if self.yolo_backend != "ultralytics" and self.yolo_onnx_quantize:
+            parts.append("int8")
+        return ",".join(parts)
+
+    @property
+    def yolo_remote_options(self) -> Dict[str, Any]:
+        """Constructor options for the ``remote`` backend used by HTTP workers."""
+
+        return {
+            "address": self.yolo_inference_address,
+            "authkey": self.yolo_inference_authkey,
+            "slots": self.yolo_remote_slots,
+            "slot_bytes": self.yolo_remote_slot_bytes,
+            "timeout": self.yolo_remote_timeout_seconds,
+        }
+
+    @property
+    def yolo_warmup_shapes(self) -> List[Tuple[int, int]]:
+        """Parsed ``yolo_warmup_sizes`` as ``(height, width)`` pairs."""
+
+        shapes: List[Tuple[int, int]] = []
+        for size in self.yolo_warmup_sizes.split(","):
+            size = size.strip().lower()
+            if not size:
+                continue
+            width, _, height = size.partition("x")
+            shapes.append((int(height or width), int(width)))
+        return shapes
+
 
 @lru_cache(maxsize=1)
 def get_settings() -> Settings:
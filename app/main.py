@@ -1,55 +1,255 @@
-﻿" FastAPI application exposing Ollama and YOLO services.
+"""FastAPI application exposing Ollama and YOLO services.
+
+Each feature can be switched off in settings; its router and services (and
+their heavy dependencies) are then never imported.
+"""
 
 from __future__ import annotations
 
+import asyncio
 from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from typing import Any, AsyncIterator, Dict
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.config import Settings, get_settings
-from app.routers import ollama, yolo
-from app.services.ollama_client import OllamaClient
-from app.services.yolo_runner import YoloRunner
+from app.services.uploads import MaxBodySizeMiddleware
+from app.services.warmup import WarmupReport, warm_up
+
+
+def _start_ollama(app: FastAPI, settings: Settings) -> None:
+    from app.services.admission import AdmissionController
+    from app.services.chat_sessions import SessionStore
+    from app.services.embeddings import EmbeddingCache, Embedder, VectorIndex
+    from app.services.ollama_cache import ResponseCache
+    from app.services.ollama_client import OllamaClient
+
+    ollama_cache = (
+        ResponseCache(
+            max_entries=settings.ollama_cache_max_entries,
+            max_bytes=settings.ollama_cache_max_bytes,
+            ttl_seconds=settings.ollama_cache_ttl_seconds,
+        )
+        if settings.ollama_cache_max_entries
+        else None
+    )
+    app.state.ollama_client = OllamaClient(
+        settings.ollama_backend_urls,
+        timeout=settings.ollama_request_timeout_seconds,
+        cache=ollama_cache,
+        health_interval=settings.ollama_health_interval_seconds,
+        hedge_delay=(
+            settings.ollama_hedge_delay_ms / 1000.0
+            if settings.ollama_hedge_delay_ms is not None
+            else None
+        ),
+        known_models=(settings.ollama_model, settings.ollama_embed_model),
+    )
+    app.state.ollama_client.start()
+    app.state.admission = AdmissionController(
+        max_concurrency=settings.ollama_max_concurrency_per_model,
+        max_queue=settings.ollama_max_queue_per_model,
+    )
+    app.state.chat_sessions = SessionStore(
+        idle_seconds=settings.ollama_session_idle_seconds,
+        max_bytes=settings.ollama_session_max_bytes,
+    )
+    app.state.embedder = Embedder(
+        app.state.ollama_client,
+        cache=(
+            EmbeddingCache(settings.ollama_embed_cache_max_bytes)
+            if settings.ollama_embed_cache_max_bytes
+            else None
+        ),
+        batch_size=settings.ollama_embed_batch_size,
+        keep_alive=settings.ollama_keep_alive,
+    )
+    app.state.vector_index = VectorIndex(
+        path=settings.ollama_embed_index_path,
+        ivf_threshold=settings.ollama_embed_ivf_threshold,
+        ivf_probes=settings.ollama_embed_ivf_probes,
+    )
+
+
+async def _stop_ollama(app: FastAPI) -> None:
+    app.state.vector_index.close()
+    await app.state.ollama_client.aclose()
+
+
+def _start_yolo(app: FastAPI, settings: Settings) -> None:
+    from app.services.detection_cache import DetectionCache
+    from app.services.inference_pool import InferencePool
+    from app.services.yolo_registry import YoloRegistry
+
+    # With a shared inference process the weights are loaded there, once.
+    remote = settings.yolo_inference_address is not None
+    app.state.inference_pool = InferencePool(
+        settings.yolo_workers, max_queue=settings.yolo_queue_size
+    )
+    app.state.yolo_registry = YoloRegistry(
+        app.state.inference_pool,
+        default_model=settings.yolo_model,
+        confidence=settings.yolo_confidence,
+        backend="remote" if remote else settings.yolo_backend,
+        backend_options=settings.yolo_remote_options if remote else settings.yolo_backend_options,
+        decode_size=settings.yolo_imgsz if settings.yolo_reduced_decode else None,
+        max_bytes=settings.yolo_models_max_bytes,
+        allowed=settings.yolo_model_allowlist,
+        max_batch_size=settings.yolo_max_batch_size,
+        max_wait_ms=settings.yolo_max_batch_wait_ms,
+    )
+    app.state.detection_cache = (
+        DetectionCache(
+            settings.yolo_cache_max_bytes,
+            namespace=settings.yolo_cache_namespace,
+            disk_path=settings.yolo_cache_path,
+            disk_max_entries=settings.yolo_cache_disk_max_entries,
+        )
+        if settings.yolo_cache_max_bytes
+        else None
+    )
+
+
+async def _stop_yolo(app: FastAPI) -> None:
+    await app.state.yolo_registry.aclose()
+    app.state.inference_pool.shutdown()
+    if app.state.detection_cache is not None:
+        app.state.detection_cache.close()
+    if app.state.settings.yolo_inference_address is not None:
+        from app.services.yolo_remote import close_clients
+
+        close_clients()
+
+
+def _start_jobs(app: FastAPI, settings: Settings) -> None:
+    from app.services.jobs import JobScheduler, JobStore
+
+    app.state.jobs = JobScheduler(
+        JobStore(settings.jobs_db_path, ttl_seconds=settings.jobs_ttl_seconds),
+        concurrency=settings.jobs_concurrency,
+        max_queue=settings.jobs_max_queue,
+        max_queue_bytes=settings.jobs_max_queue_bytes,
+    )
+    if settings.enable_yolo:
+        from app.services.yolo_jobs import yolo_detect_handler
+
+        app.state.jobs.register("yolo.detect", yolo_detect_handler(app.state.yolo_registry))
+    if settings.enable_ollama:
+        from app.services.ollama_jobs import ollama_handler
+
+        for kind in ("ollama.generate", "ollama.chat"):
+            app.state.jobs.register(
+                kind, ollama_handler(app.state.ollama_client, app.state.admission, kind)
+            )
+    app.state.jobs.start()
+
+
+async def _stop_jobs(app: FastAPI) -> None:
+    await app.state.jobs.stop()
+    app.state.jobs.store.close()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
-    settings = get_settings()
-    app.state.ollama_client = OllamaClient(settings.ollama_base_url)
-    app.state.yolo_runner = YoloRunner(
-        settings.yolo_model, confidence=settings.yolo_confidence
-    )
+    settings: Settings = app.state.settings
+    if settings.enable_ollama:
+        _start_ollama(app, settings)
+    if settings.enable_yolo:
+        _start_yolo(app, settings)
+    if settings.enable_jobs:
+        _start_jobs(app, settings)
+
+    app.state.warmup = WarmupReport()
+    warmup_task = None
+    if settings.warmup_on_startup:
+        # Serve /hello immediately; /ready turns green once warm-up finishes.
+        warmup_task = asyncio.create_task(
+            warm_up(
+                app.state.warmup,
+                registry=getattr(app.state, "yolo_registry", None),
+                shapes=settings.yolo_warmup_shapes,
+                ollama=getattr(app.state, "ollama_client", None),
+                ollama_model=settings.ollama_model,
+                keep_alive=settings.ollama_keep_alive,
+            )
+        )
+    else:
+        app.state.warmup.ready = True
     try:
         yield
     finally:
-        await app.state.ollama_client.aclose()
-        app.state.yolo_runner.close()
+        if warmup_task is not None:
+            warmup_task.cancel()
+        if settings.enable_jobs:
+            await _stop_jobs(app)
+        if settings.enable_yolo:
+            await _stop_yolo(app)
+        if settings.enable_ollama:
+            await _stop_ollama(app)
 
 
 def create_app(settings: Settings | None = None) -> FastAPI:
     settings = settings or get_settings()
-    app = FastAPI(title=Colab Ollama + YOLO, lifespan=lifespan)
+    app = FastAPI(title="Colab Ollama + YOLO", lifespan=lifespan)
+    app.state.settings = settings
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(MaxBodySizeMiddleware, max_bytes=settings.max_upload_bytes)
+    if settings.enable_metrics:
+        from app.services.metrics import MetricsMiddleware
+
+        # Added last so it is outermost and also times rejected uploads.
+        app.add_middleware(MetricsMiddleware)
+
+    @app.get("/hello")
+    async def hello_world() -> dict[str, str]:
+        """Simple endpoint for smoke tests."""
+
+        return {"message": "hello world"}
+
+    @app.get("/ready", responses={503: {"description": "Warm-up still running"}})
+    async def ready(request: Request) -> JSONResponse:
+        """Readiness probe: 200 only after model warm-up has finished."""
+
+        report: WarmupReport | None = getattr(request.app.state, "warmup", None)
+        body: Dict[str, Any] = report.as_dict() if report else {"ready": False, "steps": {}}
+        return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+    if settings.enable_metrics:
+
+        @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+        async def metrics(request: Request) -> PlainTextResponse:
+            """Prometheus scrape endpoint."""
+
+            from app.services.metrics import REGISTRY, state_gauges
+
+            return PlainTextResponse(
+                REGISTRY.render(state_gauges(request.app.state)),
+                media_type="text/plain; version=0.0.4; charset=utf-8",
+            )
 
- app.add_middleware(
- CORSMiddleware,
- allow_origins=[*],
- allow_credentials=True,
- allow_methods=[*],
- allow_headers=[*],
- )
+    if settings.enable_ollama:
+        from app.routers import ollama
 
- @app.get(/hello)
- async def hello_world() -> dict[str, str]:
- Simple endpoint for smoke tests.
+        app.include_router(ollama.router)
+    if settings.enable_yolo:
+        from app.routers import yolo
 
-        return {message: hello world}
+        app.include_router(yolo.router)
+    if settings.enable_jobs:
+        from app.routers import jobs
 
- app.include_router(ollama.router)
- app.include_router(yolo.router)
+        app.include_router(jobs.router)
 
- return app
+    return app
 
 
 app = create_app()
@@ -0,0 +1,256 @@
+"""FastAPI routes for asynchronous jobs."""
+
+from __future__ import annotations
+
+from typing import Annotated, Any, AsyncIterator, Dict, Optional, Union
+
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    File,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+    status,
+)
+from fastapi.responses import Response, StreamingResponse
+
+from app.config import Settings, get_settings
+from app.schemas.jobs import JobRequest, JobResponse
+from app.schemas.ollama import ErrorResponse
+from app.services.jobs import (
+    IdempotencyConflictError,
+    JobQueueFullError,
+    JobRecord,
+    JobScheduler,
+    UnknownJobKindError,
+    fingerprint,
+)
+from app.services.responses import FastJSONResponse, dumps
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+# Longest a GET may be held open waiting for a job to finish.
+MAX_WAIT_SECONDS = 60.0
+# Comment lines sent on an idle event stream so proxies keep it open.
+KEEPALIVE_SECONDS = 15.0
+
+
+async def get_jobs(request: Request) -> JobScheduler:
+    jobs: JobScheduler | None = getattr(request.app.state, "jobs", None)
+    if jobs is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Job scheduler is not initialized.",
+        )
+    return jobs
+
+
+SettingsDep = Annotated[Settings, Depends(get_settings)]
+JobsDep = Annotated[JobScheduler, Depends(get_jobs)]
+IdempotencyKey = Annotated[
+    Optional[str],
+    Header(
+        alias="Idempotency-Key",
+        max_length=256,
+        description="Resubmitting with the same key returns the existing job.",
+    ),
+]
+
+SUBMIT_RESPONSES: Dict[Union[int, str], Dict[str, Any]] = {
+    200: {"model": JobResponse, "description": "Existing job for this idempotency key"},
+    400: {"model": ErrorResponse},
+    409: {"model": ErrorResponse},
+    429: {"model": ErrorResponse},
+}
+
+
+def job_response(record: JobRecord, status_code: int = 200) -> Response:
+    return FastJSONResponse(record.as_dict(), status_code=status_code)
+
+
+def found(record: Optional[JobRecord]) -> JobRecord:
+    if record is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job not found or expired."
+        )
+    return record
+
+
+async def submit(
+    jobs: JobScheduler,
+    kind: str,
+    params: Dict[str, Any],
+    *,
+    priority: int,
+    idempotency_key: Optional[str],
+    payload: Any = None,
+    client: Optional[str] = None,
+    digest: str = "",
+) -> Response:
+    """Queue a job: 202 for a new one, 200 for an idempotent replay."""
+
+    try:
+        record, created = await jobs.submit(
+            kind,
+            params,
+            priority=priority,
+            payload=payload,
+            client=client,
+            idempotency_key=idempotency_key,
+            fingerprint=fingerprint(kind, params, digest),
+        )
+    except UnknownJobKindError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    except IdempotencyConflictError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+    except JobQueueFullError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(exc),
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+    response = job_response(record, status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK)
+    response.headers["Location"] = f"{router.prefix}/{record.id}"
+    if not created:
+        response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+@router.post(
+    "",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses=SUBMIT_RESPONSES,
+)
+async def submit_job(
+    payload: Annotated[JobRequest, Body()],
+    request: Request,
+    jobs: JobsDep,
+    settings: SettingsDep,
+    idempotency_key: IdempotencyKey = None,
+) -> Response:
+    """Queue an Ollama generation or chat and return its id immediately.
+
+    Poll ``GET /jobs/{id}`` (optionally with ``wait``) or follow
+    ``GET /jobs/{id}/events`` for completion. The job is admitted under the
+    submitter's fairness key, as the synchronous route would be.
+    """
+
+    from app.routers.ollama import client_identity
+
+    params = payload.request.model_dump(exclude={"stream"})
+    params["model"] = params["model"] or settings.ollama_model
+    return await submit(
+        jobs,
+        payload.kind,
+        params,
+        priority=payload.priority,
+        idempotency_key=idempotency_key,
+        client=client_identity(request),
+    )
+
+
+@router.post(
+    "/detect",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses=SUBMIT_RESPONSES,
+)
+async def submit_detect_job(
+    file: Annotated[UploadFile, File()],
+    jobs: JobsDep,
+    settings: SettingsDep,
+    idempotency_key: IdempotencyKey = None,
+    confidence: Annotated[Optional[float], Query(ge=0.0, le=1.0)] = None,
+    model: Optional[str] = None,
+    priority: Annotated[int, Query(ge=0, le=9)] = 5,
+) -> Response:
+    """Queue a YOLO detection of one image, like ``/yolo/detect``."""
+
+    # Imported here so serving only Ollama jobs never loads the YOLO services.
+    from app.services.detection_cache import image_digest
+
+    image = await file.read()
+    params = {
+        "model": model,
+        "confidence": confidence if confidence is not None else settings.yolo_confidence,
+    }
+    return await submit(
+        jobs,
+        "yolo.detect",
+        params,
+        priority=priority,
+        idempotency_key=idempotency_key,
+        payload=image,
+        digest=image_digest(image),
+    )
+
+
+@router.get("")
+async def job_stats(jobs: JobsDep) -> Dict[str, Any]:
+    """Report enabled job kinds, queue depth and stored jobs by status."""
+
+    return await jobs.stats()
+
+
+@router.get("/{job_id}", response_model=JobResponse, responses={404: {"model": ErrorResponse}})
+async def get_job(
+    job_id: str,
+    jobs: JobsDep,
+    wait: Annotated[float, Query(ge=0.0, le=MAX_WAIT_SECONDS)] = 0.0,
+) -> Response:
+    """Return a job's status and result.
+
+    With ``wait`` (seconds) the request is held until the job finishes or
+    the wait runs out, whichever is first (long polling).
+    """
+
+    record = await jobs.wait(job_id, wait) if wait else await jobs.get(job_id)
+    return job_response(found(record))
+
+
+@router.get(
+    "/{job_id}/events",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"text/event-stream": {}}},
+        404: {"model": ErrorResponse},
+    },
+)
+async def job_events(job_id: str, jobs: JobsDep) -> StreamingResponse:
+    """Server-sent ``status`` events on every change, ending once the job finishes."""
+
+    found(await jobs.get(job_id))
+
+    async def _events() -> AsyncIterator[bytes]:
+        last: Optional[str] = None
+        while True:
+            event = jobs.watch(job_id)
+            record = await jobs.get(job_id)
+            if record is None:
+                yield b"event: expired\ndata: {}\n\n"
+                return
+            if record.status != last:
+                last = record.status
+                yield b"event: status\ndata: " + dumps(record.as_dict()) + b"\n\n"
+            if record.done:
+                return
+            if not await jobs.changed(job_id, KEEPALIVE_SECONDS, event):
+                yield b": keepalive\n\n"
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete("/{job_id}", response_model=JobResponse, responses={404: {"model": ErrorResponse}})
+async def cancel_job(job_id: str, jobs: JobsDep) -> Response:
+    """Cancel a queued or running job; a finished job is returned unchanged."""
+
+    return job_response(found(await jobs.cancel(job_id)))
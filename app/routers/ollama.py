@@ -2,24 +2,59 @@
 
 from __future__ import annotations
 
-from typing import Annotated
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+)
 
+import anyio
 from fastapi import APIRouter, Depends, HTTPException, Request, status
-from httpx import HTTPError
+from fastapi.responses import Response, StreamingResponse
+from httpx import HTTPError, TimeoutException
 
 from app.config import Settings, get_settings
 from app.schemas.ollama import (
     ChatRequest,
     ChatResponse,
+    EmbedRequest,
+    EmbedResponse,
     ErrorResponse,
     GenerateRequest,
     GenerateResponse,
+    IndexRequest,
+    IndexResponse,
+    Message,
+    SearchRequest,
+    SearchResponse,
+    SessionCreateRequest,
+    SessionResponse,
+    SessionTurnRequest,
+    SessionTurnResponse,
 )
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.services.cancellation import Deadline, guard, request_deadline
+from app.services.chat_sessions import ChatSession, SessionExpiredError, SessionStore, post_turn
+from app.services.embeddings import Embedder, VectorIndex
+from app.services.metrics import CANCELLED_REQUESTS, OLLAMA_ERRORS, OLLAMA_STAGE, timed
 from app.services.ollama_client import OllamaClient
+from app.services.responses import FastJSONResponse, dumps, model_response
 
 
 router = APIRouter(prefix="/ollama", tags=["ollama"])
 
+T = TypeVar("T")
+
 
 async def get_ollama_client(request: Request) -> OllamaClient:
     client: OllamaClient | None = getattr(request.app.state, "ollama_client", None)
@@ -31,55 +66,552 @@ async def get_ollama_client(request: Request) -> OllamaClient:
     return client
 
 
+async def get_session_store(request: Request) -> SessionStore:
+    store: SessionStore | None = getattr(request.app.state, "chat_sessions", None)
+    if store is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Chat session store is not initialized.",
+        )
+    return store
+
+
+async def get_admission(request: Request) -> AdmissionController:
+    admission: AdmissionController | None = getattr(request.app.state, "admission", None)
+    if admission is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Admission control is not initialized.",
+        )
+    return admission
+
+
+async def get_embedder(request: Request) -> Embedder:
+    embedder: Embedder | None = getattr(request.app.state, "embedder", None)
+    if embedder is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Embedder is not initialized.",
+        )
+    return embedder
+
+
+async def get_vector_index(request: Request) -> VectorIndex:
+    index: VectorIndex | None = getattr(request.app.state, "vector_index", None)
+    if index is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Vector index is not initialized.",
+        )
+    return index
+
+
 SettingsDep = Annotated[Settings, Depends(get_settings)]
 ClientDep = Annotated[OllamaClient, Depends(get_ollama_client)]
+SessionStoreDep = Annotated[SessionStore, Depends(get_session_store)]
+AdmissionDep = Annotated[AdmissionController, Depends(get_admission)]
+EmbedderDep = Annotated[Embedder, Depends(get_embedder)]
+VectorIndexDep = Annotated[VectorIndex, Depends(get_vector_index)]
+
+STREAM_RESPONSES: Dict[Union[int, str], Dict[str, Any]] = {
+    200: {"content": {"application/x-ndjson": {}, "text/event-stream": {}}},
+    429: {"model": ErrorResponse},
+    502: {"model": ErrorResponse},
+    504: {"model": ErrorResponse},
+}
+OLLAMA_RESPONSES: Dict[Union[int, str], Dict[str, Any]] = {
+    429: {"model": ErrorResponse},
+    502: {"model": ErrorResponse},
+    504: {"model": ErrorResponse},
+}
+
+
+def client_identity(request: Request) -> str:
+    """Fairness key: an explicit ``X-Client-Id`` header, else the peer address."""
+
+    explicit = request.headers.get("x-client-id")
+    if explicit:
+        return explicit
+    return request.client.host if request.client else "anonymous"
+
+
+def ollama_deadline(request: Request, settings: Settings) -> Optional[Deadline]:
+    """The caller's deadline: ``X-Request-Timeout`` seconds, else the configured timeout."""
+
+    return request_deadline(request, settings.ollama_request_timeout_seconds)
+
+
+def remaining(deadline: Optional[Deadline]) -> Optional[float]:
+    return deadline.remaining() if deadline is not None else None
+
+
+def upstream_error(action: str, exc: HTTPError) -> HTTPException:
+    if isinstance(exc, TimeoutException):
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Ollama {action} timed out: {exc}",
+        )
+    return HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY,
+        detail=f"Ollama {action} failed: {exc}",
+    )
+
+
+async def acquire_slot(
+    request: Request, admission: AdmissionController, model: str, deadline: Optional[Deadline]
+) -> None:
+    label = request.app.state.ollama_client.metric_label(model)
+    try:
+        with timed(OLLAMA_STAGE, "queue", model=label):
+            await admission.acquire(model, client_identity(request), remaining(deadline))
+    except AdmissionRejected as exc:
+        OLLAMA_ERRORS.inc(model=label, reason="rejected")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(exc),
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
+
+
+@asynccontextmanager
+async def model_slot(
+    request: Request, admission: AdmissionController, model: str, deadline: Optional[Deadline]
+) -> AsyncIterator[None]:
+    await acquire_slot(request, admission, model, deadline)
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        admission.release(model, time.monotonic() - started)
+
+
+async def hold_slot(
+    admission: AdmissionController, model: str, chunks: AsyncIterator[Dict[str, Any]]
+) -> AsyncIterator[Dict[str, Any]]:
+    """Keep an already acquired slot until the stream is exhausted or closed."""
+
+    started = time.monotonic()
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        admission.release(model, time.monotonic() - started)
+
+
+async def run_in_slot(
+    request: Request,
+    admission: AdmissionController,
+    model: str,
+    deadline: Optional[Deadline],
+    call: Callable[[Optional[float]], Awaitable[T]],
+) -> T:
+    """Run ``call(timeout)`` holding a model slot, within the request deadline.
+
+    The wait for a slot and the upstream call are both cancelled if the
+    client disconnects; ``timeout`` is the deadline left once admitted.
+    """
+
+    async def _work() -> T:
+        async with model_slot(request, admission, model, deadline):
+            return await call(remaining(deadline))
+
+    return await guard(request, _work(), service="ollama", deadline=deadline)
+
+
+async def _first_chunk(chunks: AsyncIterator[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def stream_response(
+    request: Request,
+    chunks: AsyncIterator[Dict[str, Any]],
+    action: str,
+    deadline: Optional[Deadline] = None,
+) -> StreamingResponse:
+    """Forward Ollama chunks as NDJSON, or as SSE when the client accepts it.
+
+    The first chunk is awaited before responding so that upstream failures
+    still surface as a 502 instead of a truncated 200 stream. The deadline
+    bounds the wait for that first chunk; afterwards the stream runs for as
+    long as the client reads it, and is closed upstream when it leaves.
+    """
+
+    try:
+        first = await guard(request, _first_chunk(chunks), service="ollama", deadline=deadline)
+    except HTTPError as exc:
+        raise upstream_error(action, exc) from exc
+
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    def _frame(chunk: Dict[str, Any]) -> bytes:
+        line = dumps(chunk)
+        return b"data: " + line + b"\n\n" if sse else line + b"\n"
+
+    async def _body() -> AsyncIterator[bytes]:
+        finished = False
+        try:
+            if first is not None:
+                yield _frame(first)
+                try:
+                    async for chunk in chunks:
+                        yield _frame(chunk)
+                except HTTPError as exc:
+                    yield _frame({"error": f"Ollama {action} failed: {exc}", "done": True})
+            finished = True
+        finally:
+            if not finished:
+                # The client went away mid-stream.
+                CANCELLED_REQUESTS.inc(service="ollama", reason="disconnect")
+            # Closing the upstream stream stops generation and frees the
+            # slot; shielded because disconnects arrive as cancellation.
+            with anyio.CancelScope(shield=True):
+                await chunks.aclose()
+
+    return StreamingResponse(
+        _body(), media_type="text/event-stream" if sse else "application/x-ndjson"
+    )
 
 
 @router.post(
     "/generate",
     response_model=GenerateResponse,
-    responses={502: {"model": ErrorResponse}},
+    responses=STREAM_RESPONSES,
 )
 async def generate(
     payload: GenerateRequest,
+    request: Request,
     client: ClientDep,
+    admission: AdmissionDep,
     settings: SettingsDep,
-) -> GenerateResponse:
+) -> Union[GenerateResponse, Response]:
     model = payload.model or settings.ollama_model
+    deadline = ollama_deadline(request, settings)
+    if payload.stream:
+        await guard(
+            request,
+            acquire_slot(request, admission, model, deadline),
+            service="ollama",
+            deadline=deadline,
+        )
+        chunks = client.stream_generate(
+            model=model, prompt=payload.prompt, options=payload.options, timeout=remaining(deadline)
+        )
+        return await stream_response(
+            request, hold_slot(admission, model, chunks), "generate", deadline
+        )
     try:
-        response = await client.generate(
-            model=model,
-            prompt=payload.prompt,
-            options=payload.options,
+        response = await run_in_slot(
+            request,
+            admission,
+            model,
+            deadline,
+            lambda timeout: client.generate(
+                model=model,
+                prompt=payload.prompt,
+                options=payload.options,
+                timeout=timeout,
+            ),
         )
     except HTTPError as exc:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Ollama generate failed: {exc}",
-        ) from exc
-    return GenerateResponse(**response)
+        raise upstream_error("generate", exc) from exc
+    return model_response(GenerateResponse.model_validate(response))
 
 
 @router.post(
     "/chat",
     response_model=ChatResponse,
-    responses={502: {"model": ErrorResponse}},
+    responses=STREAM_RESPONSES,
 )
 async def chat(
     payload: ChatRequest,
+    request: Request,
     client: ClientDep,
+    admission: AdmissionDep,
     settings: SettingsDep,
-) -> ChatResponse:
+) -> Union[ChatResponse, Response]:
     model = payload.model or settings.ollama_model
+    messages = [message.model_dump() for message in payload.messages]
+    deadline = ollama_deadline(request, settings)
+    if payload.stream:
+        await guard(
+            request,
+            acquire_slot(request, admission, model, deadline),
+            service="ollama",
+            deadline=deadline,
+        )
+        chunks = client.stream_chat(
+            model=model, messages=messages, options=payload.options, timeout=remaining(deadline)
+        )
+        return await stream_response(request, hold_slot(admission, model, chunks), "chat", deadline)
     try:
-        response = await client.chat(
-            model=model,
-            messages=[message.model_dump() for message in payload.messages],
-            options=payload.options,
+        response = await run_in_slot(
+            request,
+            admission,
+            model,
+            deadline,
+            lambda timeout: client.chat(
+                model=model,
+                messages=messages,
+                options=payload.options,
+                timeout=timeout,
+            ),
         )
     except HTTPError as exc:
+        raise upstream_error("chat", exc) from exc
+    return model_response(ChatResponse.model_validate(response))
+
+
+@router.post("/embed", response_model=EmbedResponse, responses=OLLAMA_RESPONSES)
+async def embed(
+    payload: EmbedRequest,
+    request: Request,
+    embedder: EmbedderDep,
+    admission: AdmissionDep,
+    settings: SettingsDep,
+) -> Response:
+    """Embed one or more texts, batching uncached inputs to Ollama's /api/embed."""
+
+    model = payload.model or settings.ollama_embed_model
+    texts = [payload.input] if isinstance(payload.input, str) else payload.input
+    try:
+        vectors, cached = await run_in_slot(
+            request,
+            admission,
+            model,
+            ollama_deadline(request, settings),
+            lambda timeout: embedder.embed(
+                model, texts, truncate=payload.truncate, timeout=timeout
+            ),
+        )
+    except HTTPError as exc:
+        raise upstream_error("embed", exc) from exc
+    # The float32 matrix is written out as-is; no per-float model validation.
+    return FastJSONResponse({"model": model, "embeddings": vectors, "cached": cached})
+
+
+@router.post(
+    "/index",
+    response_model=IndexResponse,
+    responses={400: {"model": ErrorResponse}, **OLLAMA_RESPONSES},
+)
+async def index_documents(
+    payload: IndexRequest,
+    request: Request,
+    embedder: EmbedderDep,
+    index: VectorIndexDep,
+    admission: AdmissionDep,
+    settings: SettingsDep,
+) -> IndexResponse:
+    """Embed documents with the configured model and add them to the vector index."""
+
+    model = settings.ollama_embed_model
+    documents = payload.documents
+    try:
+        vectors, cached = await run_in_slot(
+            request,
+            admission,
+            model,
+            ollama_deadline(request, settings),
+            lambda timeout: embedder.embed(
+                model, [doc.text for doc in documents], timeout=timeout
+            ),
+        )
+    except HTTPError as exc:
+        raise upstream_error("embed", exc) from exc
+    try:
+        added = await asyncio.to_thread(
+            index.add,
+            [doc.id for doc in documents],
+            vectors,
+            [doc.metadata for doc in documents],
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return IndexResponse(
+        added=added, updated=len(documents) - added, cached=cached, size=len(index)
+    )
+
+
+@router.post(
+    "/search",
+    response_model=SearchResponse,
+    responses={400: {"model": ErrorResponse}, **OLLAMA_RESPONSES},
+)
+async def search(
+    payload: SearchRequest,
+    request: Request,
+    embedder: EmbedderDep,
+    index: VectorIndexDep,
+    admission: AdmissionDep,
+    settings: SettingsDep,
+) -> Response:
+    """Return the indexed documents most similar to ``query`` by cosine similarity."""
+
+    model = settings.ollama_embed_model
+    try:
+        vectors, _ = await run_in_slot(
+            request,
+            admission,
+            model,
+            ollama_deadline(request, settings),
+            lambda timeout: embedder.embed(model, [payload.query], timeout=timeout),
+        )
+    except HTTPError as exc:
+        raise upstream_error("embed", exc) from exc
+    try:
+        hits, exact = await asyncio.to_thread(index.search, vectors[0], payload.k)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return FastJSONResponse(
+        {"model": model, "hits": [hit._asdict() for hit in hits], "exact": exact}
+    )
+
+
+@router.get("/index")
+async def index_stats(embedder: EmbedderDep, index: VectorIndexDep) -> Dict[str, Any]:
+    """Report vector index size and embedding cache counters."""
+
+    cache = embedder.cache.stats() if embedder.cache is not None else {"enabled": False}
+    return {**index.stats(), "cache": cache}
+
+
+@router.get("/cache")
+async def cache_stats(client: ClientDep) -> Dict[str, Any]:
+    """Report deterministic-response cache and coalescing counters."""
+
+    if client.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **client.cache.stats()}
+
+
+@router.get("/backends")
+async def backend_stats(client: ClientDep) -> List[Dict[str, Any]]:
+    """Report health, load and loaded models for each Ollama backend."""
+
+    return client.pool.stats()
+
+
+def _session_response(session: ChatSession) -> SessionResponse:
+    return SessionResponse(
+        id=session.id,
+        model=session.model,
+        mode=session.mode,
+        system=session.system,
+        messages=[Message(**message) for message in session.messages],
+    )
+
+
+def _lookup_session(store: SessionStore, session_id: str) -> ChatSession:
+    try:
+        return store.get(session_id)
+    except SessionExpiredError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found or expired.",
+        ) from exc
+
+
+@router.post("/sessions", response_model=SessionResponse, status_code=201)
+async def create_session(
+    payload: SessionCreateRequest,
+    client: ClientDep,
+    store: SessionStoreDep,
+    settings: SettingsDep,
+) -> SessionResponse:
+    model = payload.model or settings.ollama_model
+    session = store.create(
+        model=model,
+        mode=payload.mode,
+        system=payload.system,
+        options=payload.options,
+        # Pin the session to one daemon so its KV cache can be reused.
+        backend=client.pool.choose(model).url,
+    )
+    return _session_response(session)
+
+
+@router.get("/sessions/{session_id}", response_model=SessionResponse)
+async def get_session(session_id: str, store: SessionStoreDep) -> SessionResponse:
+    return _session_response(_lookup_session(store, session_id))
+
+
+@router.delete("/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str, store: SessionStoreDep) -> None:
+    try:
+        store.delete(session_id)
+    except SessionExpiredError as exc:
         raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Ollama chat failed: {exc}",
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found or expired.",
         ) from exc
-    return ChatResponse(**response)
+
+
+@router.post(
+    "/sessions/{session_id}/turns",
+    response_model=SessionTurnResponse,
+    responses={404: {"model": ErrorResponse}, **OLLAMA_RESPONSES},
+)
+async def post_session_turn(
+    session_id: str,
+    payload: SessionTurnRequest,
+    request: Request,
+    client: ClientDep,
+    store: SessionStoreDep,
+    admission: AdmissionDep,
+    settings: SettingsDep,
+) -> Response:
+    session = _lookup_session(store, session_id)
+    try:
+        response = await run_in_slot(
+            request,
+            admission,
+            session.model,
+            ollama_deadline(request, settings),
+            lambda timeout: post_turn(
+                client,
+                store,
+                session,
+                payload.content,
+                options=payload.options,
+                keep_alive=settings.ollama_keep_alive,
+                timeout=timeout,
+            ),
+        )
+    except HTTPError as exc:
+        raise upstream_error("session turn", exc) from exc
+    stats = {
+        key: response.get(key)
+        for key in (
+            "created_at",
+            "done",
+            "eval_count",
+            "eval_duration",
+            "prompt_eval_count",
+            "total_duration",
+        )
+    }
+    return model_response(
+        SessionTurnResponse(
+            session_id=session.id,
+            message=Message(**session.messages[-1]),
+            model=response.get("model", session.model),
+            **stats,
+        )
+    )
+
+
+@router.get("/sessions")
+async def session_stats(store: SessionStoreDep) -> Dict[str, Any]:
+    """Report live session count and memory use."""
+
+    return store.stats()
+
+
+@router.get("/admission")
+async def admission_stats(admission: AdmissionDep) -> Dict[str, Any]:
+    """Report per-model in-flight counts and queue lengths."""
+
+    return admission.stats()
@@ -2,43 +2,581 @@
 
 from __future__ import annotations
 
-from typing import Annotated, Optional
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+import numpy as np
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from starlette.types import Receive, Scope, Send
 
 from app.config import Settings, get_settings
-from app.schemas.yolo import DetectionResponse
-from app.services.yolo_runner import YoloRunner
+from app.schemas.yolo import (
+    BatchDetectionItem,
+    ColumnarDetectionResponse,
+    DetectionResponse,
+    VideoFrameItem,
+)
+from app.services.cancellation import Deadline, abandon_when, guard, request_deadline
+from app.services.detection_cache import DetectionCache, image_digest
+from app.services.frame_stream import LatestFrame, StreamStats
+from app.services.inference_pool import InferencePool, QueueFullError
+from app.services.metrics import YOLO_ERRORS, YOLO_STAGE, observe_since_start, timed
+from app.services.responses import FastJSONResponse, dumps
+from app.services.uploads import upload_buffer
+from app.services.yolo_batch import iter_images, stream_detections
+from app.services.yolo_registry import ModelEntry, UnknownModelError, YoloRegistry
+from app.services.yolo_remote import RemoteInferenceError
+from app.services.yolo_runner import Detections, ImageData, YoloRunner
+from app.services.yolo_video import (
+    FrameReader,
+    SampleMode,
+    VideoOpenError,
+    VideoTracker,
+    stream_video,
+    submit_waiting,
+)
 
 router = APIRouter(prefix="/yolo", tags=["yolo"])
 
 
-async def get_yolo_runner(request) -> YoloRunner:
-    runner: YoloRunner | None = getattr(request.app.state, "yolo_runner", None)
-    if runner is None:
-        raise HTTPException(status_code=503, detail="YOLO runner not initialized.")
-    return runner
+async def get_yolo_registry(request: Request) -> YoloRegistry:
+    registry: YoloRegistry | None = getattr(request.app.state, "yolo_registry", None)
+    if registry is None:
+        raise HTTPException(status_code=503, detail="YOLO model registry not initialized.")
+    return registry
+
+
+async def get_inference_pool(request: Request) -> InferencePool:
+    pool: InferencePool | None = getattr(request.app.state, "inference_pool", None)
+    if pool is None:
+        raise HTTPException(status_code=503, detail="Inference pool not initialized.")
+    return pool
+
+
+async def get_detection_cache(request: Request) -> Optional[DetectionCache]:
+    return getattr(request.app.state, "detection_cache", None)
 
 
 SettingsDep = Annotated[Settings, Depends(get_settings)]
-RunnerDep = Annotated[YoloRunner, Depends(get_yolo_runner)]
+RegistryDep = Annotated[YoloRegistry, Depends(get_yolo_registry)]
+PoolDep = Annotated[InferencePool, Depends(get_inference_pool)]
+CacheDep = Annotated[Optional[DetectionCache], Depends(get_detection_cache)]
+
+
+def queue_full(exc: QueueFullError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(exc),
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+def ndjson_lines(item: Type[BaseModel]) -> Dict[str, Any]:
+    """Document a streamed response whose every line is one ``item``.
+
+    Lines are encoded straight from dicts (see ``app.services.responses``);
+    the model only describes them.
+    """
+
+    return {
+        "description": f"One {item.__name__} per line",
+        "content": {"application/x-ndjson": {"schema": item.model_json_schema()}},
+    }
+
+
+async def acquire_model(
+    registry: YoloRegistry, model: Optional[str], *, pin: bool = True
+) -> ModelEntry:
+    """Pin ``model`` in the registry, mapping load failures to HTTP errors.
+
+    With ``pin=False`` the model is only loaded; the caller acquires it later.
+    """
+
+    try:
+        return await (registry.acquire(model) if pin else registry.get(model))
+    except UnknownModelError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except QueueFullError as exc:
+        YOLO_ERRORS.inc(model=registry.metric_label(model), reason="queue_full")
+        raise queue_full(exc) from exc
+    except Exception as exc:  # noqa: BLE001 - missing weights, failed download, ...
+        YOLO_ERRORS.inc(model=registry.metric_label(model), reason="load")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Failed to load model '{model or registry.default_model}': {exc}",
+        ) from exc
+
+
+async def create_tracker(
+    registry: YoloRegistry, pool: InferencePool, model_name: str, track: str
+) -> VideoTracker:
+    """Load a private tracking model, mapping failures to HTTP errors."""
+
+    try:
+        return await submit_waiting(pool, VideoTracker, model_name, track)
+    except Exception as exc:  # noqa: BLE001 - ultralytics missing, weights unreadable, ...
+        YOLO_ERRORS.inc(model=registry.metric_label(model_name), reason="load")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Tracking is unavailable for '{model_name}': {exc}",
+        ) from exc
 
 
-@router.post("/detect", response_model=DetectionResponse)
+def _detect_tiled(
+    runner: YoloRunner,
+    image_bytes: ImageData,
+    confidence: float,
+    tiling: Dict[str, Any],
+    deadline: Optional[Deadline],
+) -> Detections:
+    with abandon_when(lambda: deadline is not None and deadline.expired):
+        return runner.detect_tiled(runner.decode_image(image_bytes), confidence, **tiling)
+
+
+@router.post(
+    "/detect",
+    response_model=Union[DetectionResponse, ColumnarDetectionResponse],
+)
 async def detect(
-    file: UploadFile = File(...),
+    file: Annotated[UploadFile, File()],
+    request: Request,
+    registry: RegistryDep,
+    cache: CacheDep,
+    settings: SettingsDep,
+    pool: PoolDep,
     confidence: Optional[float] = None,
-    runner: RunnerDep = Depends(),
-    settings: SettingsDep = Depends(),
-) -> DetectionResponse:
-    image_bytes = await file.read()
-    try:
-        detections = runner.detect(image_bytes, confidence=confidence)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
-
-    return DetectionResponse(
-        model=runner.model_name,
-        confidence=confidence if confidence is not None else settings.yolo_confidence,
-        detections=detections,
+    format: Literal["json", "columnar"] = "json",
+    model: Optional[str] = None,
+    tile: bool = False,
+    tile_size: Annotated[Optional[int], Query(ge=64, le=8192)] = None,
+    tile_overlap: Annotated[Optional[float], Query(ge=0.0, lt=1.0)] = None,
+    tile_merge: Literal["nms", "wbf"] = "nms",
+) -> Response:
+    """Detect objects in one image.
+
+    ``tile=true`` runs overlapping tiles plus the whole image as one batch
+    and merges the boxes, which finds small objects in very large images.
+    The upload is read in place rather than copied into a ``bytes`` object.
+    If the client disconnects, or an ``X-Request-Timeout`` passes, while the
+    image is still queued, it is dropped before inference.
+    """
+
+    threshold = confidence if confidence is not None else settings.yolo_confidence
+    model_name = model or registry.default_model
+    label = registry.metric_label(model_name)
+    observe_since_start(YOLO_STAGE, "parse", model=label)
+    tiling: Dict[str, Any] = {}
+    cache_model = model_name
+    if tile:
+        tiling = {
+            "tile_size": tile_size or settings.yolo_tile_size,
+            "overlap": tile_overlap if tile_overlap is not None else settings.yolo_tile_overlap,
+            "merge": tile_merge,
+            "merge_threshold": settings.yolo_tile_merge_threshold,
+        }
+        cache_model = f"{model_name}#tiled:{tiling['tile_size']}:{tiling['overlap']}:{tile_merge}"
+    with upload_buffer(file) as image_bytes:
+        digest = image_digest(image_bytes) if cache is not None else ""
+        detections = (
+            await cache.get(digest, cache_model, threshold) if cache is not None else None
+        )
+        if detections is None:
+            entry = await acquire_model(registry, model_name)
+            label = entry.model_name
+            deadline = request_deadline(request, None)
+            try:
+                if tile:
+                    work = pool.submit(
+                        _detect_tiled, entry.runner, image_bytes, threshold, tiling, deadline
+                    )
+                else:
+                    work = entry.scheduler.detect(image_bytes, confidence=threshold)
+                detections = await guard(request, work, service="yolo", deadline=deadline)
+            except QueueFullError as exc:
+                YOLO_ERRORS.inc(model=label, reason="queue_full")
+                raise queue_full(exc) from exc
+            except ValueError as exc:
+                YOLO_ERRORS.inc(model=label, reason="decode")
+                raise HTTPException(status_code=400, detail=str(exc)) from exc
+            except RemoteInferenceError as exc:
+                # The inference process failed the request, e.g. it could not
+                # load an allowed model.
+                YOLO_ERRORS.inc(model=label, reason="inference")
+                raise HTTPException(
+                    status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc)
+                ) from exc
+            except (ConnectionError, TimeoutError) as exc:
+                # Only raised by the remote backend when the inference process
+                # is down or did not answer in time.
+                YOLO_ERRORS.inc(model=label, reason="unavailable")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(exc)
+                ) from exc
+            finally:
+                registry.release(entry)
+            if cache is not None:
+                await cache.put(digest, cache_model, threshold, detections)
+
+    # Detections are our own output, so they are encoded directly rather
+    # than validated into the response models first.
+    with timed(YOLO_STAGE, "serialize", model=label):
+        if format == "columnar":
+            # Score and box arrays are written straight from NumPy.
+            body: Dict[str, Any] = {
+                "model": model_name,
+                "confidence": threshold,
+                "labels": detections.labels.tolist(),
+                "scores": detections.scores,
+                "boxes": detections.boxes,
+            }
+        else:
+            body = {
+                "model": model_name,
+                "confidence": threshold,
+                "detections": detections.to_dicts(),
+            }
+        return FastJSONResponse(body)
+
+
+@router.post(
+    "/detect/batch",
+    response_class=StreamingResponse,
+    responses={200: ndjson_lines(BatchDetectionItem)},
+)
+async def detect_batch(
+    files: Annotated[List[UploadFile], File()],
+    registry: RegistryDep,
+    pool: PoolDep,
+    settings: SettingsDep,
+    confidence: Optional[float] = None,
+    model: Optional[str] = None,
+) -> StreamingResponse:
+    """Detect objects in many images, streaming one NDJSON line per image.
+
+    Each part may be an image or a zip/tar archive of images.
+    """
+
+    threshold = confidence if confidence is not None else settings.yolo_confidence
+    images = iter_images(
+        ((file.filename or f"file{i}", file.file) for i, file in enumerate(files)),
+        max_member_bytes=settings.yolo_archive_max_member_bytes,
+        max_total_bytes=settings.yolo_archive_max_total_bytes,
     )
+    # Load before streaming so an unknown model is a 404, not a broken stream;
+    # the pin is taken by the body so an unstarted response cannot leak it.
+    await acquire_model(registry, model, pin=False)
+
+    async def _lines() -> AsyncIterator[bytes]:
+        entry = await registry.acquire(model)
+        index = 0
+        try:
+            async for name, outcome in stream_detections(
+                entry.runner,
+                pool,
+                images,
+                confidence=confidence,
+                chunk_size=settings.yolo_max_batch_size,
+            ):
+                failed = isinstance(outcome, Exception)
+                if isinstance(outcome, RemoteInferenceError):
+                    YOLO_ERRORS.inc(model=entry.model_name, reason="inference")
+                item = {
+                    "model": entry.model_name,
+                    "confidence": threshold,
+                    "detections": [] if failed else outcome.to_dicts(),
+                    "index": index,
+                    "filename": name,
+                    "error": str(outcome) if failed else None,
+                }
+                index += 1
+                yield dumps(item) + b"\n"
+        finally:
+            registry.release(entry)
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
+@router.websocket("/ws")
+async def detect_stream(
+    websocket: WebSocket,
+    settings: SettingsDep,
+    confidence: Optional[float] = None,
+    model: Optional[str] = None,
+) -> None:
+    """Detect objects in a stream of encoded frames sent as binary messages.
+
+    Only the newest unprocessed frame is kept: frames arriving while one is
+    being inferred replace each other, so latency stays bounded when the
+    client sends faster than the model runs.
+
+    Each result is a JSON text message shaped like ``DetectionResponse``
+    plus ``frame`` (sequence number from 0), ``latency_ms`` (receipt to
+    send), ``stats`` (the connection's dropped-frame and latency counters)
+    and ``error`` (why the frame could not be processed, else null).
+    """
+
+    registry: Optional[YoloRegistry] = getattr(websocket.app.state, "yolo_registry", None)
+    if registry is None:
+        await websocket.close(code=1013, reason="YOLO model registry not initialized.")
+        return
+    await websocket.accept()
+    try:
+        entry = await acquire_model(registry, model)
+    except HTTPException as exc:
+        await websocket.close(code=1011, reason=str(exc.detail)[:120])
+        return
+
+    threshold = confidence if confidence is not None else settings.yolo_confidence
+    frames: LatestFrame[Tuple[int, bytes, float]] = LatestFrame()
+    stats = StreamStats()
+
+    async def receive_frames() -> None:
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                data = message.get("bytes")
+                if data is None:
+                    continue  # Text messages are not frames.
+                if settings.max_upload_bytes and len(data) > settings.max_upload_bytes:
+                    await websocket.close(code=1009, reason="Frame too large.")
+                    return
+                frames.put((stats.received, data, time.perf_counter()))
+                stats.received += 1
+        finally:
+            frames.close()
+
+    def result(
+        sequence: int, received_at: float, detections: List[Dict[str, Any]], error: Optional[str]
+    ) -> str:
+        message = {
+            "model": entry.model_name,
+            "confidence": threshold,
+            "detections": detections,
+            "frame": sequence,
+            "latency_ms": (time.perf_counter() - received_at) * 1000.0,
+            "stats": stats.as_dict(frames.dropped),
+            "error": error,
+        }
+        return dumps(message).decode("utf-8")
+
+    receiver = asyncio.create_task(receive_frames())
+    sequence, received_at = -1, time.perf_counter()
+    try:
+        while (item := await frames.get()) is not None:
+            sequence, data, received_at = item
+            started = time.perf_counter()
+            error: Optional[str] = None
+            detections = []
+            try:
+                detections = (await entry.scheduler.detect(data, confidence=threshold)).to_dicts()
+            except QueueFullError:
+                stats.rejected += 1
+                continue
+            except ValueError as exc:
+                stats.errors += 1
+                error = str(exc)
+            else:
+                stats.record(time.perf_counter() - received_at, time.perf_counter() - started)
+            await websocket.send_text(result(sequence, received_at, detections, error))
+    except WebSocketDisconnect:
+        pass
+    except Exception as exc:  # noqa: BLE001 - e.g. the inference process went away
+        # Tell the client why the stream ends instead of just dropping it.
+        YOLO_ERRORS.inc(model=entry.model_name, reason="stream")
+        stats.errors += 1
+        detail = str(exc) or type(exc).__name__
+        try:
+            await websocket.send_text(result(sequence, received_at, [], detail))
+            await websocket.close(code=1011, reason=detail[:120])
+        except (WebSocketDisconnect, RuntimeError, OSError):
+            pass  # The connection is already gone.
+    finally:
+        receiver.cancel()
+        registry.release(entry)
+
+
+def resolve_video_path(path: str, root: Optional[str]) -> str:
+    """Resolve ``path`` inside ``root``; local paths are refused without a root."""
+
+    if not root:
+        raise HTTPException(status_code=403, detail="Reading local video paths is disabled.")
+    base = Path(root).resolve()
+    candidate = (base / path).resolve()
+    if not candidate.is_relative_to(base):
+        raise HTTPException(status_code=403, detail="Path is outside the video directory.")
+    if not candidate.is_file():
+        raise HTTPException(status_code=404, detail="Video not found.")
+    return str(candidate)
+
+
+def _spool_to_disk(upload: UploadFile) -> str:
+    """Copy an upload to a named temp file, which ``cv2.VideoCapture`` needs."""
+
+    suffix = Path(upload.filename or "").suffix or ".mp4"
+    upload.file.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as target:
+        shutil.copyfileobj(upload.file, target, length=1024 * 1024)
+    return target.name
+
+
+class SpooledVideoResponse(StreamingResponse):
+    """Streaming response that deletes the spooled upload however it ends.
+
+    The body generator's own ``finally`` never runs if the body is not
+    started, e.g. when the client is already gone, so the file is removed
+    here instead.
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], spooled: str, **kwargs: Any) -> None:
+        super().__init__(content, **kwargs)
+        self.spooled = spooled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            Path(self.spooled).unlink(missing_ok=True)
+
+
+@router.post(
+    "/video",
+    response_class=StreamingResponse,
+    responses={200: ndjson_lines(VideoFrameItem)},
+)
+async def detect_video(
+    registry: RegistryDep,
+    pool: PoolDep,
+    settings: SettingsDep,
+    file: Annotated[Optional[UploadFile], File()] = None,
+    path: Optional[str] = None,
+    confidence: Optional[float] = None,
+    model: Optional[str] = None,
+    stride: Annotated[int, Query(ge=1)] = 1,
+    sample: SampleMode = "stride",
+    max_frames: Annotated[Optional[int], Query(ge=1)] = None,
+    track: Optional[Literal["bytetrack", "botsort"]] = None,
+) -> StreamingResponse:
+    """Detect objects in a video, streaming one NDJSON line per sampled frame.
+
+    Send the video as ``file`` or name one under ``yolo_video_root`` with
+    ``path``. ``stride`` keeps every n-th frame (or n-th keyframe with
+    ``sample=keyframe``). ``track`` adds ByteTrack/BoT-SORT track IDs.
+    """
+
+    if (file is None) == (path is None):
+        raise HTTPException(status_code=422, detail="Provide exactly one of file or path.")
+    temporary: Optional[str] = None
+    if file is not None:
+        temporary = await asyncio.to_thread(_spool_to_disk, file)
+        source = temporary
+    else:
+        source = resolve_video_path(path, settings.yolo_video_root)
+
+    threshold = confidence if confidence is not None else settings.yolo_confidence
+    try:
+        if track is not None and registry.backend != "ultralytics":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Tracking needs the local ultralytics backend, not '{registry.backend}'.",
+            )
+        # Load before streaming so failures are HTTP errors; the body pins it.
+        model_name = (await acquire_model(registry, model, pin=False)).model_name
+        tracker = None if track is None else await create_tracker(registry, pool, model_name, track)
+    except BaseException:
+        if temporary is not None:
+            os.unlink(temporary)
+        raise
+
+    reader = FrameReader(source, stride=stride, sample=sample, max_frames=max_frames)
+
+    async def _lines() -> AsyncIterator[bytes]:
+        try:
+            async with registry.use(model) as entry:
+
+                async def infer(images: List[np.ndarray]) -> List[Detections]:
+                    if tracker is not None:
+                        return await submit_waiting(pool, tracker.track, images, threshold)
+                    return await submit_waiting(
+                        pool, entry.runner.detect_batch, images, [threshold] * len(images)
+                    )
+
+                async for frame, detections in stream_video(
+                    reader, infer, batch_size=settings.yolo_max_batch_size
+                ):
+                    rows = detections.to_dicts()
+                    for row in rows:
+                        row.setdefault("track_id", None)
+                    item = {
+                        "model": entry.model_name,
+                        "confidence": threshold,
+                        "detections": rows,
+                        "frame": frame.index,
+                        "timestamp_ms": frame.timestamp_ms,
+                        "keyframe": frame.keyframe,
+                    }
+                    yield dumps(item) + b"\n"
+        except VideoOpenError as exc:
+            yield dumps({"error": str(exc)}) + b"\n"
+        except RemoteInferenceError as exc:
+            # Headers are already sent; end the stream with an error line.
+            YOLO_ERRORS.inc(model=registry.metric_label(model), reason="inference")
+            yield dumps({"error": f"YOLO inference failed: {exc}"}) + b"\n"
+
+    if temporary is not None:
+        return SpooledVideoResponse(_lines(), temporary, media_type="application/x-ndjson")
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
+@router.get("/queue")
+async def queue_stats(pool: PoolDep, registry: RegistryDep) -> Dict[str, Any]:
+    """Report inference queue depth, wait times and batching for capacity sizing."""
+
+    batching = {name: info["batching"] for name, info in registry.stats()["models"].items()}
+    return {**pool.stats(), "batching": batching}
+
+
+@router.get("/models")
+async def model_stats(registry: RegistryDep) -> Dict[str, Any]:
+    """Report loaded models, their memory use and load/eviction counters."""
+
+    return registry.stats()
+
+
+@router.get("/cache")
+async def cache_stats(cache: CacheDep) -> Dict[str, Any]:
+    """Report detection cache hit, miss and eviction counters."""
+
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
@@ -0,0 +1,46 @@
+"""Pydantic models for the asynchronous job API."""
+
+from __future__ import annotations
+
+from typing import Annotated, Any, Literal, Optional, Union
+
+from pydantic import BaseModel, Field
+
+from app.schemas.ollama import ChatRequest, GenerateRequest
+
+JobStatus = Literal["queued", "running", "succeeded", "failed", "cancelled"]
+
+
+class _JobSubmission(BaseModel):
+    priority: int = Field(
+        default=5, ge=0, le=9, description="0 (lowest) to 9; ties run in submission order."
+    )
+
+
+class GenerateJobRequest(_JobSubmission):
+    kind: Literal["ollama.generate"]
+    request: GenerateRequest = Field(description="As for /ollama/generate; never streamed.")
+
+
+class ChatJobRequest(_JobSubmission):
+    kind: Literal["ollama.chat"]
+    request: ChatRequest = Field(description="As for /ollama/chat; never streamed.")
+
+
+JobRequest = Annotated[Union[GenerateJobRequest, ChatJobRequest], Field(discriminator="kind")]
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: JobStatus
+    priority: int
+    created_at: float = Field(description="Submission time, Unix seconds.")
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    expires_at: float = Field(description="When the job and its result are deleted.")
+    result: Optional[Any] = Field(
+        default=None,
+        description="The response the matching synchronous route would have returned.",
+    )
+    error: Optional[str] = None
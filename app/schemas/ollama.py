@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional, Union
 
 from pydantic import BaseModel, Field
 
@@ -21,6 +21,10 @@ class GenerateRequest(BaseModel):
         default=None,
         description="Advanced Ollama generation options forwarded verbatim.",
     )
+    stream: bool = Field(
+        default=False,
+        description="Stream chunks as NDJSON (or SSE when requested via Accept).",
+    )
 
 
 class GenerateResponse(BaseModel):
@@ -37,6 +41,7 @@ class ChatRequest(BaseModel):
     messages: List[Message]
     model: Optional[str] = None
     options: Optional[Dict[str, Any]] = None
+    stream: bool = False
 
 
 class ChatResponse(BaseModel):
@@ -49,5 +54,99 @@ class ChatResponse(BaseModel):
     total_duration: Optional[int] = None
 
 
+class SessionCreateRequest(BaseModel):
+    model: Optional[str] = Field(
+        default=None, description="Ollama model for the whole session."
+    )
+    system: Optional[str] = Field(default=None, description="Optional system prompt.")
+    mode: Literal["generate", "chat"] = Field(
+        default="generate",
+        description="'generate' reuses Ollama context tokens; 'chat' resends history.",
+    )
+    options: Optional[Dict[str, Any]] = Field(
+        default=None, description="Default Ollama options for every turn."
+    )
+
+
+class SessionTurnRequest(BaseModel):
+    content: str = Field(description="The user's next message.")
+    options: Optional[Dict[str, Any]] = Field(
+        default=None, description="Per-turn options merged over the session defaults."
+    )
+
+
+class SessionResponse(BaseModel):
+    id: str
+    model: str
+    mode: str
+    system: Optional[str] = None
+    messages: List[Message]
+
+
+class SessionTurnResponse(BaseModel):
+    session_id: str
+    message: Message
+    model: str
+    created_at: Optional[str] = None
+    done: Optional[bool] = None
+    eval_count: Optional[int] = None
+    eval_duration: Optional[int] = None
+    prompt_eval_count: Optional[int] = None
+    total_duration: Optional[int] = None
+
+
+class EmbedRequest(BaseModel):
+    input: Union[str, List[str]] = Field(description="Text or list of texts to embed.")
+    model: Optional[str] = Field(
+        default=None, description="Embedding model to override the configured one."
+    )
+    truncate: Optional[bool] = Field(
+        default=None,
+        description="Truncate inputs that exceed the context length instead of failing.",
+    )
+
+
+class EmbedResponse(BaseModel):
+    model: str
+    embeddings: List[List[float]]
+    cached: int = Field(description="Inputs answered from the embedding cache.")
+
+
+class IndexDocument(BaseModel):
+    id: str = Field(description="Document id; adding an existing id replaces it.")
+    text: str = Field(description="Text to embed and index.")
+    metadata: Optional[Dict[str, Any]] = Field(
+        default=None, description="Returned with search hits."
+    )
+
+
+class IndexRequest(BaseModel):
+    documents: List[IndexDocument]
+
+
+class IndexResponse(BaseModel):
+    added: int = Field(description="Documents whose id was new to the index.")
+    updated: int
+    cached: int = Field(description="Documents answered from the embedding cache.")
+    size: int
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(description="Text to find similar documents for.")
+    k: int = Field(default=10, description="Number of hits to return.", ge=1, le=1000)
+
+
+class SearchHit(BaseModel):
+    id: str
+    score: float = Field(description="Cosine similarity to the query.")
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class SearchResponse(BaseModel):
+    model: str
+    hits: List[SearchHit]
+    exact: bool = Field(description="False when the approximate IVF index answered.")
+
+
 class ErrorResponse(BaseModel):
     detail: str
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -17,7 +17,44 @@ class Detection(BaseModel):
     )
 
 
+class TrackedDetection(Detection):
+    track_id: Optional[int] = Field(
+        default=None, description="Object identity across video frames, when tracking"
+    )
+
+
 class DetectionResponse(BaseModel):
     model: str
     confidence: float
     detections: List[Detection]
+
+
+class ColumnarDetectionResponse(BaseModel):
+    """Compact detections as parallel arrays instead of per-box objects."""
+
+    model: str
+    confidence: float
+    labels: List[str] = Field(description="Label per detection")
+    scores: List[float] = Field(description="Confidence score per detection")
+    boxes: List[List[float]] = Field(
+        description="Nx4 matrix of bounding boxes [x1, y1, x2, y2]"
+    )
+
+
+class BatchDetectionItem(DetectionResponse):
+    """One NDJSON line of a streamed batch detection."""
+
+    index: int = Field(description="Position of the image within the request")
+    filename: str = Field(description="Upload name, or archive/member path")
+    error: Optional[str] = Field(
+        default=None, description="Why the image could not be processed"
+    )
+
+
+class VideoFrameItem(DetectionResponse):
+    """One NDJSON line of a streamed video detection."""
+
+    frame: int = Field(description="Index of the frame within the video")
+    timestamp_ms: float = Field(description="Presentation time of the frame")
+    keyframe: bool = Field(description="Whether the frame is a keyframe in the stream")
+    detections: List[TrackedDetection]
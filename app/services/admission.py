@@ -0,0 +1,173 @@
+"""Per-model concurrency limits with bounded, client-fair wait queues."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+# Assumed request duration until a model has completed its first request.
+_INITIAL_SERVICE_TIME = 5.0
+# Weight of the newest sample in the service-time moving average.
+_EWMA_ALPHA = 0.2
+# Idle models whose counters are kept; beyond this the least recent are dropped.
+_MAX_IDLE_MODELS = 64
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a request cannot be admitted in time."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class _ModelQueue:
+    def __init__(self) -> None:
+        self.inflight = 0
+        # Client id -> that client's waiters; served round-robin across clients.
+        self.waiters: "OrderedDict[str, Deque[asyncio.Future[None]]]" = OrderedDict()
+        self.queued = 0
+        self.service_time = _INITIAL_SERVICE_TIME
+        self.admitted = 0
+        self.rejected = 0
+
+
+class AdmissionController:
+    """Gate upstream calls so each model runs at most ``max_concurrency`` at once.
+
+    Up to ``max_queue`` further requests per model wait their turn; waiting
+    requests are released round-robin per client so one heavy caller cannot
+    starve the others. A request whose estimated queue wait plus service
+    time exceeds its deadline is rejected up front instead of timing out.
+    """
+
+    def __init__(self, *, max_concurrency: int = 2, max_queue: int = 32) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._models: "OrderedDict[str, _ModelQueue]" = OrderedDict()
+
+    @asynccontextmanager
+    async def slot(
+        self, model: str, client_id: str, deadline: Optional[float] = None
+    ) -> AsyncIterator[None]:
+        await self.acquire(model, client_id, deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(model, time.monotonic() - started)
+
+    async def acquire(self, model: str, client_id: str, deadline: Optional[float] = None) -> None:
+        """Wait for a slot; ``deadline`` is the caller's remaining time budget in seconds."""
+
+        queue = self._models.get(model)
+        if queue is None:
+            self._prune()
+            queue = self._models[model] = _ModelQueue()
+        else:
+            self._models.move_to_end(model)
+        if queue.inflight < self.max_concurrency and not queue.queued:
+            queue.inflight += 1
+            queue.admitted += 1
+            return
+        if queue.queued >= self.max_queue:
+            queue.rejected += 1
+            raise AdmissionRejected(
+                f"Too many queued requests for model '{model}'.", self._retry_after(queue)
+            )
+        estimate = self._estimated_wait(queue) + queue.service_time
+        if deadline is not None and estimate > deadline:
+            queue.rejected += 1
+            raise AdmissionRejected(
+                f"Model '{model}' cannot finish within the request deadline.",
+                self._retry_after(queue),
+            )
+
+        future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        queue.waiters.setdefault(client_id, deque()).append(future)
+        queue.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), deadline)
+        except BaseException as exc:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up; pass it on.
+                self.release(model)
+            else:
+                future.cancel()
+                self._forget(queue, client_id, future)
+            if isinstance(exc, asyncio.TimeoutError):
+                queue.rejected += 1
+                raise AdmissionRejected(
+                    f"Timed out waiting for model '{model}'.", self._retry_after(queue)
+                ) from exc
+            raise
+        queue.admitted += 1
+
+    def release(self, model: str, elapsed: Optional[float] = None) -> None:
+        queue = self._models[model]
+        if elapsed is not None:
+            queue.service_time += _EWMA_ALPHA * (elapsed - queue.service_time)
+        queue.inflight -= 1
+        while queue.waiters:
+            client_id, waiters = queue.waiters.popitem(last=False)
+            future = waiters.popleft()
+            if waiters:
+                queue.waiters[client_id] = waiters
+            queue.queued -= 1
+            if not future.done():
+                # Hand the slot straight to the waiter so nobody can jump in.
+                queue.inflight += 1
+                future.set_result(None)
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            model: {
+                "inflight": queue.inflight,
+                "queued": queue.queued,
+                "clients_waiting": len(queue.waiters),
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "avg_service_seconds": queue.service_time,
+                "admitted": queue.admitted,
+                "rejected": queue.rejected,
+            }
+            for model, queue in self._models.items()
+        }
+
+    def _prune(self) -> None:
+        """Drop the least recently used idle models past ``_MAX_IDLE_MODELS``.
+
+        Model names come from clients, so without this every distinct name
+        ever requested would keep an entry.
+        """
+
+        idle = [
+            name
+            for name, queue in self._models.items()
+            if not queue.inflight and not queue.queued
+        ]
+        for name in idle[: max(0, len(idle) - _MAX_IDLE_MODELS + 1)]:
+            del self._models[name]
+
+    def _estimated_wait(self, queue: _ModelQueue) -> float:
+        return (queue.queued + 1) / self.max_concurrency * queue.service_time
+
+    def _retry_after(self, queue: _ModelQueue) -> int:
+        return max(1, math.ceil(self._estimated_wait(queue)))
+
+    @staticmethod
+    def _forget(queue: _ModelQueue, client_id: str, future: "asyncio.Future[None]") -> None:
+        waiters = queue.waiters.get(client_id)
+        if waiters is None or future not in waiters:
+            return
+        waiters.remove(future)
+        queue.queued -= 1
+        if not waiters:
+            del queue.waiters[client_id]
@@ -0,0 +1,132 @@
+"""Request deadlines, and cancelling work whose caller has gone away.
+
+FastAPI keeps running a handler after its client disconnects, so without
+this a slow Ollama call or a queued YOLO batch would still be served to
+nobody. :func:`guard` runs the handler's work as a task and cancels it when
+the client disconnects or the request's deadline passes; cancellation
+closes upstream connections and drops queued inference.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+
+from app.services.metrics import CANCELLED_REQUESTS
+
+T = TypeVar("T")
+
+# Non-standard, but the usual status for "client closed request" in access logs.
+CLIENT_CLOSED_REQUEST = 499
+
+_abandoned = threading.local()
+
+
+class Deadline:
+    """A point in time by which a request must be answered."""
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+
+def request_deadline(request: Request, default: Optional[float]) -> Optional[Deadline]:
+    """Deadline from the ``X-Request-Timeout`` header (seconds), else ``default``."""
+
+    header = request.headers.get("x-request-timeout")
+    seconds = default
+    if header:
+        try:
+            seconds = float(header)
+        except ValueError:
+            pass
+    return Deadline(seconds) if seconds is not None and seconds > 0 else None
+
+
+async def wait_for_disconnect(request: Request) -> None:
+    """Return once the client has disconnected.
+
+    Only valid after the request body has been read, which FastAPI has done
+    before a handler with a body parameter runs.
+    """
+
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def guard(
+    request: Request,
+    work: Awaitable[T],
+    *,
+    service: str,
+    deadline: Optional[Deadline] = None,
+) -> T:
+    """Await ``work``, cancelling it if the client leaves or ``deadline`` passes.
+
+    Raises ``HTTPException`` 499 on disconnect (nobody reads it, but it is
+    what access logs and metrics show) or 504 on an expired deadline, after
+    the cancelled work has finished cleaning up.
+    """
+
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {task, watcher},
+            timeout=deadline.remaining() if deadline is not None else None,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+    if task in done:
+        return task.result()
+
+    task.cancel()
+    # Let the work release its slot / connection before we answer.
+    await asyncio.gather(task, return_exceptions=True)
+    if watcher in done:
+        CANCELLED_REQUESTS.inc(service=service, reason="disconnect")
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request.")
+    CANCELLED_REQUESTS.inc(service=service, reason="deadline")
+    raise HTTPException(
+        status_code=504,
+        detail=f"Request did not complete within its {deadline.seconds:g}s deadline.",
+    )
+
+
+@contextmanager
+def abandon_when(check: Callable[[], bool]) -> Iterator[None]:
+    """Treat blocking work on this thread as abandoned once ``check()`` is true.
+
+    A running pool job cannot be cancelled from the event loop; work that
+    waits on another process polls :func:`work_abandoned` instead.
+    """
+
+    previous = getattr(_abandoned, "check", None)
+    _abandoned.check = check
+    try:
+        yield
+    finally:
+        _abandoned.check = previous
+
+
+def work_abandoned() -> bool:
+    """Whether every caller of the current thread's work has gone away."""
+
+    check = getattr(_abandoned, "check", None)
+    return check is not None and check()
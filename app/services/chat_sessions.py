@@ -0,0 +1,190 @@
+"""Server-side chat sessions that reuse Ollama's returned context tokens."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.services.ollama_client import OllamaClient
+
+# Bookkeeping cost per session and per stored message, on top of the text.
+_SESSION_OVERHEAD = 512
+_MESSAGE_OVERHEAD = 64
+
+
+class ChatSession:
+    """One conversation kept on the server.
+
+    In ``generate`` mode only the new turn is sent upstream together with
+    the ``context`` tokens Ollama returned last time, so the daemon does not
+    re-prefill the transcript. ``chat`` mode sends the stored history to
+    ``/api/chat``. Either way the transcript is kept for ``GET`` requests.
+    """
+
+    def __init__(
+        self,
+        *,
+        model: str,
+        mode: str,
+        system: Optional[str],
+        options: Optional[Dict[str, Any]],
+        backend: Optional[str],
+    ) -> None:
+        self.id = uuid.uuid4().hex
+        self.model = model
+        self.mode = mode
+        self.system = system
+        self.options = options
+        self.backend = backend
+        self.messages: List[Dict[str, str]] = []
+        # Compact token storage: 4 bytes per token instead of a list of ints.
+        self.context = array("i")
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    @property
+    def size(self) -> int:
+        text = sum(len(m["content"]) + _MESSAGE_OVERHEAD for m in self.messages)
+        return _SESSION_OVERHEAD + text + self.context.itemsize * len(self.context)
+
+    def history(self) -> List[Dict[str, str]]:
+        prefix = [{"role": "system", "content": self.system}] if self.system else []
+        return prefix + self.messages
+
+
+class SessionExpiredError(KeyError):
+    """Raised for unknown, expired or evicted sessions."""
+
+
+class SessionStore:
+    """Sessions evicted after ``idle_seconds`` or, oldest first, over ``max_bytes``."""
+
+    def __init__(self, *, idle_seconds: float = 1800.0, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._expired = 0
+        self._evicted = 0
+
+    def create(
+        self,
+        *,
+        model: str,
+        mode: str = "generate",
+        system: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+        backend: Optional[str] = None,
+    ) -> ChatSession:
+        self._sweep()
+        session = ChatSession(
+            model=model, mode=mode, system=system, options=options, backend=backend
+        )
+        self._sessions[session.id] = session
+        self.resize(session)
+        return session
+
+    def get(self, session_id: str) -> ChatSession:
+        self._sweep()
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionExpiredError(session_id)
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> None:
+        if session_id not in self._sessions:
+            raise SessionExpiredError(session_id)
+        self._drop(session_id)
+
+    def resize(self, session: ChatSession) -> None:
+        """Re-account ``session`` after it grew and evict others if over budget."""
+
+        if session.id not in self._sessions:
+            return
+        size = session.size
+        self._bytes += size - self._sizes.get(session.id, 0)
+        self._sizes[session.id] = size
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            oldest = next(iter(self._sessions))
+            if oldest == session.id:
+                break
+            self._drop(oldest)
+            self._evicted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "idle_seconds": self.idle_seconds,
+            "expired": self._expired,
+            "evicted": self._evicted,
+        }
+
+    def _sweep(self) -> None:
+        # Sessions are ordered by last use, so expired ones sit at the front.
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_used >= cutoff:
+                break
+            self._drop(oldest.id)
+            self._expired += 1
+
+    def _drop(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+        self._bytes -= self._sizes.pop(session_id, 0)
+
+
+async def post_turn(
+    client: OllamaClient,
+    store: SessionStore,
+    session: ChatSession,
+    content: str,
+    *,
+    options: Optional[Dict[str, Any]] = None,
+    keep_alive: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Send one user turn and record the reply; returns Ollama's response."""
+
+    merged = {**(session.options or {}), **(options or {})} or None
+    async with session.lock:
+        if session.mode == "generate":
+            response = await client.generate(
+                model=session.model,
+                prompt=content,
+                options=merged,
+                # The system prompt is already part of the returned context.
+                system=session.system if not session.context else None,
+                context=session.context,
+                keep_alive=keep_alive,
+                backend=session.backend,
+                timeout=timeout,
+            )
+            reply = response.get("response", "")
+            session.context = array("i", response.get("context") or [])
+        else:
+            turn = {"role": "user", "content": content}
+            response = await client.chat(
+                model=session.model,
+                messages=session.history() + [turn],
+                options=merged,
+                keep_alive=keep_alive,
+                backend=session.backend,
+                timeout=timeout,
+            )
+            reply = (response.get("message") or {}).get("content", "")
+        session.messages.append({"role": "user", "content": content})
+        session.messages.append({"role": "assistant", "content": reply})
+        session.last_used = time.monotonic()
+    store.resize(session)
+    return response
@@ -0,0 +1,209 @@
+"""Content-addressed LRU cache for YOLO detections."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.services.yolo_runner import Detections, ImageData
+
+# Rough per-entry bookkeeping cost on top of the array payloads.
+_ENTRY_OVERHEAD = 256
+# Trim the sqlite tier to its row limit once per this many writes.
+_PRUNE_EVERY = 256
+
+
+class _Entry(NamedTuple):
+    confidence: float
+    detections: Detections
+    size: int
+
+
+def image_digest(image_bytes: ImageData) -> str:
+    """Fast content hash of the raw upload bytes."""
+
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+
+class DetectionCache:
+    """Memory LRU under a byte budget with an optional sqlite tier.
+
+    Entries are keyed by image digest and model name and remember the
+    confidence they were computed at. Because a result at a lower threshold
+    is a superset of one at a higher threshold, a lookup is answered by
+    filtering any entry whose confidence is at or below the requested one.
+    ``namespace`` is stored with every key and names whatever else changes
+    the result (backend, input size, decode mode), so a persisted tier is
+    not reused after those settings change.
+
+    The sqlite tier is read and written on a worker thread so a slow disk
+    never stalls the event loop.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        *,
+        namespace: str = "",
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 100_000,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.disk_max_entries = disk_max_entries
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Serializes the sqlite connection, which worker threads share.
+        self._db_lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._disk_writes = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if disk_path:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS detections ("
+                " digest TEXT NOT NULL, model TEXT NOT NULL, confidence REAL NOT NULL,"
+                " labels TEXT NOT NULL, scores BLOB NOT NULL, boxes BLOB NOT NULL,"
+                " accessed REAL NOT NULL, PRIMARY KEY (digest, model))"
+            )
+            self._db.commit()
+
+    async def get(self, digest: str, model: str, confidence: float) -> Optional[Detections]:
+        key = self._key(digest, model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.confidence <= confidence:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry.detections.filter(confidence)
+        stored = await asyncio.to_thread(self._disk_get, key) if self._db is not None else None
+        with self._lock:
+            if stored is not None and stored[0] <= confidence:
+                self._disk_hits += 1
+                self._insert_locked(key, stored[0], stored[1])
+                return stored[1].filter(confidence)
+            self._misses += 1
+            return None
+
+    async def put(self, digest: str, model: str, confidence: float, detections: Detections) -> None:
+        key = self._key(digest, model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.confidence <= confidence:
+                # The cached superset already answers this threshold.
+                return
+            self._insert_locked(key, confidence, detections)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_put, key, confidence, detections)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "disk": self._db is not None,
+            }
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _key(self, digest: str, model: str) -> Tuple[str, str]:
+        return digest, f"{self.namespace}/{model}" if self.namespace else model
+
+    def _insert_locked(self, key: Tuple[str, str], confidence: float, detections: Detections) -> None:
+        size = (
+            _ENTRY_OVERHEAD
+            + detections.scores.nbytes
+            + detections.boxes.nbytes
+            + sum(len(label) for label in detections.labels)
+        )
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.size
+        if size > self.max_bytes:
+            return
+        self._entries[key] = _Entry(confidence, detections, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._evictions += 1
+
+    def _disk_get(self, key: Tuple[str, str]) -> Optional[Tuple[float, Detections]]:
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT confidence, labels, scores, boxes FROM detections"
+                " WHERE digest = ? AND model = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE detections SET accessed = ? WHERE digest = ? AND model = ?",
+                (time.time(), *key),
+            )
+            self._db.commit()
+        confidence, labels, scores, boxes = row
+        detections = Detections(
+            labels=np.array(json.loads(labels), dtype=object),
+            scores=np.frombuffer(scores, dtype=np.float32),
+            boxes=np.frombuffer(boxes, dtype=np.float32).reshape(-1, 4),
+        )
+        return confidence, detections
+
+    def _disk_put(self, key: Tuple[str, str], confidence: float, detections: Detections) -> None:
+        with self._db_lock:
+            if self._db is None:
+                return
+            # Never replace a stored lower-threshold superset with a narrower result.
+            self._db.execute(
+                "INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (digest, model) DO UPDATE SET"
+                " confidence = excluded.confidence, labels = excluded.labels,"
+                " scores = excluded.scores, boxes = excluded.boxes, accessed = excluded.accessed"
+                " WHERE excluded.confidence < detections.confidence",
+                (
+                    *key,
+                    confidence,
+                    json.dumps(detections.labels.tolist()),
+                    detections.scores.astype(np.float32).tobytes(),
+                    detections.boxes.astype(np.float32).tobytes(),
+                    time.time(),
+                ),
+            )
+            self._disk_writes += 1
+            if self._disk_writes % _PRUNE_EVERY == 0:
+                self._prune_disk()
+            self._db.commit()
+
+    def _prune_disk(self) -> None:
+        assert self._db is not None
+        self._db.execute(
+            "DELETE FROM detections WHERE rowid IN (SELECT rowid FROM detections"
+            " ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,),
+        )
@@ -0,0 +1,420 @@
+"""Batched, cached Ollama embeddings and an in-process cosine vector index.
+
+:class:`Embedder` deduplicates inputs, answers repeats from a content-hash
+LRU and sends the rest to ``/api/embed`` in batches. :class:`VectorIndex`
+keeps unit-normalised vectors in one contiguous float32 matrix (optionally
+a memory-mapped ``.npy`` file) and answers top-k cosine queries exactly
+with a matrix product, switching to an inverted-file (IVF) index once the
+collection is large enough for a full scan to matter.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.metrics import OLLAMA_EMBEDDINGS
+from app.services.ollama_client import OllamaClient
+
+# Sample size per IVF list used to train the centroids.
+_IVF_TRAIN_PER_LIST = 64
+_IVF_ITERATIONS = 10
+# Rebuild the IVF lists once this fraction of rows changed since training.
+_IVF_REBUILD_FRACTION = 0.1
+# Rows assigned to centroids per matrix product while building.
+_ASSIGN_CHUNK = 65536
+
+
+def embedding_key(model: str, text: str) -> str:
+    """Content hash of one input for one model."""
+
+    return hashlib.blake2b(f"{model}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so that dot products are cosine similarities."""
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, np.float32(1e-12))
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first."""
+
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+class EmbeddingCache:
+    """LRU of embedding vectors under a byte budget, keyed by content hash."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        vector = self._entries.get(key)
+        if vector is None:
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return vector
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        if vector.nbytes > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+        }
+
+
+class Embedder:
+    """Embed texts through Ollama, batching misses and caching every vector.
+
+    Duplicate inputs within one call are embedded once. Batches are sent one
+    after another so that a large request occupies a single model slot.
+    """
+
+    def __init__(
+        self,
+        client: OllamaClient,
+        *,
+        cache: Optional[EmbeddingCache] = None,
+        batch_size: int = 32,
+        keep_alive: Optional[str] = None,
+    ) -> None:
+        self.client = client
+        self.cache = cache
+        self.batch_size = batch_size
+        self.keep_alive = keep_alive
+
+    async def embed(
+        self,
+        model: str,
+        texts: Sequence[str],
+        *,
+        truncate: Optional[bool] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[np.ndarray, int]:
+        """Return a ``(len(texts), dim)`` float32 matrix and how many came from cache."""
+
+        keys = [embedding_key(model, text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in missing:
+                continue
+            vector = self.cache.get(key) if self.cache is not None else None
+            if vector is None:
+                missing[key] = text
+            else:
+                found[key] = vector
+        cached = sum(1 for key in keys if key in found)
+
+        pending = list(missing.items())
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start : start + self.batch_size]
+            embeddings = await self.client.embed(
+                model=model,
+                inputs=[text for _, text in batch],
+                truncate=truncate,
+                keep_alive=self.keep_alive,
+                timeout=timeout,
+            )
+            for (key, _), values in zip(batch, embeddings):
+                vector = np.asarray(values, dtype=np.float32)
+                found[key] = vector
+                if self.cache is not None:
+                    self.cache.put(key, vector)
+
+        label = self.client.metric_label(model)
+        if cached:
+            OLLAMA_EMBEDDINGS.inc(cached, model=label, source="cache")
+        if len(keys) > cached:
+            OLLAMA_EMBEDDINGS.inc(len(keys) - cached, model=label, source="upstream")
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32), 0
+        return np.stack([found[key] for key in keys]), cached
+
+
+class SearchHit(NamedTuple):
+    id: str
+    score: float
+    metadata: Optional[Dict[str, Any]]
+
+
+class _IVF:
+    """Spherical k-means coarse quantiser with one row list per centroid."""
+
+    def __init__(self, vectors: np.ndarray, rng: np.random.Generator) -> None:
+        count = len(vectors)
+        nlist = max(1, int(np.sqrt(count)))
+        sample = vectors[
+            rng.choice(count, min(count, nlist * _IVF_TRAIN_PER_LIST), replace=False)
+        ]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(_IVF_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            filled = np.bincount(assign, minlength=nlist) > 0
+            # Empty clusters keep their previous centroid.
+            centroids[filled] = normalize(sums[filled])
+        assign = np.concatenate(
+            [
+                np.argmax(vectors[start : start + _ASSIGN_CHUNK] @ centroids.T, axis=1)
+                for start in range(0, count, _ASSIGN_CHUNK)
+            ]
+        )
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self.centroids = centroids
+        self.lists = [order[bounds[i] : bounds[i + 1]] for i in range(nlist)]
+        self.covered = count
+
+    def candidates(self, query: np.ndarray, probes: int, size: int) -> np.ndarray:
+        """Rows in the ``probes`` nearest lists plus rows added since training."""
+
+        nearest = top_k(self.centroids @ query, probes)
+        parts = [self.lists[i] for i in nearest]
+        if size > self.covered:
+            parts.append(np.arange(self.covered, size))
+        return np.concatenate(parts)
+
+
+class VectorIndex:
+    """Contiguous cosine index over unit vectors, keyed by document id.
+
+    With ``path`` the matrix lives in a memory-mapped ``.npy`` file and ids
+    and metadata in an append-only ``.jsonl`` beside it, so the index
+    survives restarts without being loaded into RAM. Adding an existing id
+    overwrites its vector.
+
+    Search is an exact matrix product until the index holds
+    ``ivf_threshold`` vectors (0 keeps it exact); beyond that an IVF index
+    is trained on first use and ``ivf_probes`` of its lists are scanned,
+    together with any rows added since it was trained. The lists are
+    retrained once a tenth of the rows have changed.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: Optional[str] = None,
+        ivf_threshold: int = 50_000,
+        ivf_probes: int = 8,
+        seed: int = 0,
+    ) -> None:
+        self.path = Path(path) if path else None
+        self.ivf_threshold = ivf_threshold
+        self.ivf_probes = ivf_probes
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+        self._ids: List[str] = []
+        self._metadata: List[Optional[Dict[str, Any]]] = []
+        self._rows: Dict[str, int] = {}
+        self._ivf: Optional[_IVF] = None
+        self._changed = 0
+        self._searches = 0
+        self._ivf_searches = 0
+        self._ivf_builds = 0
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    @property
+    def sidecar(self) -> Optional[Path]:
+        return self.path.with_suffix(".jsonl") if self.path is not None else None
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self._matrix.shape[1] if self._matrix is not None else None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        metadata: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> int:
+        """Insert or overwrite vectors by id; return how many ids were new.
+
+        Raises ``ValueError`` when the vector width does not match the index.
+        """
+
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+        if not len(ids):
+            return 0
+        vectors = normalize(vectors)
+        metadata = list(metadata) if metadata is not None else [None] * len(ids)
+        with self._lock:
+            if self.dim is not None and vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Vectors have {vectors.shape[1]} dimensions; the index holds {self.dim}."
+                )
+            records: List[Dict[str, Any]] = []
+            added = 0
+            for doc_id, vector, meta in zip(ids, vectors, metadata):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = self._size
+                    self._reserve(row + 1, len(vector))
+                    self._rows[doc_id] = row
+                    self._ids.append(doc_id)
+                    self._metadata.append(meta)
+                    self._size += 1
+                    added += 1
+                else:
+                    self._metadata[row] = meta
+                assert self._matrix is not None
+                self._matrix[row] = vector
+                records.append({"id": doc_id, "row": row, "metadata": meta})
+            self._changed += len(ids)
+            self._persist(records)
+            return added
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[List[SearchHit], bool]:
+        """Top ``k`` ids by cosine similarity, and whether the search was exact."""
+
+        query = normalize(query)
+        with self._lock:
+            self._searches += 1
+            if self._matrix is None or not self._size:
+                return [], True
+            if query.shape[-1] != self.dim:
+                raise ValueError(
+                    f"Query has {query.shape[-1]} dimensions; the index holds {self.dim}."
+                )
+            vectors = self._matrix[: self._size]
+            exact = not self.ivf_threshold or self._size < self.ivf_threshold
+            if exact:
+                rows = np.arange(self._size)
+                scores = vectors @ query
+            else:
+                ivf = self._current_ivf(vectors)
+                rows = ivf.candidates(query, self.ivf_probes, self._size)
+                scores = vectors[rows] @ query
+                self._ivf_searches += 1
+            best = top_k(scores, k)
+            return [
+                SearchHit(self._ids[rows[i]], float(scores[i]), self._metadata[rows[i]])
+                for i in best
+            ], exact
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self._size,
+                "dim": self.dim,
+                "bytes": self._matrix.nbytes if self._matrix is not None else 0,
+                "path": str(self.path) if self.path is not None else None,
+                "ivf_threshold": self.ivf_threshold,
+                "ivf_lists": len(self._ivf.lists) if self._ivf is not None else 0,
+                "ivf_builds": self._ivf_builds,
+                "searches": self._searches,
+                "ivf_searches": self._ivf_searches,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if isinstance(self._matrix, np.memmap):
+                self._matrix.flush()
+            self._matrix = None
+
+    def _current_ivf(self, vectors: np.ndarray) -> _IVF:
+        if self._ivf is None or self._changed > _IVF_REBUILD_FRACTION * self._size:
+            self._ivf = _IVF(vectors, self._rng)
+            self._ivf_builds += 1
+            self._changed = 0
+        return self._ivf
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        """Grow the matrix geometrically so that appends stay amortised O(1)."""
+
+        if self._matrix is not None and len(self._matrix) >= rows:
+            return
+        capacity = max(1024, rows, 2 * len(self._matrix) if self._matrix is not None else 0)
+        if self.path is None:
+            grown = np.zeros((capacity, dim), dtype=np.float32)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            staging = self.path.with_name(self.path.name + ".tmp")
+            grown = np.lib.format.open_memmap(
+                staging, mode="w+", dtype=np.float32, shape=(capacity, dim)
+            )
+        if self._matrix is not None:
+            grown[: self._size] = self._matrix[: self._size]
+        if self.path is not None:
+            grown.flush()
+            del grown
+            os.replace(staging, self.path)
+            grown = np.lib.format.open_memmap(self.path, mode="r+")
+        self._matrix = grown
+
+    def _persist(self, records: List[Dict[str, Any]]) -> None:
+        if self.path is None:
+            return
+        assert isinstance(self._matrix, np.memmap)
+        # Vectors first: a row without its sidecar record is simply unused.
+        self._matrix.flush()
+        assert self.sidecar is not None
+        with self.sidecar.open("a", encoding="utf-8") as handle:
+            for record in records:
+                handle.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def _load(self) -> None:
+        assert self.path is not None and self.sidecar is not None
+        self._matrix = np.lib.format.open_memmap(self.path, mode="r+")
+        if not self.sidecar.exists():
+            return
+        with self.sidecar.open(encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from an interrupted write.
+                    break
+                row = record["row"]
+                if row == len(self._ids):
+                    self._ids.append(record["id"])
+                    self._metadata.append(record.get("metadata"))
+                    self._rows[record["id"]] = row
+                else:
+                    self._metadata[row] = record.get("metadata")
+        self._size = len(self._ids)
+        self._changed = self._size
@@ -0,0 +1,86 @@
+"""Per-connection state for real-time frame detection over WebSockets."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Generic, Optional, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+# Recent frames kept for the latency percentiles reported per connection.
+_LATENCY_WINDOW = 256
+
+
+class LatestFrame(Generic[T]):
+    """Single-slot mailbox where a new frame replaces an unread one.
+
+    The consumer therefore always works on the freshest frame, and a slow
+    consumer drops frames instead of building a backlog.
+    """
+
+    def __init__(self) -> None:
+        self._item: Optional[T] = None
+        self._ready = asyncio.Event()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item: T) -> None:
+        if self._item is not None:
+            self.dropped += 1
+        self._item = item
+        self._ready.set()
+
+    async def get(self) -> Optional[T]:
+        """Wait for the next frame; ``None`` once closed and drained."""
+
+        while self._item is None:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        item, self._item = self._item, None
+        return item
+
+    def close(self) -> None:
+        self._closed = True
+        self._ready.set()
+
+
+class StreamStats:
+    """Frame counters and latency percentiles for one connection."""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.received = 0
+        self.processed = 0
+        self.rejected = 0
+        self.errors = 0
+        self._latency: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._inference: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    def record(self, latency: float, inference: float) -> None:
+        self.processed += 1
+        self._latency.append(latency)
+        self._inference.append(inference)
+
+    def as_dict(self, dropped: int) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        latency = np.asarray(self._latency) * 1000.0
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": dropped,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "fps": self.processed / elapsed if elapsed > 0 else 0.0,
+            "latency_ms": {
+                "p50": float(np.percentile(latency, 50)) if latency.size else 0.0,
+                "p95": float(np.percentile(latency, 95)) if latency.size else 0.0,
+                "max": float(latency.max()) if latency.size else 0.0,
+            },
+            "inference_ms": float(np.mean(self._inference) * 1000.0) if self._inference else 0.0,
+        }
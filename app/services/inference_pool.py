@@ -0,0 +1,131 @@
+"""Bounded thread pool that keeps blocking inference off the event loop."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the pool cannot accept more work."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Inference queue is full; retry later.")
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """Run blocking callables on worker threads with a bounded backlog.
+
+    At most ``workers`` jobs run at once and at most ``max_queue`` more may
+    wait for a free worker; anything beyond that is rejected immediately
+    with :class:`QueueFullError` rather than piling up.
+    """
+
+    def __init__(self, workers: int = 1, *, max_queue: int = 8) -> None:
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="inference"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a worker (excluding running ones)."""
+
+        with self._lock:
+            return self._pending - self._running
+
+    async def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``fn(*args, **kwargs)`` on a worker thread and await its result."""
+
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                raise QueueFullError(self._retry_after_locked())
+            self._pending += 1
+            self._submitted += 1
+        enqueued = time.perf_counter()
+
+        def _run() -> T:
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                waited = started - enqueued
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._pending -= 1
+                    self._completed += 1
+                    self._run_total += time.perf_counter() - started
+
+        def _release_if_cancelled(future: "Future[T]") -> None:
+            # A job cancelled before it started never reaches ``_run``.
+            if future.cancelled():
+                with self._lock:
+                    self._pending -= 1
+
+        try:
+            future = self._executor.submit(_run)
+        except RuntimeError:
+            # Executor already shut down; release the reserved slot.
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(_release_if_cancelled)
+        # Cancelling the awaiting task cancels ``future`` if it is still queued.
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of queue depth and wait/run timings for capacity sizing."""
+
+        with self._lock:
+            completed = self._completed
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "submitted": self._submitted,
+                "completed": completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": (self._wait_total / completed * 1000.0) if completed else 0.0,
+                "max_wait_ms": self._wait_max * 1000.0,
+                "avg_run_ms": (self._run_total / completed * 1000.0) if completed else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _retry_after_locked(self) -> int:
+        """Estimate seconds until a slot frees up, based on average run time."""
+
+        if not self._completed:
+            return 1
+        avg_run = self._run_total / self._completed
+        backlog = self._pending / self.workers
+        return max(1, math.ceil(avg_run * backlog))
@@ -0,0 +1,536 @@
+"""Asynchronous jobs: submit now, collect the result later.
+
+Long detections and generations run as jobs instead of holding an HTTP
+connection open. :class:`JobScheduler` runs queued jobs highest priority
+first (FIFO within a priority) on a fixed number of worker tasks, through
+the same model registry and admission control as the synchronous routes.
+:class:`JobStore` keeps status and results in sqlite until their TTL
+passes, and remembers idempotency keys so that a retried submission
+returns the existing job instead of running it again. The scheduler calls
+the store on a worker thread so sqlite never blocks the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from app.services.metrics import JOBS
+from app.services.responses import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobQueueFullError(RuntimeError):
+    """Raised when too many jobs, or too many payload bytes, are already waiting."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("Job queue is full; retry later.")
+        self.retry_after = retry_after
+
+
+class IdempotencyConflictError(ValueError):
+    """Raised when an idempotency key is reused for a different request."""
+
+
+class UnknownJobKindError(ValueError):
+    """Raised for a job kind with no registered handler."""
+
+
+def fingerprint(kind: str, request: Dict[str, Any], *extra: str) -> str:
+    """Hash identifying a submission, to tell a retry from a key reused by mistake."""
+
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256("\n".join([kind, canonical, *extra]).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class JobRecord:
+    id: str
+    kind: str
+    status: str
+    priority: int
+    created: float
+    expires: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: Optional[str] = None
+    error: Optional[str] = None
+    idempotency_key: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created,
+            "started_at": self.started,
+            "finished_at": self.finished,
+            "expires_at": self.expires,
+            "result": loads(self.result) if self.result is not None else None,
+            "error": self.error,
+        }
+
+
+_COLUMNS = (
+    "id, kind, status, priority, created, expires, started, finished, result, error,"
+    " idempotency_key"
+)
+
+
+class JobStore:
+    """sqlite table of jobs; ``path=None`` keeps it in memory.
+
+    Rows live for ``ttl_seconds`` after they finish (or after submission,
+    for jobs that never do); :meth:`prune` deletes expired ones.
+    """
+
+    def __init__(self, path: Optional[str] = None, *, ttl_seconds: float = 3600.0) -> None:
+        self.ttl = ttl_seconds
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL,"
+            " priority INTEGER NOT NULL, created REAL NOT NULL, expires REAL NOT NULL,"
+            " started REAL, finished REAL, result TEXT, error TEXT,"
+            " idempotency_key TEXT UNIQUE, fingerprint TEXT, request TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires)")
+        self._db.commit()
+
+    def create(
+        self,
+        kind: str,
+        request: Dict[str, Any],
+        *,
+        priority: int = 0,
+        idempotency_key: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+    ) -> Tuple[JobRecord, bool]:
+        """Insert a queued job, or return the live job holding ``idempotency_key``.
+
+        The flag is ``True`` when a new job was created. Raises
+        :class:`IdempotencyConflictError` if the key belongs to a job
+        submitted with a different fingerprint.
+        """
+
+        now = time.time()
+        with self._lock:
+            if idempotency_key is not None:
+                self._db.execute(
+                    "DELETE FROM jobs WHERE idempotency_key = ? AND expires <= ?",
+                    (idempotency_key, now),
+                )
+                row = self._db.execute(
+                    f"SELECT {_COLUMNS}, fingerprint FROM jobs WHERE idempotency_key = ?",
+                    (idempotency_key,),
+                ).fetchone()
+                if row is not None:
+                    if row[-1] != fingerprint:
+                        raise IdempotencyConflictError(
+                            "Idempotency key was already used for a different request."
+                        )
+                    return JobRecord(*row[:-1]), False
+            record = JobRecord(
+                id=uuid.uuid4().hex,
+                kind=kind,
+                status=QUEUED,
+                priority=priority,
+                created=now,
+                expires=now + self.ttl,
+                idempotency_key=idempotency_key,
+            )
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, status, priority, created, expires,"
+                " idempotency_key, fingerprint, request) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.id,
+                    kind,
+                    QUEUED,
+                    priority,
+                    now,
+                    record.expires,
+                    idempotency_key,
+                    fingerprint,
+                    dumps(request).decode("utf-8"),
+                ),
+            )
+            self._db.commit()
+            return record, True
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE id = ? AND expires > ?",
+                (job_id, time.time()),
+            ).fetchone()
+        return JobRecord(*row) if row is not None else None
+
+    def start(self, job_id: str) -> None:
+        # Conditional, so a cancellation recorded first is not overwritten.
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, started = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED),
+            )
+            self._db.commit()
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        *,
+        result: Any = None,
+        error: Optional[str] = None,
+    ) -> None:
+        now = time.time()
+        self._update(
+            job_id,
+            status=status,
+            finished=now,
+            expires=now + self.ttl,
+            result=dumps(result).decode("utf-8") if result is not None else None,
+            error=error,
+        )
+
+    def recover(self) -> int:
+        """Fail jobs left queued or running by a previous process."""
+
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished = ?, expires = ?"
+                " WHERE status IN (?, ?)",
+                (FAILED, "Interrupted by a server restart.", now, now + self.ttl, QUEUED, RUNNING),
+            )
+            self._db.commit()
+            return cursor.rowcount
+
+    def prune(self) -> int:
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM jobs WHERE expires <= ?", (time.time(),))
+            self._db.commit()
+            return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE expires > ? GROUP BY status",
+                (time.time(),),
+            ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id)
+            )
+            self._db.commit()
+
+
+@dataclass
+class Job:
+    """What a handler receives: the request, plus any payload kept in memory."""
+
+    id: str
+    kind: str
+    request: Dict[str, Any]
+    payload: Any = None
+    client: Optional[str] = None
+
+
+JobHandler = Callable[[Job], Awaitable[Any]]
+
+
+class JobScheduler:
+    """Run stored jobs on ``concurrency`` workers, highest priority first.
+
+    Payloads such as uploaded images stay in memory only, so jobs still
+    queued when the process stops are marked failed on the next start.
+    At most ``max_queue`` jobs and ``max_queue_bytes`` of payload may wait.
+    Waiters are woken on every status change.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        *,
+        concurrency: int = 4,
+        max_queue: int = 256,
+        max_queue_bytes: int = 256 * 1024 * 1024,
+        sweep_interval: float = 60.0,
+    ) -> None:
+        self.store = store
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_queue_bytes = max_queue_bytes
+        self.sweep_interval = sweep_interval
+        self._queued_bytes = 0
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: "asyncio.PriorityQueue[Tuple[int, int, str]]" = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._queued: Dict[str, Job] = {}
+        self._running: Dict[str, "asyncio.Task[Any]"] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._stopping = False
+
+    @property
+    def kinds(self) -> List[str]:
+        return sorted(self._handlers)
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    def start(self) -> None:
+        # Runs once before serving, so the blocking call is acceptable here.
+        recovered = self.store.recover()
+        if recovered:
+            logger.warning("Marked %d unfinished jobs from a previous run as failed.", recovered)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{index}")
+            for index in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._sweep(), name="job-sweeper"))
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in [*self._tasks, *self._running.values()]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for job_id in list(self._queued) + list(self._running):
+            await self._store(
+                self.store.finish, job_id, FAILED, error="Server shut down before the job finished."
+            )
+        self._queued.clear()
+        self._running.clear()
+        self._queued_bytes = 0
+
+    async def submit(
+        self,
+        kind: str,
+        request: Dict[str, Any],
+        *,
+        priority: int = 0,
+        payload: Any = None,
+        client: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        fingerprint: Optional[str] = None,
+    ) -> Tuple[JobRecord, bool]:
+        """Queue a job; with a known ``idempotency_key`` return that job instead.
+
+        ``client`` is the submitter's fairness key for admission control.
+        The flag is ``True`` when a new job was queued.
+        """
+
+        if kind not in self._handlers:
+            raise UnknownJobKindError(f"Job kind '{kind}' is not enabled.")
+        size = _payload_bytes(payload)
+        if (
+            len(self._queued) >= self.max_queue
+            or self._queued_bytes + size > self.max_queue_bytes
+        ):
+            raise JobQueueFullError(self._retry_after())
+        # Reserved before the insert so concurrent submissions see it.
+        self._queued_bytes += size
+        try:
+            record, created = await self._store(
+                self.store.create,
+                kind,
+                request,
+                priority=priority,
+                idempotency_key=idempotency_key,
+                fingerprint=fingerprint,
+            )
+        except BaseException:
+            self._queued_bytes -= size
+            raise
+        if not created:
+            self._queued_bytes -= size
+            return record, False
+        self._queued[record.id] = Job(record.id, kind, request, payload, client)
+        self._queue.put_nowait((-priority, next(self._sequence), record.id))
+        JOBS.inc(kind=kind, status=QUEUED)
+        return record, True
+
+    async def get(self, job_id: str) -> Optional[JobRecord]:
+        return await self._store(self.store.get, job_id)
+
+    async def cancel(self, job_id: str) -> Optional[JobRecord]:
+        """Cancel a queued or running job; finished jobs are left as they are."""
+
+        record = await self.get(job_id)
+        if record is None or record.done:
+            return record
+        job = self._dequeue(job_id)
+        task = self._running.pop(job_id, None)
+        if job is None and task is None:
+            return await self.get(job_id)  # Finished while we looked it up.
+        if task is not None:
+            task.cancel()
+        await self._store(self.store.finish, job_id, CANCELLED, error="Cancelled by the client.")
+        JOBS.inc(kind=record.kind, status=CANCELLED)
+        self._notify(job_id)
+        return await self.get(job_id)
+
+    def watch(self, job_id: str) -> asyncio.Event:
+        """Event set on the job's next status change.
+
+        Take it before reading the store: a change that lands while the read
+        is on its worker thread then still sets it.
+        """
+
+        return self._changed.setdefault(job_id, asyncio.Event())
+
+    async def changed(
+        self, job_id: str, timeout: float, event: Optional[asyncio.Event] = None
+    ) -> bool:
+        """Wait up to ``timeout`` seconds for the job's status to change.
+
+        Pass the ``event`` from :meth:`watch` to also see changes since then.
+        """
+
+        if event is None:
+            event = self.watch(job_id)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[JobRecord]:
+        """Return the job once finished, or as it stands after ``timeout`` seconds."""
+
+        deadline = time.monotonic() + timeout
+        while True:
+            event = self.watch(job_id)
+            record = await self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if record is None or record.done or remaining <= 0:
+                return record
+            await self.changed(job_id, remaining, event)
+
+    def depth(self) -> Dict[str, int]:
+        """Queued and running jobs, without touching the store."""
+
+        return {
+            "queued": len(self._queued),
+            "queued_bytes": self._queued_bytes,
+            "running": len(self._running),
+        }
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "kinds": self.kinds,
+            "concurrency": self.concurrency,
+            **self.depth(),
+            "max_queue": self.max_queue,
+            "max_queue_bytes": self.max_queue_bytes,
+            "ttl_seconds": self.store.ttl,
+            "stored": await self._store(self.store.counts),
+        }
+
+    @staticmethod
+    async def _store(call: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        return await asyncio.to_thread(call, *args, **kwargs)
+
+    def _dequeue(self, job_id: str) -> Optional[Job]:
+        job = self._queued.pop(job_id, None)
+        if job is not None:
+            self._queued_bytes -= _payload_bytes(job.payload)
+        return job
+
+    def _retry_after(self) -> int:
+        return max(1, len(self._queued) // max(1, self.concurrency))
+
+    def _notify(self, job_id: str) -> None:
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._dequeue(job_id)
+            if job is None:
+                continue  # Cancelled while queued.
+            # Registered before the store update so cancel() can still find it.
+            task = asyncio.ensure_future(self._handlers[job.kind](job))
+            self._running[job_id] = task
+            await self._store(self.store.start, job_id)
+            self._notify(job_id)
+            result: Any = None
+            error: Optional[str] = None
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                if self._stopping:
+                    task.cancel()
+                    raise
+                continue  # cancel() already recorded it.
+            except Exception as exc:  # noqa: BLE001 - reported on the job
+                error = str(exc) or type(exc).__name__
+            if self._running.pop(job_id, None) is None:
+                continue  # Cancelled just as it finished.
+            status = FAILED if error is not None else SUCCEEDED
+            await self._store(self.store.finish, job_id, status, result=result, error=error)
+            JOBS.inc(kind=job.kind, status=status)
+            self._notify(job_id)
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            await self._store(self.store.prune)
+            for job_id, event in list(self._changed.items()):
+                if not event.is_set() and await self.get(job_id) is None:
+                    self._changed.pop(job_id, None)
+
+
+def _payload_bytes(payload: Any) -> int:
+    return len(payload) if isinstance(payload, (bytes, bytearray, memoryview)) else 0
+
+
+async def wait_for_capacity(call: Callable[[], Awaitable[Any]], *errors: type) -> Any:
+    """Await ``call``, retrying while it raises one of ``errors``.
+
+    Jobs wait for capacity instead of failing on a momentarily full queue;
+    each error type carries the ``retry_after`` hint of the queue it hit.
+    """
+
+    while True:
+        try:
+            return await call()
+        except errors as exc:
+            await asyncio.sleep(min(getattr(exc, "retry_after", 1), 1))
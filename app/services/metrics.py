@@ -0,0 +1,403 @@
+"""Low-overhead Prometheus metrics and per-request ``Server-Timing``.
+
+Metrics are plain in-process counters, gauges and fixed-bucket histograms
+rendered in the Prometheus text format; recording one sample is a lock
+and a bisect, so they can stay on in production. Stage timings recorded
+while serving a request are also collected into that request's
+``Server-Timing`` header.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+RATE_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0, 1000.0)
+SIZE_BUCKETS = (1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+
+LabelKey = Tuple[str, ...]
+
+# ``model`` label for names that were not validated against a registry or
+# upstream; client-supplied strings would otherwise be unbounded series.
+OTHER_MODEL = "other"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        return tuple(
+            "" if labels.get(name) is None else str(labels[name]) for name in self.label_names
+        )
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket (non-cumulative) counts + overflow, sum.
+        self._counts: Dict[LabelKey, List[int]] = {}
+        self._sums: Dict[LabelKey, float] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        lines: List[str] = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self, extra: Iterable[_Metric] = ()) -> str:
+        lines: List[str] = []
+        for metric in [*self._metrics, *extra]:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+HTTP_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to the end of the response body.", ("method", "route")
+)
+HTTP_INFLIGHT = REGISTRY.gauge("http_requests_in_flight", "Requests currently being served.")
+CANCELLED_REQUESTS = REGISTRY.counter(
+    "cancelled_requests_total",
+    "Requests whose work was cancelled because the client disconnected or the deadline passed.",
+    ("service", "reason"),
+)
+YOLO_STAGE = REGISTRY.histogram(
+    "yolo_stage_seconds",
+    "YOLO request time per stage (parse, queue, decode, predict, serialize).",
+    ("model", "stage"),
+)
+YOLO_BATCH_SIZE = REGISTRY.histogram(
+    "yolo_batch_size", "Images per YOLO forward pass.", ("model",), SIZE_BUCKETS
+)
+YOLO_IMAGES = REGISTRY.counter("yolo_images_total", "Images run through YOLO.", ("model",))
+YOLO_DROPPED = REGISTRY.counter(
+    "yolo_dropped_images_total",
+    "Queued images skipped before inference because their caller had gone.",
+    ("model",),
+)
+YOLO_ERRORS = REGISTRY.counter("yolo_errors_total", "Failed YOLO requests.", ("model", "reason"))
+OLLAMA_STAGE = REGISTRY.histogram(
+    "ollama_stage_seconds",
+    "Ollama request time per stage (queue, upstream, first_token, and Ollama's own "
+    "load, prompt_eval, eval and total durations).",
+    ("model", "stage"),
+)
+OLLAMA_TOKENS = REGISTRY.counter(
+    "ollama_tokens_total", "Tokens processed by Ollama.", ("model", "kind")
+)
+OLLAMA_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "ollama_generation_tokens_per_second",
+    "Generation speed per request from eval_count / eval_duration.",
+    ("model",),
+    RATE_BUCKETS,
+)
+JOBS = REGISTRY.counter(
+    "jobs_total", "Asynchronous job transitions by kind and status.", ("kind", "status")
+)
+OLLAMA_EMBEDDINGS = REGISTRY.counter(
+    "ollama_embeddings_total",
+    "Embedded inputs by where the vector came from (cache or upstream).",
+    ("model", "source"),
+)
+OLLAMA_ERRORS = REGISTRY.counter(
+    "ollama_errors_total", "Failed upstream Ollama calls.", ("model", "reason")
+)
+
+# Ollama reports durations in nanoseconds under these keys.
+_OLLAMA_DURATIONS = {
+    "load_duration": "load",
+    "prompt_eval_duration": "prompt_eval",
+    "eval_duration": "eval",
+    "total_duration": "total",
+}
+
+
+def observe_ollama_response(model: Optional[str], response: Dict[str, Any]) -> None:
+    """Aggregate the timing and token counts Ollama returns with a final response."""
+
+    model = model or response.get("model", "")
+    for key, stage in _OLLAMA_DURATIONS.items():
+        value = response.get(key)
+        if value:
+            OLLAMA_STAGE.observe(value / 1e9, model=model, stage=stage)
+    prompt_tokens = response.get("prompt_eval_count")
+    if prompt_tokens:
+        OLLAMA_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    tokens = response.get("eval_count")
+    if tokens:
+        OLLAMA_TOKENS.inc(tokens, model=model, kind="completion")
+        duration = response.get("eval_duration")
+        if duration:
+            OLLAMA_TOKENS_PER_SECOND.observe(tokens / (duration / 1e9), model=model)
+
+
+class RequestTiming:
+    """Stage durations recorded while serving one request."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self) -> str:
+        entries = [f"{stage};dur={seconds * 1000.0:.2f}" for stage, seconds in self.stages.items()]
+        entries.append(f"app;dur={self.elapsed() * 1000.0:.2f}")
+        return ", ".join(entries)
+
+
+_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def current_timing() -> Optional[RequestTiming]:
+    return _timing.get()
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Add ``seconds`` to the current request's ``Server-Timing`` entry, if any."""
+
+    timing = _timing.get()
+    if timing is not None:
+        timing.add(stage, seconds)
+
+
+def observe_since_start(histogram: Histogram, stage: str, **labels: Any) -> None:
+    """Record the time from the start of the current request as ``stage``.
+
+    Called first thing in a handler, this measures body parsing and
+    dependency resolution, which happen before any handler code runs.
+    """
+
+    timing = _timing.get()
+    if timing is not None:
+        elapsed = timing.elapsed()
+        histogram.observe(elapsed, stage=stage, **labels)
+        timing.add(stage, elapsed)
+
+
+@contextmanager
+def timed(histogram: Histogram, stage: str, **labels: Any) -> Iterator[None]:
+    """Observe a block in ``histogram`` and in the request's ``Server-Timing``."""
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, stage=stage, **labels)
+        record_stage(stage, elapsed)
+
+
+class MetricsMiddleware:
+    """Count and time every HTTP request and attach ``Server-Timing``.
+
+    Routes are labelled by their path template (``/ollama/sessions/{session_id}``),
+    never the raw path, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing = RequestTiming()
+        token = _timing.set(timing)
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        HTTP_INFLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            HTTP_INFLIGHT.dec()
+            _timing.reset(token)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status))
+            HTTP_DURATION.observe(timing.elapsed(), method=method, route=route)
+
+
+def state_gauges(state: Any) -> List[Gauge]:
+    """Scrape-time gauges for per-model in-flight work held on ``app.state``."""
+
+    gauges: List[Gauge] = []
+    registry = getattr(state, "yolo_registry", None)
+    if registry is not None:
+        inflight = Gauge("yolo_requests_in_flight", "YOLO requests using each model.", ("model",))
+        memory = Gauge("yolo_model_bytes", "Weight memory of each loaded model.", ("model",))
+        for model, info in registry.stats()["models"].items():
+            inflight.set(info["active"], model=model)
+            memory.set(info["bytes"], model=model)
+        gauges += [inflight, memory]
+    pool = getattr(state, "inference_pool", None)
+    if pool is not None:
+        queued = Gauge("yolo_inference_queue_depth", "Jobs waiting for an inference worker.")
+        queued.set(pool.queue_depth())
+        gauges.append(queued)
+    admission = getattr(state, "admission", None)
+    if admission is not None:
+        inflight = Gauge(
+            "ollama_requests_in_flight", "Ollama requests running per model.", ("model",)
+        )
+        waiting = Gauge("ollama_requests_queued", "Ollama requests waiting per model.", ("model",))
+        # Admission is keyed by requested names, so fold unknown ones together.
+        label = state.ollama_client.metric_label
+        for model, info in admission.stats().items():
+            inflight.inc(info["inflight"], model=label(model))
+            waiting.inc(info["queued"], model=label(model))
+        gauges += [inflight, waiting]
+    jobs = getattr(state, "jobs", None)
+    if jobs is not None:
+        stats = jobs.depth()
+        queued = Gauge("jobs_queued", "Asynchronous jobs waiting for a worker.")
+        queued_bytes = Gauge("jobs_queued_bytes", "Payload bytes held by waiting jobs.")
+        running = Gauge("jobs_running", "Asynchronous jobs being run.")
+        queued.set(stats["queued"])
+        queued_bytes.set(stats["queued_bytes"])
+        running.set(stats["running"])
+        gauges += [queued, queued_bytes, running]
+    return gauges
@@ -0,0 +1,145 @@
+"""Response cache with in-flight coalescing for deterministic Ollama calls."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional
+
+from app.services.responses import dumps
+
+
+def is_cacheable(options: Optional[Dict[str, Any]]) -> bool:
+    """Only greedy (temperature 0) or fixed-seed requests repeat exactly."""
+
+    if not options:
+        return False
+    return options.get("temperature") == 0 or options.get("seed") is not None
+
+
+def cache_key(path: str, payload: Dict[str, Any]) -> str:
+    """Canonical hash of an upstream request, independent of key order."""
+
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{path}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+class _Entry(NamedTuple):
+    value: Dict[str, Any]
+    expires: float
+    size: int
+
+
+class _Flight:
+    """A shared upstream call and the number of callers still awaiting it."""
+
+    def __init__(self, task: "asyncio.Task[Dict[str, Any]]") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class ResponseCache:
+    """TTL + LRU cache bounded by entry count and approximate bytes.
+
+    Identical concurrent calls share one upstream request ("singleflight").
+    The shared call runs as its own task, so a caller that disconnects does
+    not cancel the work the others are waiting on; once the last waiter has
+    gone it is cancelled like any abandoned request. Each caller waits at
+    most its own ``timeout``, whoever started the call.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 1024,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl_seconds: float = 600.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+
+    async def get_or_call(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[Dict[str, Any]]],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Return the cached value for ``key``, else join or start ``call()``.
+
+        Raises ``asyncio.TimeoutError`` if the value is not ready within
+        ``timeout`` seconds.
+        """
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry.value
+            self._drop(key)
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self._coalesced += 1
+        else:
+            self._misses += 1
+            flight = self._inflight[key] = _Flight(asyncio.ensure_future(call()))
+            flight.task.add_done_callback(lambda done: self._settle(key, done))
+        flight.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), timeout)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Nobody is waiting any more; later callers start afresh.
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                flight.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "evictions": self._evictions,
+            "inflight": len(self._inflight),
+        }
+
+    def _settle(self, key: str, task: "asyncio.Task[Dict[str, Any]]") -> None:
+        flight = self._inflight.get(key)
+        if flight is not None and flight.task is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        value = task.result()
+        size = len(dumps(value))
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = _Entry(value, time.monotonic() + self.ttl, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self._evictions += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
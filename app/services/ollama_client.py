@@ -2,29 +2,126 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set, Union
 
 import httpx
 
+from app.services.metrics import (
+    OLLAMA_ERRORS,
+    OLLAMA_STAGE,
+    OTHER_MODEL,
+    observe_ollama_response,
+    record_stage,
+)
+from app.services.ollama_cache import ResponseCache, cache_key, is_cacheable
+from app.services.ollama_pool import Backend, BackendPool, normalize_model
+from app.services.responses import dumps, loads
+
+_JSON = {"Content-Type": "application/json"}
+
+
+class OllamaStreamError(httpx.HTTPError):
+    """Error reported by Ollama in the middle of a streamed response."""
+
+
+class OllamaResponseError(httpx.HTTPError):
+    """A successful Ollama response that does not have the expected shape."""
+
+
+def _timeout(seconds: Optional[float]) -> Any:
+    # ``None`` would disable the timeout; fall back to the client's instead.
+    return httpx.USE_CLIENT_DEFAULT if seconds is None else seconds
+
+
+async def _json_lines(response: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """Parse an NDJSON body from raw bytes, without decoding it to text first."""
+
+    pending = b""
+    async for data in response.aiter_bytes():
+        *lines, pending = (pending + data).split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _decode(line)
+    if pending.strip():
+        yield _decode(pending)
+
+
+def _decode(body: bytes) -> Any:
+    try:
+        return loads(body)
+    except ValueError as exc:
+        raise OllamaResponseError(f"Ollama sent a body that is not JSON: {exc}") from exc
+
 
 class OllamaClient:
-    """Provide thin async helpers over the Ollama REST endpoints."""
+    """Provide thin async helpers over the Ollama REST endpoints.
+
+    ``base_url`` may list several daemons; each request then goes to the
+    least-loaded healthy one (see :class:`BackendPool`). Requests that never
+    reached a backend are retried on another, and deterministic requests
+    may be hedged to a second backend after ``hedge_delay`` seconds.
+
+    Metrics are labelled with a model name only once it is known to exist
+    upstream: listed in ``known_models``, reported by a backend, or served
+    successfully. Anything else is counted as ``"other"``.
+    """
 
     def __init__(
         self,
-        base_url: str,
+        base_url: Union[str, Sequence[str]],
         *,
         timeout: float = 120.0,
         headers: Optional[Dict[str, str]] = None,
+        cache: Optional[ResponseCache] = None,
+        health_interval: float = 10.0,
+        hedge_delay: Optional[float] = None,
+        known_models: Iterable[str] = (),
     ) -> None:
-        self._client = httpx.AsyncClient(
-            base_url=base_url.rstrip("/"),
+        urls = [base_url] if isinstance(base_url, str) else list(base_url)
+        self.cache = cache
+        self._served: Set[str] = {normalize_model(name) for name in known_models}
+        self.hedge_delay = hedge_delay
+        self.pool = BackendPool(
+            urls,
             timeout=timeout,
             headers=headers,
+            health_interval=health_interval if len(urls) > 1 else 0.0,
         )
 
+    def start(self) -> None:
+        self.pool.start()
+
     async def aclose(self) -> None:
-        await self._client.aclose()
+        await self.pool.aclose()
+
+    def metric_label(self, model: Optional[str]) -> str:
+        """``model`` if it is known to exist upstream, else ``"other"``."""
+
+        if not model:
+            return OTHER_MODEL
+        name = normalize_model(model)
+        if name in self._served or any(
+            name in backend.available_models or name in backend.loaded_models
+            for backend in self.pool.backends
+        ):
+            return model
+        return OTHER_MODEL
+
+    def _mark_served(self, model: Optional[str]) -> None:
+        if model:
+            self._served.add(normalize_model(model))
+
+    async def preload(self, *, model: str, keep_alive: Optional[str] = None) -> None:
+        """Load ``model`` into memory on every backend without generating."""
+
+        payload: Dict[str, Any] = {"model": model, "stream": False}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        await asyncio.gather(
+            *(self._send(backend, "/api/generate", payload) for backend in self.pool.backends)
+        )
 
     async def generate(
         self,
@@ -32,11 +129,40 @@ class OllamaClient:
         model: str,
         prompt: str,
         options: Optional[Dict[str, Any]] = None,
+        system: Optional[str] = None,
+        context: Optional[Sequence[int]] = None,
+        keep_alive: Optional[str] = None,
+        backend: Optional[str] = None,
+        timeout: Optional[float] = None,
     ) -> Dict[str, Any]:
-        payload: Dict[str, Any] = {"model": model, "prompt": prompt}
-        if options:
-            payload["options"] = options
-        return await self._post("/api/generate", payload)
+        """Run a completion.
+
+        ``context`` is the token state returned by a previous call, which lets
+        Ollama skip re-prefilling the conversation; ``backend`` asks for the
+        daemon that holds that state. ``timeout`` (seconds, normally the
+        caller's remaining deadline) overrides the client's httpx timeout.
+        """
+
+        payload = self._generate_payload(
+            model, prompt, options, system=system, context=context, keep_alive=keep_alive
+        )
+        return await self._cached_post(
+            "/api/generate", payload, options, backend=backend, timeout=timeout
+        )
+
+    async def stream_generate(
+        self,
+        *,
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield generate chunks as Ollama produces them; the last has the stats."""
+
+        payload = self._generate_payload(model, prompt, options, stream=True)
+        async for chunk in self._stream("/api/generate", payload, timeout):
+            yield chunk
 
     async def chat(
         self,
@@ -44,13 +170,261 @@ class OllamaClient:
         model: str,
         messages: List[Dict[str, str]],
         options: Optional[Dict[str, Any]] = None,
+        keep_alive: Optional[str] = None,
+        backend: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        payload = self._chat_payload(model, messages, options, keep_alive=keep_alive)
+        return await self._cached_post(
+            "/api/chat", payload, options, backend=backend, timeout=timeout
+        )
+
+    async def stream_chat(
+        self,
+        *,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield chat chunks as Ollama produces them; the last has the stats."""
+
+        payload = self._chat_payload(model, messages, options, stream=True)
+        async for chunk in self._stream("/api/chat", payload, timeout):
+            yield chunk
+
+    async def embed(
+        self,
+        *,
+        model: str,
+        inputs: Sequence[str],
+        truncate: Optional[bool] = None,
+        keep_alive: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> List[List[float]]:
+        """Embed ``inputs`` with one ``/api/embed`` call, in input order.
+
+        Embeddings are deterministic, so the call may be hedged; caching is
+        left to :class:`~app.services.embeddings.Embedder`, per input.
+        """
+
+        payload: Dict[str, Any] = {"model": model, "input": list(inputs)}
+        if truncate is not None:
+            payload["truncate"] = truncate
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        body = await self._post("/api/embed", payload, hedge=True, timeout=timeout)
+        embeddings = body.get("embeddings") or []
+        if len(embeddings) != len(payload["input"]):
+            raise OllamaResponseError(
+                f"expected {len(payload['input'])} embeddings, got {len(embeddings)}"
+            )
+        return embeddings
+
+    @staticmethod
+    def _generate_payload(
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]],
+        *,
+        stream: bool = False,
+        system: Optional[str] = None,
+        context: Optional[Sequence[int]] = None,
+        keep_alive: Optional[str] = None,
     ) -> Dict[str, Any]:
-        payload: Dict[str, Any] = {"model": model, "messages": messages}
+        payload: Dict[str, Any] = {"model": model, "prompt": prompt, "stream": stream}
         if options:
             payload["options"] = options
-        return await self._post("/api/chat", payload)
+        if system is not None:
+            payload["system"] = system
+        if context:
+            payload["context"] = list(context)
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return payload
 
-    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-        response = await self._client.post(path, json=payload)
-        response.raise_for_status()
-        return response.json()
+    @staticmethod
+    def _chat_payload(
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Optional[Dict[str, Any]],
+        *,
+        stream: bool = False,
+        keep_alive: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"model": model, "messages": messages, "stream": stream}
+        if options:
+            payload["options"] = options
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        return payload
+
+    async def _stream(
+        self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        model = payload.get("model")
+        tried: List[Backend] = []
+        started = time.perf_counter()
+        try:
+            while True:
+                backend = self.pool.choose(model, exclude=tried)
+                tried.append(backend)
+                try:
+                    async for chunk in self._stream_from(backend, path, payload, timeout, started):
+                        yield chunk
+                    return
+                except (httpx.ConnectError, httpx.ConnectTimeout) as exc:
+                    # Raised before any chunk, so another backend is safe to try.
+                    if len(tried) >= len(self.pool.backends):
+                        raise
+                    OLLAMA_ERRORS.inc(model=self.metric_label(model), reason=type(exc).__name__)
+        except httpx.HTTPError as exc:
+            OLLAMA_ERRORS.inc(model=self.metric_label(model), reason=type(exc).__name__)
+            raise
+        finally:
+            # Headers are already sent, so this only reaches the histogram.
+            OLLAMA_STAGE.observe(
+                time.perf_counter() - started, model=self.metric_label(model), stage="upstream"
+            )
+
+    async def _stream_from(
+        self,
+        backend: Backend,
+        path: str,
+        payload: Dict[str, Any],
+        timeout: Optional[float],
+        started: float,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        model = payload.get("model")
+        first = True
+        async with self.pool.track(backend, model):
+            async with backend.client.stream(
+                "POST", path, content=dumps(payload), headers=_JSON, timeout=_timeout(timeout)
+            ) as response:
+                response.raise_for_status()
+                async for chunk in _json_lines(response):
+                    if "error" in chunk:
+                        raise OllamaStreamError(chunk["error"])
+                    if first:
+                        first = False
+                        self._mark_served(model)
+                        elapsed = time.perf_counter() - started
+                        OLLAMA_STAGE.observe(
+                            elapsed, model=self.metric_label(model), stage="first_token"
+                        )
+                        record_stage("first_token", elapsed)
+                    if chunk.get("done"):
+                        observe_ollama_response(self.metric_label(model), chunk)
+                    yield chunk
+
+    async def _cached_post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        options: Optional[Dict[str, Any]],
+        *,
+        backend: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        deterministic = is_cacheable(options)
+        if self.cache is None or not deterministic:
+            return await self._post(
+                path, payload, hedge=deterministic, prefer=backend, timeout=timeout
+            )
+        # The shared call runs under the client's timeout; each caller
+        # gives up at its own deadline instead of the first caller's.
+        try:
+            return await self.cache.get_or_call(
+                cache_key(path, payload),
+                lambda: self._post(path, payload, hedge=True, prefer=backend),
+                timeout,
+            )
+        except asyncio.TimeoutError as exc:
+            if timeout is None:
+                raise
+            raise httpx.ReadTimeout(f"No response within {timeout:g}s.") from exc
+
+    async def _post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        *,
+        hedge: bool = False,
+        prefer: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        model = payload.get("model")
+        tried: List[Backend] = []
+        while True:
+            backend = self.pool.choose(model, exclude=tried, prefer=prefer)
+            tried.append(backend)
+            try:
+                if hedge and self.hedge_delay is not None and len(self.pool.backends) > 1:
+                    return await self._hedged(backend, path, payload, tried, timeout)
+                return await self._send(backend, path, payload, timeout)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # Nothing reached the daemon, so another backend is safe to try.
+                if len(tried) >= len(self.pool.backends):
+                    raise
+
+    async def _hedged(
+        self,
+        primary: Backend,
+        path: str,
+        payload: Dict[str, Any],
+        tried: List[Backend],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Race ``primary`` against a second backend started after the hedge delay."""
+
+        assert self.hedge_delay is not None
+        tasks = {asyncio.ensure_future(self._send(primary, path, payload, timeout))}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+            if not done and len(tried) < len(self.pool.backends):
+                secondary = self.pool.choose(payload.get("model"), exclude=tried)
+                if secondary.healthy:
+                    tried.append(secondary)
+                    tasks.add(
+                        asyncio.ensure_future(self._send(secondary, path, payload, timeout))
+                    )
+            error: Optional[BaseException] = None
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            assert error is not None
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _send(
+        self,
+        backend: Backend,
+        path: str,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        model = payload.get("model")
+        started = time.perf_counter()
+        try:
+            async with self.pool.track(backend, model):
+                response = await backend.client.post(
+                    path, content=dumps(payload), headers=_JSON, timeout=_timeout(timeout)
+                )
+                response.raise_for_status()
+                body = _decode(response.content)
+        except httpx.HTTPError as exc:
+            OLLAMA_ERRORS.inc(model=self.metric_label(model), reason=type(exc).__name__)
+            raise
+        self._mark_served(model)
+        label = self.metric_label(model)
+        elapsed = time.perf_counter() - started
+        OLLAMA_STAGE.observe(elapsed, model=label, stage="upstream")
+        record_stage("upstream", elapsed)
+        observe_ollama_response(label, body)
+        return body
@@ -0,0 +1,44 @@
+"""Job handlers for Ollama generations and chats, registered when Ollama is enabled."""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import httpx
+
+from app.schemas.ollama import ChatResponse, GenerateResponse
+from app.services.admission import AdmissionController, AdmissionRejected
+from app.services.jobs import Job, JobHandler, wait_for_capacity
+from app.services.ollama_client import OllamaClient
+
+
+def ollama_handler(client: OllamaClient, admission: AdmissionController, kind: str) -> JobHandler:
+    """Run an ``ollama.generate`` or ``ollama.chat`` job under admission control."""
+
+    response_model = GenerateResponse if kind == "ollama.generate" else ChatResponse
+
+    async def _call(request: Dict[str, Any]) -> Dict[str, Any]:
+        if kind == "ollama.generate":
+            return await client.generate(
+                model=request["model"], prompt=request["prompt"], options=request.get("options")
+            )
+        return await client.chat(
+            model=request["model"], messages=request["messages"], options=request.get("options")
+        )
+
+    async def _run(job: Job) -> Dict[str, Any]:
+        model = job.request["model"]
+        # Share the submitter's fair share rather than adding one per job.
+        client = job.client or f"jobs:{job.id}"
+
+        async def _admitted() -> Dict[str, Any]:
+            async with admission.slot(model, client):
+                return await _call(job.request)
+
+        try:
+            response = await wait_for_capacity(_admitted, AdmissionRejected)
+        except httpx.HTTPError as exc:
+            raise RuntimeError(f"Ollama {kind.split('.')[-1]} failed: {exc}") from exc
+        return response_model.model_validate(response).model_dump()
+
+    return _run
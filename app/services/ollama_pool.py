@@ -0,0 +1,187 @@
+"""Routing, health checking and ejection across several Ollama daemons."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# A backend without the model loaded costs roughly this many queued requests,
+# since the daemon has to page the weights in first.
+COLD_MODEL_PENALTY = 2
+
+
+def normalize_model(name: str) -> str:
+    """Ollama reports ``phi3`` as ``phi3:latest``; compare on the tagged form."""
+
+    return name if ":" in name else f"{name}:latest"
+
+
+class NoBackendError(httpx.TransportError):
+    """Raised when every backend has been excluded for a request."""
+
+
+class Backend:
+    """One Ollama daemon and what the pool knows about it."""
+
+    def __init__(self, url: str, client: httpx.AsyncClient) -> None:
+        self.url = url
+        self.client = client
+        self.inflight = 0
+        self.healthy = True
+        self.failures = 0
+        self.available_models: Set[str] = set()
+        self.loaded_models: Set[str] = set()
+        self.last_error: Optional[str] = None
+
+    def cost(self, model: Optional[str]) -> int:
+        cold = model is not None and normalize_model(model) not in self.loaded_models
+        return self.inflight + (COLD_MODEL_PENALTY if cold else 0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "inflight": self.inflight,
+            "failures": self.failures,
+            "loaded_models": sorted(self.loaded_models),
+            "available_models": sorted(self.available_models),
+            "last_error": self.last_error,
+        }
+
+
+class BackendPool:
+    """Least-outstanding-requests routing over a set of Ollama backends.
+
+    Backends are probed every ``health_interval`` seconds via ``/api/tags``
+    (reachability, installed models) and ``/api/ps`` (loaded models). A
+    backend is ejected after ``eject_after`` consecutive failures, whether
+    from probes or live traffic, and readmitted by the next good probe.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        *,
+        timeout: float = 120.0,
+        headers: Optional[Dict[str, str]] = None,
+        health_interval: float = 10.0,
+        eject_after: int = 2,
+    ) -> None:
+        if not urls:
+            raise ValueError("At least one Ollama backend URL is required.")
+        self.health_interval = health_interval
+        self.eject_after = eject_after
+        self.backends: List[Backend] = [
+            Backend(
+                url.rstrip("/"),
+                httpx.AsyncClient(base_url=url.rstrip("/"), timeout=timeout, headers=headers),
+            )
+            for url in urls
+        ]
+        self._health_task: Optional[asyncio.Task[None]] = None
+
+    def start(self) -> None:
+        """Begin periodic health checks (only useful with several backends)."""
+
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def aclose(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for backend in self.backends:
+            await backend.client.aclose()
+
+    def choose(
+        self,
+        model: Optional[str],
+        exclude: Iterable[Backend] = (),
+        *,
+        prefer: Optional[str] = None,
+    ) -> Backend:
+        """Pick a backend for ``model``; ``prefer`` pins a healthy backend by URL."""
+
+        excluded = set(map(id, exclude))
+        candidates = [b for b in self.backends if id(b) not in excluded]
+        if not candidates:
+            raise NoBackendError("No Ollama backend left to try.")
+        if prefer is not None:
+            for backend in candidates:
+                if backend.url == prefer.rstrip("/") and backend.healthy:
+                    return backend
+        # Fail open: if everything looks down, still try rather than refuse.
+        healthy = [b for b in candidates if b.healthy] or candidates
+        if model is not None:
+            # Skip daemons whose probe showed the model is not installed.
+            tagged = normalize_model(model)
+            healthy = [
+                b for b in healthy if not b.available_models or tagged in b.available_models
+            ] or healthy
+        best = min(b.cost(model) for b in healthy)
+        return random.choice([b for b in healthy if b.cost(model) == best])
+
+    @asynccontextmanager
+    async def track(self, backend: Backend, model: Optional[str]) -> AsyncIterator[Backend]:
+        """Count an in-flight request and record its outcome on ``backend``."""
+
+        backend.inflight += 1
+        try:
+            yield backend
+        except httpx.HTTPError as exc:
+            # 4xx means a bad request (e.g. unknown model), not a sick backend.
+            if not isinstance(exc, httpx.HTTPStatusError) or exc.response.status_code >= 500:
+                self.record_failure(backend, exc)
+            raise
+        else:
+            backend.failures = 0
+            if model is not None:
+                backend.loaded_models.add(normalize_model(model))
+        finally:
+            backend.inflight -= 1
+
+    def record_failure(self, backend: Backend, exc: BaseException) -> None:
+        backend.failures += 1
+        backend.last_error = str(exc) or type(exc).__name__
+        if backend.healthy and backend.failures >= self.eject_after:
+            backend.healthy = False
+            logger.warning("Ejecting Ollama backend %s: %s", backend.url, backend.last_error)
+
+    async def check(self, backend: Backend) -> None:
+        try:
+            tags = await backend.client.get("/api/tags", timeout=5.0)
+            tags.raise_for_status()
+            ps = await backend.client.get("/api/ps", timeout=5.0)
+            ps.raise_for_status()
+        except httpx.HTTPError as exc:
+            self.record_failure(backend, exc)
+            return
+        backend.available_models = {
+            normalize_model(m.get("name", "")) for m in tags.json().get("models", [])
+        }
+        backend.loaded_models = {
+            normalize_model(m.get("name", "")) for m in ps.json().get("models", [])
+        }
+        backend.failures = 0
+        if not backend.healthy:
+            logger.info("Readmitting Ollama backend %s", backend.url)
+        backend.healthy = True
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [backend.stats() for backend in self.backends]
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self.check(b) for b in self.backends))
+            await asyncio.sleep(self.health_interval)
@@ -0,0 +1,73 @@
+"""JSON encoding for responses, without re-validating data we built ourselves.
+
+Returning a pydantic model from a route costs a validation when the model
+is built and a serialization pass afterwards; for detections and vectors
+that the service produced itself the validation buys nothing. Routes here
+return :class:`FastJSONResponse` (or :func:`model_response` for upstream
+data validated once) so FastAPI hands the bytes through untouched; the
+``response_model`` on the route still documents the shape.
+
+orjson is used when installed; it serializes NumPy arrays natively. The
+standard library is the fallback.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+import numpy as np
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None  # type: ignore[assignment]
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    # Non-contiguous arrays (orjson) and all NumPy values (json fallback).
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON for ``content``, which may contain NumPy values."""
+
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=_OPTIONS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    """Parse JSON straight from the wire bytes."""
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` rendered with :func:`dumps`."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_response(model: BaseModel, status_code: int = 200) -> Response:
+    """Serialize an already validated model to JSON bytes in pydantic-core."""
+
+    return Response(
+        type(model).__pydantic_serializer__.to_json(model),
+        status_code=status_code,
+        media_type="application/json",
+    )
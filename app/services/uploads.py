@@ -0,0 +1,124 @@
+"""Upload helpers: a streaming body-size limit and copy-free access to files."""
+
+from __future__ import annotations
+
+import io
+import json
+import mmap
+from contextlib import contextmanager
+from typing import Iterator, Union
+
+from fastapi import UploadFile
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Uploads at most this size are copied; Starlette keeps them in memory, so
+# mapping them would first spill them to disk. Larger ones are on disk already.
+_COPY_MAX_BYTES = 1024 * 1024
+
+
+class MaxBodySizeMiddleware:
+    """Reject request bodies over ``max_bytes`` without buffering them.
+
+    A declared ``Content-Length`` over the limit is refused before any body
+    is read; otherwise bytes are counted as they arrive. Once the limit is
+    crossed the app is told the client disconnected, so the multipart
+    parser stops consuming the stream, and the 413 is sent from here in
+    place of whatever response the app produced.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.max_bytes:
+            await self.app(scope, receive, send)
+            return
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                await self._reject(send)
+                return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Stop the app reading; it sees the client go away.
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal started
+            if exceeded and not started:
+                return  # Whatever the app makes of the disconnect; the 413 replaces it.
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded or started:
+                raise
+        if exceeded and not started:
+            await self._reject(send)
+
+    async def _reject(self, send: Send) -> None:
+        detail = f"Request body exceeds the {self.max_bytes} byte limit."
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    (b"connection", b"close"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+@contextmanager
+def upload_buffer(upload: UploadFile) -> Iterator[Union[bytes, memoryview]]:
+    """Expose an upload's bytes, memory-mapping large ones instead of copying.
+
+    Uploads up to ``_COPY_MAX_BYTES`` are read into ``bytes``; larger ones
+    have already been spooled to disk by the multipart parser and are
+    memory-mapped through ``fileno()``. A mapped view must not outlive the
+    block. If a worker still holds it when the block exits (e.g. the client
+    went away mid-inference) it is left for the garbage collector instead
+    of being freed underneath the worker.
+    """
+
+    spooled = upload.file
+    spooled.seek(0, 2)
+    size = spooled.tell()
+    spooled.seek(0)
+    if size <= _COPY_MAX_BYTES:
+        yield spooled.read()
+        return
+    try:
+        mapped = mmap.mmap(spooled.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError, io.UnsupportedOperation):
+        yield spooled.read()
+        return
+    view = memoryview(mapped)
+    try:
+        yield view
+    finally:
+        try:
+            view.release()
+            mapped.close()
+        except BufferError:
+            pass
@@ -0,0 +1,75 @@
+"""Eager model loading and warm-up inference run from the app lifespan."""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from app.services.ollama_client import OllamaClient
+    from app.services.yolo_registry import YoloRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupReport:
+    """Timing and outcome of each warm-up step, exposed through ``/ready``."""
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    async def run(self, name: str, step: Callable[[], Awaitable[Any]]) -> None:
+        started = time.perf_counter()
+        try:
+            await step()
+        except Exception as exc:  # noqa: BLE001 - a failed step must not abort start-up
+            elapsed = time.perf_counter() - started
+            self.steps[name] = {"ok": False, "seconds": elapsed, "error": str(exc)}
+            logger.warning("Warm-up step %s failed after %.2fs: %s", name, elapsed, exc)
+            return
+        elapsed = time.perf_counter() - started
+        self.steps[name] = {"ok": True, "seconds": elapsed}
+        logger.info("Warm-up step %s took %.2fs", name, elapsed)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "steps": self.steps}
+
+
+async def warm_up(
+    report: WarmupReport,
+    *,
+    registry: Optional[YoloRegistry] = None,
+    shapes: Sequence[Tuple[int, int]] = (),
+    ollama: Optional[OllamaClient] = None,
+    ollama_model: Optional[str] = None,
+    keep_alive: Optional[str] = None,
+) -> None:
+    """Load the default weights, run dummy inferences and preload the Ollama model.
+
+    Inference happens on the pool so allocations land on the worker threads
+    that serve real traffic. ``report.ready`` flips once every step is done.
+    """
+
+    started = time.perf_counter()
+    if registry is not None:
+        import numpy as np
+
+        await report.run("yolo_load", registry.get)
+        pool = registry.pool
+        for height, width in shapes:
+            dummy = np.zeros((height, width, 3), dtype=np.uint8)
+
+            async def infer(image: np.ndarray = dummy) -> None:
+                async with registry.use() as entry:
+                    await pool.submit(entry.runner.detect_batch, [image], [None])
+
+            await report.run(f"yolo_infer_{width}x{height}", infer)
+    if ollama is not None and ollama_model:
+        await report.run(
+            f"ollama_preload_{ollama_model}",
+            lambda: ollama.preload(model=ollama_model, keep_alive=keep_alive),
+        )
+    report.ready = True
+    logger.info("Warm-up finished in %.2fs", time.perf_counter() - started)
@@ -0,0 +1,283 @@
+"""Inference backends behind :class:`~app.services.yolo_runner.YoloRunner`.
+
+``ultralytics`` runs the PyTorch model through ``YOLO.predict``.
+``onnxruntime`` and ``openvino`` run an ONNX export on CPU with letterbox
+pre-processing and NMS written in NumPy, producing the same
+:class:`Detections` as the PyTorch path. Heavy dependencies are imported
+only when a backend is constructed.
+"""
+
+from __future__ import annotations
+
+import ast
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from app.services.yolo_runner import Detections
+
+logger = logging.getLogger(__name__)
+
+# Backends that run the model in this process; "remote" forwards to a
+# shared inference process instead (see app.services.yolo_remote).
+BACKENDS = ("ultralytics", "onnxruntime", "openvino")
+
+
+class YoloBackend(Protocol):
+    """Runs one batched forward pass and returns detections per image."""
+
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]: ...
+
+    def memory_bytes(self) -> int: ...
+
+    def close(self) -> None: ...
+
+
+class UltralyticsBackend:
+    """The stock Ultralytics/PyTorch ``predict`` path."""
+
+    def __init__(self, model_name: str) -> None:
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_name)
+
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]:
+        results = self.model.predict(source=list(images), conf=confidence, verbose=False)
+        return [Detections.from_result(result) for result in results]
+
+    def memory_bytes(self) -> int:
+        module = self.model.model
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    def close(self) -> None:
+        self.model = None
+
+
+def letterbox(image: np.ndarray, size: int) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """Resize keeping aspect ratio and pad to ``size``x``size`` with grey.
+
+    Returns the padded image, the scale ratio and the ``(left, top)`` padding,
+    which :func:`unletterbox` uses to map boxes back.
+    """
+
+    import cv2
+
+    height, width = image.shape[:2]
+    ratio = min(size / height, size / width)
+    new_h, new_w = round(height * ratio), round(width * ratio)
+    if (new_h, new_w) != (height, width):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - new_h) // 2, (size - new_w) // 2
+    canvas[top : top + new_h, left : left + new_w] = image
+    return canvas, ratio, (left, top)
+
+
+def unletterbox(
+    boxes: np.ndarray, ratio: float, pad: Tuple[int, int], shape: Tuple[int, int]
+) -> np.ndarray:
+    """Map ``xyxy`` boxes from letterboxed to original image coordinates."""
+
+    boxes = boxes.copy()
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / ratio
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / ratio
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, shape[0])
+    return boxes
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float, max_det: int = 300) -> np.ndarray:
+    """Greedy non-maximum suppression over ``xyxy`` boxes; returns kept indices."""
+
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+    keep: List[int] = []
+    while order.size and len(keep) < max_det:
+        best, rest = order[0], order[1:]
+        keep.append(int(best))
+        inter_w = (np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest])).clip(0)
+        inter_h = (np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest])).clip(0)
+        inter = inter_w * inter_h
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def batched_nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    class_ids: np.ndarray,
+    iou_threshold: float,
+    max_det: int = 300,
+) -> np.ndarray:
+    """Class-aware NMS: offset each class into its own coordinate range."""
+
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = class_ids[:, None].astype(boxes.dtype) * (boxes.max() + 1.0)
+    return nms(boxes + offsets, scores, iou_threshold, max_det)
+
+
+class OnnxRuntimeBackend:
+    """CPU inference on an ONNX export of the YOLO model.
+
+    ``.pt`` weights are exported once next to the original (dynamic batch)
+    and, when ``quantize`` is set, converted to an INT8 dynamically
+    quantized copy. ``providers`` selects the ONNX Runtime execution
+    providers, e.g. OpenVINO; the first one must be installed, the others
+    are fallbacks. onnxruntime itself is an optional dependency.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        *,
+        imgsz: int = 640,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+        quantize: bool = False,
+        iou_threshold: float = 0.7,
+        providers: Optional[Sequence[str]] = None,
+    ) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:
+            raise RuntimeError(
+                "The onnxruntime backend needs the optional onnxruntime package "
+                "(or onnxruntime-openvino for openvino)."
+            ) from exc
+
+        self.imgsz = imgsz
+        self.iou_threshold = iou_threshold
+        path = self._resolve_model(model_name, imgsz)
+        if quantize:
+            path = self._quantize(path)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        available = set(ort.get_available_providers())
+        requested = list(providers or ["CPUExecutionProvider"])
+        if requested[0] not in available:
+            # Falling back silently would serve a different backend than asked for.
+            hint = " (install onnxruntime-openvino)" if "OpenVINO" in requested[0] else ""
+            raise RuntimeError(
+                f"{requested[0]} is not available in this onnxruntime{hint}; "
+                f"available: {', '.join(sorted(available))}."
+            )
+        chosen = [p for p in requested if p in available]
+        self.model_path = path
+        self.session = ort.InferenceSession(str(path), sess_options=options, providers=chosen)
+        self.input_name = self.session.get_inputs()[0].name
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names: Dict[int, str] = (
+            ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+        )
+        self._labels = np.array(
+            [self.names.get(i, str(i)) for i in range(max(self.names, default=-1) + 1)],
+            dtype=object,
+        )
+
+    @staticmethod
+    def _resolve_model(model_name: str, imgsz: int) -> Path:
+        path = Path(model_name)
+        if path.suffix == ".onnx":
+            return path
+        exported = path.with_suffix(".onnx")
+        if not exported.exists():
+            from ultralytics import YOLO
+
+            logger.info("Exporting %s to ONNX", model_name)
+            exported = Path(YOLO(model_name).export(format="onnx", imgsz=imgsz, dynamic=True))
+        return exported
+
+    @staticmethod
+    def _quantize(path: Path) -> Path:
+        target = path.with_name(f"{path.stem}.int8.onnx")
+        if not target.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info("Quantizing %s to INT8", path)
+            quantize_dynamic(str(path), str(target), weight_type=QuantType.QUInt8)
+        return target
+
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]:
+        if not images:
+            return []
+        padded, ratios, pads = zip(*(letterbox(image, self.imgsz) for image in images))
+        # BGR HWC uint8 -> RGB NCHW float32 in [0, 1].
+        batch = np.ascontiguousarray(np.stack(padded)[..., ::-1].transpose(0, 3, 1, 2))
+        batch = batch.astype(np.float32) / 255.0
+        (output,) = self.session.run(None, {self.input_name: batch})
+        return [
+            self._postprocess(prediction, confidence, ratio, pad, image.shape[:2])
+            for prediction, ratio, pad, image in zip(output, ratios, pads, images)
+        ]
+
+    def _postprocess(
+        self,
+        prediction: np.ndarray,
+        confidence: float,
+        ratio: float,
+        pad: Tuple[int, int],
+        shape: Tuple[int, int],
+    ) -> Detections:
+        # (4 + classes, anchors) -> (anchors, 4 + classes) with cx, cy, w, h first.
+        rows = prediction.T
+        class_scores = rows[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(rows)), class_ids]
+        mask = scores >= confidence
+        if not mask.any():
+            return Detections.empty()
+        cxcywh, scores, class_ids = rows[mask, :4], scores[mask], class_ids[mask]
+        boxes = np.empty_like(cxcywh)
+        boxes[:, :2] = cxcywh[:, :2] - cxcywh[:, 2:] / 2
+        boxes[:, 2:] = cxcywh[:, :2] + cxcywh[:, 2:] / 2
+        keep = batched_nms(boxes, scores, class_ids, self.iou_threshold)
+        boxes = unletterbox(boxes[keep], ratio, pad, shape)
+        labels = (
+            self._labels[class_ids[keep]]
+            if len(self._labels) > class_ids.max()
+            else np.array([str(c) for c in class_ids[keep]], dtype=object)
+        )
+        return Detections(
+            labels=labels,
+            scores=scores[keep].astype(np.float32),
+            boxes=boxes.astype(np.float32),
+        )
+
+    def memory_bytes(self) -> int:
+        # Weights dominate; the session holds roughly one copy of the file.
+        return self.model_path.stat().st_size
+
+    def close(self) -> None:
+        self.session = None
+
+
+def create_backend(kind: str, model_name: str, **options: Any) -> YoloBackend:
+    """Instantiate the backend called ``kind`` for ``model_name``."""
+
+    if kind == "ultralytics":
+        return UltralyticsBackend(model_name)
+    if kind == "onnxruntime":
+        return OnnxRuntimeBackend(model_name, **options)
+    if kind == "openvino":
+        return OnnxRuntimeBackend(
+            model_name,
+            providers=["OpenVINOExecutionProvider", "CPUExecutionProvider"],
+            **options,
+        )
+    if kind == "remote":
+        from app.services.yolo_remote import RemoteBackend
+
+        return RemoteBackend(model_name, **options)
+    raise ValueError(
+        f"Unknown YOLO backend '{kind}'. Choose one of: {', '.join(BACKENDS)}, remote."
+    )
@@ -0,0 +1,179 @@
+"""Pipelined multi-image detection for bulk uploads and archives."""
+
+from __future__ import annotations
+
+import asyncio
+import tarfile
+import zipfile
+from contextlib import closing
+from functools import partial
+from itertools import islice
+from typing import (
+    AsyncIterator,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from app.services.inference_pool import InferencePool, QueueFullError
+from app.services.yolo_remote import RemoteInferenceError
+from app.services.yolo_runner import Detections, Scale, YoloRunner
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+Outcome = Union[Detections, Exception]
+
+
+class ArchiveLimitError(ValueError):
+    """An archive member, or the archives together, expand past the limits."""
+
+
+def iter_images(
+    sources: Iterable[Tuple[str, BinaryIO]],
+    *,
+    max_member_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None,
+) -> Iterator[Tuple[str, Union[bytes, ArchiveLimitError]]]:
+    """Yield ``(name, bytes)`` per image, expanding zip and tar archives lazily.
+
+    Archive members are checked against their declared uncompressed size
+    before being read: one over ``max_member_bytes`` is yielded as an
+    :class:`ArchiveLimitError` in place of its bytes, and once the members
+    read so far would exceed ``max_total_bytes`` an error is yielded for
+    the member that crosses it and expansion stops.
+    """
+
+    total = 0
+
+    def members() -> Iterator[Tuple[str, int, Callable[[], Optional[bytes]]]]:
+        for name, fileobj in sources:
+            lowered = name.lower()
+            if lowered.endswith(".zip"):
+                with zipfile.ZipFile(fileobj) as archive:
+                    for info in archive.infolist():
+                        if not info.is_dir() and info.filename.lower().endswith(IMAGE_SUFFIXES):
+                            yield f"{name}/{info.filename}", info.file_size, partial(
+                                archive.read, info
+                            )
+            elif lowered.endswith(TAR_SUFFIXES):
+                with tarfile.open(fileobj=fileobj, mode="r:*") as archive:
+                    for info in archive:
+                        if info.isfile() and info.name.lower().endswith(IMAGE_SUFFIXES):
+                            yield f"{name}/{info.name}", info.size, partial(
+                                _read_member, archive, info
+                            )
+            else:
+                # A plain upload, already bounded by the request body limit.
+                yield name, -1, fileobj.read
+
+    with closing(members()) as entries:
+        for name, size, read in entries:
+            if size < 0:
+                yield name, read() or b""
+            elif max_member_bytes is not None and size > max_member_bytes:
+                yield name, ArchiveLimitError(
+                    f"{name}: {size} bytes uncompressed exceeds the {max_member_bytes} byte limit"
+                )
+            elif max_total_bytes is not None and total + size > max_total_bytes:
+                yield name, ArchiveLimitError(
+                    f"{name}: archives exceed the {max_total_bytes} byte uncompressed limit"
+                )
+                return
+            else:
+                total += size
+                data = read()
+                if data is not None:
+                    yield name, data
+
+
+def _read_member(archive: tarfile.TarFile, info: tarfile.TarInfo) -> Optional[bytes]:
+    extracted = archive.extractfile(info)
+    return None if extracted is None else extracted.read()
+
+
+def _read_and_decode(
+    runner: YoloRunner, images: Iterator[Tuple[str, Union[bytes, Exception]]], count: int
+) -> List[Tuple[str, Union[Tuple[np.ndarray, Scale], Exception]]]:
+    """Pull up to ``count`` images from ``images`` and decode them."""
+
+    chunk: List[Tuple[str, Union[Tuple[np.ndarray, Scale], Exception]]] = []
+    for name, data in islice(images, count):
+        if isinstance(data, Exception):
+            chunk.append((name, data))
+            continue
+        try:
+            chunk.append((name, runner.decode(data)))
+        except ValueError as exc:
+            chunk.append((name, exc))
+    return chunk
+
+
+async def _predict(
+    runner: YoloRunner,
+    pool: InferencePool,
+    images: List[np.ndarray],
+    confidence: Optional[float],
+) -> List[Detections]:
+    # A bulk job should wait for capacity rather than fail half-way through.
+    while True:
+        try:
+            return await pool.submit(
+                runner.detect_batch, images, [confidence] * len(images)
+            )
+        except QueueFullError as exc:
+            await asyncio.sleep(min(exc.retry_after, 1))
+
+
+async def stream_detections(
+    runner: YoloRunner,
+    pool: InferencePool,
+    images: Iterator[Tuple[str, Union[bytes, Exception]]],
+    *,
+    confidence: Optional[float] = None,
+    chunk_size: int = 8,
+) -> AsyncIterator[Tuple[str, Outcome]]:
+    """Yield ``(name, detections or error)`` as each chunk finishes.
+
+    Reading and decoding the next chunk runs on a helper thread while the
+    current chunk is being predicted, so I/O and inference overlap. If the
+    shared inference process fails a chunk, each of its images reports the
+    :class:`RemoteInferenceError` and the stream carries on.
+    """
+
+    pending = asyncio.create_task(
+        asyncio.to_thread(_read_and_decode, runner, images, chunk_size)
+    )
+    try:
+        while True:
+            chunk = await pending
+            if not chunk:
+                return
+            pending = asyncio.create_task(
+                asyncio.to_thread(_read_and_decode, runner, images, chunk_size)
+            )
+            decoded = [item for _, item in chunk if not isinstance(item, Exception)]
+            images_only = [image for image, _ in decoded]
+            failure: Optional[RemoteInferenceError] = None
+            try:
+                results = iter(
+                    await _predict(runner, pool, images_only, confidence) if decoded else []
+                )
+            except RemoteInferenceError as exc:
+                failure = exc
+            for name, item in chunk:
+                if isinstance(item, Exception):
+                    yield name, item
+                elif failure is not None:
+                    yield name, failure
+                else:
+                    yield name, next(results).rescale(item[1])
+    finally:
+        pending.cancel()
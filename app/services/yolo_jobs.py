@@ -0,0 +1,34 @@
+"""Job handler for YOLO detections, registered when YOLO is enabled."""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from app.services.inference_pool import QueueFullError
+from app.services.jobs import Job, JobHandler, wait_for_capacity
+from app.services.metrics import YOLO_ERRORS
+from app.services.yolo_registry import YoloRegistry
+from app.services.yolo_remote import RemoteInferenceError
+
+
+def yolo_detect_handler(registry: YoloRegistry) -> JobHandler:
+    """Detect objects in ``job.payload`` (image bytes), like ``/yolo/detect``."""
+
+    async def _run(job: Job) -> Dict[str, Any]:
+        request = job.request
+        async with registry.use(request.get("model")) as entry:
+            try:
+                detections = await wait_for_capacity(
+                    lambda: entry.scheduler.detect(job.payload, confidence=request["confidence"]),
+                    QueueFullError,
+                )
+            except RemoteInferenceError as exc:
+                YOLO_ERRORS.inc(model=entry.model_name, reason="inference")
+                raise RuntimeError(f"YOLO inference failed: {exc}") from exc
+            return {
+                "model": entry.model_name,
+                "confidence": request["confidence"],
+                "detections": detections.to_dicts(),
+            }
+
+    return _run
@@ -0,0 +1,216 @@
+"""On-demand YOLO model registry with memory-budgeted LRU eviction."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Sequence
+
+from app.services.inference_pool import InferencePool
+from app.services.metrics import OTHER_MODEL
+from app.services.yolo_runner import BatchScheduler, YoloRunner
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownModelError(LookupError):
+    """Raised for a model outside the configured allow-list."""
+
+
+class ModelEntry:
+    """A loaded model, its batch scheduler and usage bookkeeping."""
+
+    def __init__(self, runner: YoloRunner, scheduler: BatchScheduler, size: int) -> None:
+        self.runner = runner
+        self.scheduler = scheduler
+        self.size = size
+        self.active = 0
+        self.requests = 0
+        self.loaded_at = time.time()
+
+    @property
+    def model_name(self) -> str:
+        return self.runner.model_name
+
+
+class YoloRegistry:
+    """Load YOLO weights on first use and share them across requests.
+
+    Loading runs on the inference pool; concurrent first requests for the
+    same model wait on one shared load. Once the summed weight size exceeds
+    ``max_bytes`` the least recently used models that no request is using
+    are unloaded. The default model is never evicted. Only the default
+    model and the names in ``allowed`` may be requested; ``allowed=None``
+    accepts any name the backend can load.
+    """
+
+    def __init__(
+        self,
+        pool: InferencePool,
+        *,
+        default_model: str,
+        confidence: float = 0.35,
+        backend: str = "ultralytics",
+        backend_options: Optional[Dict[str, Any]] = None,
+        decode_size: Optional[int] = None,
+        max_bytes: int = 1024 * 1024 * 1024,
+        allowed: Optional[Sequence[str]] = (),
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        self.pool = pool
+        self.default_model = default_model
+        self.confidence = confidence
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.decode_size = decode_size
+        self.max_bytes = max_bytes
+        self.allowed = None if allowed is None else {default_model, *allowed}
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._entries: "OrderedDict[str, ModelEntry]" = OrderedDict()
+        self._loading: Dict[str, "asyncio.Task[ModelEntry]"] = {}
+        self._bytes = 0
+        self._loads = 0
+        self._coalesced = 0
+        self._evictions = 0
+
+    async def get(self, model: Optional[str] = None) -> ModelEntry:
+        """Return the loaded entry for ``model``, loading it if needed."""
+
+        name = model or self.default_model
+        if self.allowed is not None and name not in self.allowed:
+            raise UnknownModelError(f"Model '{name}' is not available.")
+        entry = self._entries.get(name)
+        if entry is not None:
+            self._entries.move_to_end(name)
+            return entry
+        task = self._loading.get(name)
+        if task is not None:
+            self._coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._load(name))
+            self._loading[name] = task
+            task.add_done_callback(lambda _: self._loading.pop(name, None))
+        return await asyncio.shield(task)
+
+    async def acquire(self, model: Optional[str] = None) -> ModelEntry:
+        """Load ``model`` and pin it against eviction until :meth:`release`."""
+
+        entry = await self.get(model)
+        while self._entries.get(entry.model_name) is not entry:
+            # Evicted between the shared load finishing and this caller resuming.
+            entry = await self.get(model)
+        entry.active += 1
+        entry.requests += 1
+        return entry
+
+    def metric_label(self, model: Optional[str] = None) -> str:
+        """``model`` if it is allowed or loaded, else ``"other"``."""
+
+        name = model or self.default_model
+        if name in self._entries or (self.allowed is not None and name in self.allowed):
+            return name
+        return OTHER_MODEL
+
+    @staticmethod
+    def release(entry: ModelEntry) -> None:
+        entry.active -= 1
+
+    @asynccontextmanager
+    async def use(self, model: Optional[str] = None) -> AsyncIterator[ModelEntry]:
+        entry = await self.acquire(model)
+        try:
+            yield entry
+        finally:
+            self.release(entry)
+
+    async def aclose(self) -> None:
+        for task in list(self._loading.values()):
+            task.cancel()
+        while self._entries:
+            _, entry = self._entries.popitem(last=False)
+            await self._unload(entry)
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "default_model": self.default_model,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "loads": self._loads,
+            "coalesced_loads": self._coalesced,
+            "evictions": self._evictions,
+            "loading": sorted(self._loading),
+            "models": {
+                name: {
+                    "bytes": entry.size,
+                    "active": entry.active,
+                    "requests": entry.requests,
+                    "loaded_at": entry.loaded_at,
+                    "batching": entry.scheduler.stats(),
+                }
+                for name, entry in self._entries.items()
+            },
+        }
+
+    def _new_runner(self, name: str) -> YoloRunner:
+        return YoloRunner(
+            name,
+            confidence=self.confidence,
+            backend=self.backend,
+            backend_options=self.backend_options,
+            decode_size=self.decode_size,
+        )
+
+    async def _load(self, name: str) -> ModelEntry:
+        runner = self._new_runner(name)
+        started = time.perf_counter()
+        await self.pool.submit(runner.load)
+        scheduler = BatchScheduler(
+            runner,
+            self.pool,
+            max_batch_size=self.max_batch_size,
+            max_wait_ms=self.max_wait_ms,
+        )
+        scheduler.start()
+        entry = ModelEntry(runner, scheduler, runner.memory_bytes())
+        self._entries[name] = entry
+        self._bytes += entry.size
+        self._loads += 1
+        logger.info(
+            "Loaded YOLO model %s (%.1f MiB) in %.2fs",
+            name,
+            entry.size / 2**20,
+            time.perf_counter() - started,
+        )
+        await self._evict(keep=name)
+        return entry
+
+    async def _evict(self, keep: str) -> None:
+        for name in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                return
+            entry = self._entries.get(name)
+            if entry is None or name in (keep, self.default_model) or entry.active:
+                continue
+            del self._entries[name]
+            self._bytes -= entry.size
+            self._evictions += 1
+            logger.info("Evicting YOLO model %s to stay within the memory budget", name)
+            await self._unload(entry)
+        if self._bytes > self.max_bytes:
+            logger.warning(
+                "YOLO models use %.1f MiB, above the %.1f MiB budget; all are in use",
+                self._bytes / 2**20,
+                self.max_bytes / 2**20,
+            )
+
+    @staticmethod
+    async def _unload(entry: ModelEntry) -> None:
+        await entry.scheduler.stop()
+        entry.runner.close()
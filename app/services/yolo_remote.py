@@ -0,0 +1,586 @@
+"""A dedicated YOLO inference process shared by several HTTP workers.
+
+With ``uvicorn --workers N`` every worker would otherwise load its own
+weights and torch runtime. Instead one process, started with
+``python -m app.services.yolo_remote``, owns the models. Each HTTP worker
+decodes images itself, copies the pixels into a shared-memory ring it
+created and sends only slot numbers and shapes over a Unix-socket
+connection. The inference process batches requests from all workers into
+one forward pass per model and sends the (small) detections back. The
+socket is only accessible to its owner and connections must present the
+shared ``YOLO_INFERENCE_AUTHKEY``.
+
+In a worker this is just another backend (``create_backend("remote")``), so
+the registry, micro-batching, tiling and batch endpoints work unchanged::
+
+    export YOLO_INFERENCE_ADDRESS=/tmp/yolo-inference.sock
+    export YOLO_INFERENCE_AUTHKEY=$(openssl rand -hex 32)
+    python -m app.services.yolo_remote --preload &
+    uvicorn app.main:app --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from multiprocessing import AuthenticationError, shared_memory
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.services.cancellation import work_abandoned
+from app.services.yolo_runner import Detections, YoloRunner
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOTS = 8
+DEFAULT_SLOT_BYTES = 8 * 1024 * 1024
+DEFAULT_TIMEOUT = 60.0
+
+# How often a waiting worker thread checks whether its callers gave up.
+_POLL_SECONDS = 0.05
+
+_HELLO = "hello"
+_PREDICT = "predict"
+_RESULT = "result"
+_ERROR = "error"
+_CANCEL = "cancel"
+_BYE = "bye"
+
+# ("shm", slot, shape, dtype) for a frame in the ring, ("inline", array) otherwise.
+Frame = Tuple[Any, ...]
+
+
+class RemoteInferenceError(RuntimeError):
+    """Raised in a worker when the inference process failed a request."""
+
+
+class FrameRing:
+    """Fixed-size frame slots in a shared-memory block owned by one worker.
+
+    Slots are taken without blocking: a frame that does not fit, or arrives
+    while every slot is in flight, is sent inline over the connection
+    instead, so a large batch can never deadlock waiting for its own slots.
+    """
+
+    def __init__(self, slots: int = DEFAULT_SLOTS, slot_bytes: int = DEFAULT_SLOT_BYTES) -> None:
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self._free = list(range(slots))
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, image: np.ndarray) -> Frame:
+        if image.nbytes <= self.slot_bytes:
+            with self._lock:
+                slot = self._free.pop() if self._free else None
+            if slot is not None:
+                target = np.ndarray(
+                    image.shape, image.dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes
+                )
+                target[...] = image
+                return ("shm", slot, image.shape, image.dtype.str)
+        return ("inline", image)
+
+    def release(self, frames: Sequence[Frame]) -> None:
+        with self._lock:
+            self._free.extend(frame[1] for frame in frames if frame[0] == "shm")
+
+    def close(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    block = shared_memory.SharedMemory(name=name)
+    # Before Python 3.13, attaching registers the block with this process's
+    # resource tracker, which would unlink it (under the worker) on exit.
+    try:
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(block._name, "shared_memory")  # type: ignore[attr-defined]
+    except Exception:  # noqa: BLE001 - best effort; only affects cleanup
+        pass
+    return block
+
+
+class RemoteClient:
+    """One worker's connection and frame ring, shared by all its models."""
+
+    def __init__(
+        self,
+        address: str,
+        *,
+        authkey: bytes,
+        slots: int = DEFAULT_SLOTS,
+        slot_bytes: int = DEFAULT_SLOT_BYTES,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ) -> None:
+        self.conn: Connection = Client(address, family="AF_UNIX", authkey=authkey)
+        self.timeout = timeout
+        self.ring = FrameRing(slots, slot_bytes)
+        try:
+            self.conn.send((_HELLO, self.ring.name, slot_bytes))
+        except OSError:
+            self.conn.close()
+            self.ring.close()
+            raise
+        self.closed = False
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Tuple["Future[List[Detections]]", List[Frame]]] = {}
+        self._reader = threading.Thread(target=self._read, name="yolo-remote", daemon=True)
+        self._reader.start()
+
+    def predict(
+        self, model: str, images: Sequence[np.ndarray], confidence: float
+    ) -> List[Detections]:
+        """Run ``images`` remotely and wait for their detections.
+
+        Waits at most ``timeout`` seconds, and stops early once every caller
+        of the current pool job has gone (see :func:`abandon_when`). Either
+        way the request is cancelled in the inference process and
+        ``TimeoutError`` raised; its frame slots are freed when the process
+        acknowledges.
+        """
+
+        frames = [self.ring.write(image) for image in images]
+        future: "Future[List[Detections]]" = Future()
+        with self._lock:
+            if self.closed:
+                self.ring.release(frames)
+                raise ConnectionError("Inference process disconnected.")
+            request_id = next(self._ids)
+            self._pending[request_id] = (future, frames)
+            try:
+                self.conn.send((_PREDICT, request_id, model, confidence, frames))
+            except (OSError, ValueError) as exc:
+                self._pending.pop(request_id)
+                self.ring.release(frames)
+                raise ConnectionError("Inference process disconnected.") from exc
+        try:
+            return self._wait(future)
+        except TimeoutError:
+            future.cancel()
+            with self._lock:
+                if not self.closed:
+                    try:
+                        self.conn.send((_CANCEL, request_id))
+                    except (OSError, ValueError):
+                        pass  # The reader fails the request when the connection drops.
+            raise
+
+    def _wait(self, future: "Future[List[Detections]]") -> List[Detections]:
+        expires = time.monotonic() + self.timeout if self.timeout is not None else None
+        while True:
+            wait = _POLL_SECONDS
+            if expires is not None:
+                wait = max(0.0, min(wait, expires - time.monotonic()))
+            try:
+                return future.result(wait)
+            except FutureTimeout:
+                if work_abandoned():
+                    raise TimeoutError("Every caller gave up waiting for inference.") from None
+                if expires is not None and time.monotonic() >= expires:
+                    raise TimeoutError(
+                        f"Inference process did not answer within {self.timeout:g}s."
+                    ) from None
+
+    def close(self) -> None:
+        # The server closes its end on bye, which ends the reader's recv().
+        with self._lock:
+            if not self.closed:
+                try:
+                    self.conn.send((_BYE,))
+                except (OSError, ValueError):
+                    pass
+        self._reader.join(timeout=5)
+        self.conn.close()
+        try:
+            self.ring.close()
+        except BufferError:
+            pass
+
+    def _read(self) -> None:
+        try:
+            while True:
+                kind, request_id, payload = self.conn.recv()
+                with self._lock:
+                    future, frames = self._pending.pop(request_id)
+                self.ring.release(frames)
+                if future.cancelled():
+                    continue
+                if kind == _RESULT:
+                    future.set_result(payload)
+                else:
+                    future.set_exception(RemoteInferenceError(payload))
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self.closed = True
+                pending, self._pending = self._pending, {}
+            for future, frames in pending.values():
+                self.ring.release(frames)
+                if not future.cancelled():
+                    future.set_exception(ConnectionError("Inference process disconnected."))
+
+
+_clients: Dict[str, RemoteClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(address: str, **options: Any) -> RemoteClient:
+    """The process-wide client for ``address``, reconnecting if it dropped."""
+
+    with _clients_lock:
+        client = _clients.get(address)
+        if client is not None and not client.closed:
+            return client
+        if client is not None:
+            del _clients[address]
+            client.close()
+        try:
+            client = _clients[address] = RemoteClient(address, **options)
+        except (OSError, AuthenticationError) as exc:
+            raise ConnectionError(f"Inference process unavailable at {address}: {exc}") from exc
+        return client
+
+
+def close_clients() -> None:
+    """Disconnect and free every shared-memory ring of this process."""
+
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+class RemoteBackend:
+    """Backend that forwards forward passes to the shared inference process."""
+
+    def __init__(
+        self,
+        model_name: str,
+        *,
+        address: str,
+        authkey: Optional[str],
+        slots: int = DEFAULT_SLOTS,
+        slot_bytes: int = DEFAULT_SLOT_BYTES,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ) -> None:
+        if not authkey:
+            raise ValueError("Remote inference needs YOLO_INFERENCE_AUTHKEY to be set.")
+        self.model_name = model_name
+        self.address = address
+        self.options = {
+            "authkey": authkey.encode(),
+            "slots": slots,
+            "slot_bytes": slot_bytes,
+            "timeout": timeout,
+        }
+        # Connect now so an unreachable inference process fails the load.
+        get_client(address, **self.options)
+
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]:
+        if not images:
+            return []
+        return get_client(self.address, **self.options).predict(
+            self.model_name, images, confidence
+        )
+
+    def memory_bytes(self) -> int:
+        # The weights live in the inference process, which budgets them itself.
+        return 0
+
+    def close(self) -> None:
+        # The connection is shared by every model of this worker.
+        pass
+
+
+class _Peer:
+    """One connected HTTP worker, as seen by the inference process."""
+
+    def __init__(self, conn: Connection) -> None:
+        self.conn = conn
+        self.ring: Optional[shared_memory.SharedMemory] = None
+        self.slot_bytes = 0
+        self._queued: Set[int] = set()
+        self._cancelled: Set[int] = set()
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+
+    def enqueue(self, request_id: int) -> None:
+        with self._lock:
+            self._queued.add(request_id)
+
+    def cancel(self, request_id: int) -> None:
+        # A request that already ran has been answered; nothing to skip.
+        with self._lock:
+            if request_id in self._queued:
+                self._cancelled.add(request_id)
+
+    def start(self, request_id: int) -> bool:
+        """Dequeue ``request_id``; False if the worker stopped waiting for it."""
+
+        with self._lock:
+            self._queued.discard(request_id)
+            if request_id in self._cancelled:
+                self._cancelled.discard(request_id)
+                return False
+            return True
+
+    def frames(self, frames: Sequence[Frame]) -> List[np.ndarray]:
+        images = []
+        for frame in frames:
+            if frame[0] == "inline":
+                images.append(frame[1])
+                continue
+            if self.ring is None:
+                raise RuntimeError("Frame slot used before the ring was announced.")
+            _, slot, shape, dtype = frame
+            images.append(
+                np.ndarray(shape, np.dtype(dtype), buffer=self.ring.buf, offset=slot * self.slot_bytes)
+            )
+        return images
+
+    def send(self, message: Tuple[Any, ...]) -> None:
+        with self._send_lock:
+            try:
+                self.conn.send(message)
+            except (OSError, ValueError):
+                pass  # The worker went away; its reader cleans up.
+
+    def close(self) -> None:
+        self.conn.close()
+        if self.ring is not None:
+            try:
+                self.ring.close()
+            except BufferError:
+                pass  # Views still queued for inference; freed with them.
+
+
+@dataclass
+class _Job:
+    peer: _Peer
+    request_id: int
+    model: str
+    confidence: float
+    images: List[np.ndarray]
+
+
+class InferenceServer:
+    """Own the models and batch requests from every connected worker.
+
+    One thread runs all forward passes, so the process uses the runtime's
+    own thread pool without the oversubscription of one model per worker.
+    Requests are gathered for up to ``max_wait_ms`` or ``max_batch_size``
+    images and run as one batch per model. Once the loaded weights exceed
+    ``max_bytes`` the least recently used models other than
+    ``default_model`` are unloaded, as in :class:`YoloRegistry`.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        *,
+        authkey: bytes,
+        confidence: float,
+        default_model: Optional[str] = None,
+        backend: str = "ultralytics",
+        backend_options: Optional[Dict[str, Any]] = None,
+        allowed: Optional[Sequence[str]] = None,
+        max_bytes: int = 1024 * 1024 * 1024,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        self.address = address
+        self.authkey = authkey
+        self.default_model = default_model
+        self.max_bytes = max_bytes
+        self.confidence = confidence
+        self.backend = backend
+        self.backend_options = dict(backend_options or {})
+        self.allowed = set(allowed) if allowed is not None else None
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._runners: "OrderedDict[str, YoloRunner]" = OrderedDict()
+        self._jobs: "queue.Queue[_Job]" = queue.Queue()
+
+    def runner(self, model: str) -> YoloRunner:
+        if self.allowed is not None and model not in self.allowed:
+            raise ValueError(f"Model '{model}' is not allowed.")
+        runner = self._runners.get(model)
+        if runner is not None:
+            self._runners.move_to_end(model)
+            return runner
+        runner = YoloRunner(
+            model,
+            confidence=self.confidence,
+            backend=self.backend,
+            backend_options=self.backend_options,
+        )
+        runner.load()
+        self._runners[model] = runner
+        self._evict(keep=model)
+        return runner
+
+    def _evict(self, keep: str) -> None:
+        # Forward passes all run on the batch thread, so no other model is in use.
+        used = sum(runner.memory_bytes() for runner in self._runners.values())
+        for name in list(self._runners):
+            if used <= self.max_bytes:
+                break
+            if name in (keep, self.default_model):
+                continue
+            runner = self._runners.pop(name)
+            used -= runner.memory_bytes()
+            runner.close()
+            logger.info("Unloaded %s to stay within the model memory budget", name)
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.address):
+            os.unlink(self.address)  # Stale socket from a previous run.
+        # Create the socket owner-only rather than chmod it after the bind.
+        umask = os.umask(0o177)
+        try:
+            listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(umask)
+        threading.Thread(target=self._batch_loop, name="yolo-inference", daemon=True).start()
+        logger.info("YOLO inference process listening on %s", self.address)
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, EOFError, ConnectionError) as exc:
+                    logger.warning("Rejected inference connection: %s", exc)
+                    continue
+                peer = _Peer(conn)
+                threading.Thread(target=self._read, args=(peer,), daemon=True).start()
+        finally:
+            listener.close()
+
+    def _read(self, peer: _Peer) -> None:
+        try:
+            while True:
+                message = peer.conn.recv()
+                if message[0] == _BYE:
+                    return
+                if message[0] == _HELLO:
+                    _, name, slot_bytes = message
+                    peer.ring, peer.slot_bytes = _attach(name), slot_bytes
+                    logger.info("Worker connected with frame ring %s", name)
+                elif message[0] == _PREDICT:
+                    _, request_id, model, confidence, frames = message
+                    try:
+                        images = peer.frames(frames)
+                    except (RuntimeError, TypeError, ValueError) as exc:
+                        peer.send((_ERROR, request_id, str(exc)))
+                        continue
+                    peer.enqueue(request_id)
+                    self._jobs.put(_Job(peer, request_id, model, confidence, images))
+                elif message[0] == _CANCEL:
+                    peer.cancel(message[1])
+        except (EOFError, OSError):
+            pass
+        finally:
+            peer.close()
+
+    def _batch_loop(self) -> None:
+        while True:
+            jobs = [self._jobs.get()]
+            images = len(jobs[0].images)
+            deadline = time.monotonic() + self.max_wait
+            while images < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    jobs.append(self._jobs.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                images += len(jobs[-1].images)
+            by_model: Dict[str, List[_Job]] = {}
+            for job in jobs:
+                by_model.setdefault(job.model, []).append(job)
+            for model, group in by_model.items():
+                self._run(model, group)
+
+    def _run(self, model: str, jobs: List[_Job]) -> None:
+        live = []
+        for job in jobs:
+            if job.peer.start(job.request_id):
+                live.append(job)
+            else:
+                # Still answered, so the worker frees the frame slots.
+                job.peer.send((_ERROR, job.request_id, "Cancelled."))
+        jobs = live
+        if not jobs:
+            return
+        images = [image for job in jobs for image in job.images]
+        confidences = [job.confidence for job in jobs for _ in job.images]
+        try:
+            predictions = self.runner(model).detect_batch(images, confidences)
+        except Exception as exc:  # noqa: BLE001 - reported to each waiting worker
+            logger.exception("Inference failed for %s", model)
+            for job in jobs:
+                job.peer.send((_ERROR, job.request_id, f"{type(exc).__name__}: {exc}"))
+            return
+        offset = 0
+        for job in jobs:
+            count = len(job.images)
+            job.peer.send((_RESULT, job.request_id, predictions[offset : offset + count]))
+            offset += count
+
+
+def main() -> None:
+    from app.config import get_settings
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the shared YOLO inference process.")
+    parser.add_argument(
+        "--address",
+        default=settings.yolo_inference_address,
+        required=settings.yolo_inference_address is None,
+        help="Unix socket path (default: YOLO_INFERENCE_ADDRESS)",
+    )
+    parser.add_argument("--preload", action="store_true", help="Load the default model first")
+    args = parser.parse_args()
+    if not settings.yolo_inference_authkey:
+        parser.error("YOLO_INFERENCE_AUTHKEY must be set to a secret shared with the HTTP workers")
+    logging.basicConfig(level=logging.INFO)
+
+    server = InferenceServer(
+        args.address,
+        authkey=settings.yolo_inference_authkey.encode(),
+        confidence=settings.yolo_confidence,
+        default_model=settings.yolo_model,
+        backend=settings.yolo_backend,
+        backend_options=settings.yolo_backend_options,
+        allowed=settings.yolo_model_allowlist,
+        max_bytes=settings.yolo_models_max_bytes,
+        max_batch_size=settings.yolo_max_batch_size,
+        max_wait_ms=settings.yolo_max_batch_wait_ms,
+    )
+    if args.preload:
+        server.runner(settings.yolo_model)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
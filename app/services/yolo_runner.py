@@ -1,60 +1,473 @@
-"""Utilities for running Ultralytics YOLO predictions."""
+"""Utilities for running YOLO predictions.
+
+The model itself runs behind a pluggable backend (see
+:mod:`app.services.yolo_backends`). ``ultralytics`` (and with it torch),
+``onnxruntime`` and ``cv2`` are imported on first use, so importing this
+module stays cheap on nodes that never run YOLO.
+"""
 
 from __future__ import annotations
 
-from typing import List, Optional
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
-import cv2
 import numpy as np
-from ultralytics import YOLO
+
+from app.services.cancellation import abandon_when
+from app.services.inference_pool import InferencePool
+from app.services.metrics import (
+    YOLO_BATCH_SIZE,
+    YOLO_DROPPED,
+    YOLO_IMAGES,
+    YOLO_STAGE,
+    record_stage,
+)
+
+if TYPE_CHECKING:
+    from app.services.yolo_backends import YoloBackend
+
+# Raw encoded image: ``bytes`` or a zero-copy view of an upload.
+ImageData = Union[bytes, bytearray, memoryview]
+# ``(sx, sy)`` multipliers mapping boxes on a decoded image back to the source.
+Scale = Tuple[float, float]
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, ...).
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(data: ImageData) -> Optional[Tuple[int, int]]:
+    """``(height, width)`` from a JPEG header, or ``None`` if ``data`` is not a JPEG."""
+
+    view = memoryview(data).cast("B")
+    if len(view) < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+    offset = 2
+    while offset + 9 <= len(view):
+        if view[offset] != 0xFF:
+            return None
+        marker = view[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        length = (view[offset + 2] << 8) | view[offset + 3]
+        if marker in _SOF_MARKERS:
+            height = (view[offset + 5] << 8) | view[offset + 6]
+            width = (view[offset + 7] << 8) | view[offset + 8]
+            return (height, width) if height and width else None
+        offset += 2 + length
+    return None
+
+
+@dataclass
+class Detections:
+    """Columnar detections for one image: ``N`` labels, scores and boxes.
+
+    ``track_ids`` is set only for tracked video frames.
+    """
+
+    labels: np.ndarray
+    scores: np.ndarray
+    boxes: np.ndarray
+    track_ids: Optional[np.ndarray] = None
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(
+            labels=np.empty(0, dtype=object),
+            scores=np.empty(0, dtype=np.float32),
+            boxes=np.empty((0, 4), dtype=np.float32),
+        )
+
+    @classmethod
+    def from_result(cls, result: Any) -> "Detections":
+        """Convert an Ultralytics result with one device-to-host copy.
+
+        ``boxes.data`` rows are ``[x1, y1, x2, y2, (track_id,) conf, cls]``.
+        """
+
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return cls.empty()
+        data = boxes.data.cpu().numpy()
+        class_ids = data[:, -1].astype(np.int64)
+        tracked = data.shape[1] == 7
+        names = result.names or {}
+        table = np.array(
+            [names.get(i, str(i)) for i in range(int(class_ids.max()) + 1)], dtype=object
+        )
+        return cls(
+            labels=table[class_ids],
+            scores=data[:, -2].astype(np.float32),
+            boxes=data[:, :4].astype(np.float32),
+            track_ids=data[:, 4].astype(np.int64) if tracked else None,
+        )
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def rescale(self, scale: Scale) -> "Detections":
+        """Map boxes from a downscaled decode back to source pixels."""
+
+        if scale == (1.0, 1.0) or not len(self):
+            return self
+        factors = np.array([scale[0], scale[1], scale[0], scale[1]], dtype=np.float32)
+        return Detections(self.labels, self.scores, self.boxes * factors, self.track_ids)
+
+    def filter(self, confidence: float) -> "Detections":
+        keep = self.scores >= confidence
+        if keep.all():
+            return self
+        return Detections(
+            self.labels[keep],
+            self.scores[keep],
+            self.boxes[keep],
+            None if self.track_ids is None else self.track_ids[keep],
+        )
+
+    def to_dicts(self) -> List[dict]:
+        rows = [
+            {"label": label, "confidence": score, "box": box}
+            for label, score, box in zip(
+                self.labels.tolist(), self.scores.tolist(), self.boxes.tolist()
+            )
+        ]
+        if self.track_ids is not None:
+            for row, track_id in zip(rows, self.track_ids.tolist()):
+                row["track_id"] = track_id
+        return rows
+
+    def to_columns(self) -> Dict[str, list]:
+        columns = {
+            "labels": self.labels.tolist(),
+            "scores": self.scores.tolist(),
+            "boxes": self.boxes.tolist(),
+        }
+        if self.track_ids is not None:
+            columns["track_ids"] = self.track_ids.tolist()
+        return columns
 
 
 class YoloRunner:
-    """Lazy-loading wrapper around the Ultralytics YOLO model."""
+    """Lazy-loading wrapper around a YOLO inference backend.
 
-    def __init__(self, model_name: str, *, confidence: float = 0.35) -> None:
+    ``backend`` names one of :data:`app.services.yolo_backends.BACKENDS`;
+    ``backend_options`` are passed to its constructor. With ``decode_size``
+    set, :meth:`decode` shrinks JPEGs at least twice that size on their long
+    side by 1/2, 1/4 or 1/8 inside the decoder, since the model would
+    downscale them to about that size anyway.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        *,
+        confidence: float = 0.35,
+        backend: str = "ultralytics",
+        backend_options: Optional[Dict[str, Any]] = None,
+        decode_size: Optional[int] = None,
+    ) -> None:
         self.model_name = model_name
         self.confidence = confidence
-        self._model: Optional[YOLO] = None
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.decode_size = decode_size
+        self._backend: Optional[YoloBackend] = None
+
+    def load(self) -> YoloBackend:
+        if self._backend is None:
+            from app.services.yolo_backends import create_backend
 
-    def load(self) -> YOLO:
-        if self._model is None:
-            self._model = YOLO(self.model_name)
-        return self._model
+            self._backend = create_backend(self.backend, self.model_name, **self.backend_options)
+        return self._backend
+
+    def memory_bytes(self) -> int:
+        """Approximate resident size of the loaded weights (0 if not loaded)."""
+
+        return self._backend.memory_bytes() if self._backend is not None else 0
 
     def close(self) -> None:
-        self._model = None
-
-    def detect(self, image_bytes: bytes, confidence: Optional[float] = None) -> List[dict]:
-        model = self.load()
-        conf = confidence if confidence is not None else self.confidence
-        image = self._decode_image(image_bytes)
-        results = model.predict(source=image, conf=conf, verbose=False)
-
-        detections: List[dict] = []
-        for result in results:
-            boxes = result.boxes
-            names = result.names or {}
-            if boxes is None:
-                continue
-            for box in boxes:
-                cls_id = int(box.cls[0]) if box.cls is not None else -1
-                label = names.get(cls_id, str(cls_id))
-                score = float(box.conf[0]) if box.conf is not None else 0.0
-                x1, y1, x2, y2 = map(float, box.xyxy[0].tolist())
-                detections.append(
-                    {
-                        "label": label,
-                        "confidence": score,
-                        "box": [x1, y1, x2, y2],
-                    }
-                )
-        return detections
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+
+    def detect(self, image_bytes: ImageData, confidence: Optional[float] = None) -> List[dict]:
+        image, scale = self.decode(image_bytes)
+        return self.detect_batch([image], [confidence])[0].rescale(scale).to_dicts()
+
+    def detect_batch(
+        self,
+        images: Sequence[np.ndarray],
+        confidences: Sequence[Optional[float]],
+    ) -> List[Detections]:
+        """Run one batched forward pass and return each image's detections.
+
+        The batch is predicted at the lowest requested threshold and each
+        image is then filtered to its own; NMS only lets higher-scoring boxes
+        suppress lower ones, so this matches per-image predictions.
+        """
+
+        if not images:
+            return []
+        backend = self.load()
+        confs = [c if c is not None else self.confidence for c in confidences]
+        started = time.perf_counter()
+        predictions = backend.predict(images, min(confs))
+        YOLO_STAGE.observe(time.perf_counter() - started, model=self.model_name, stage="predict")
+        YOLO_BATCH_SIZE.observe(len(images), model=self.model_name)
+        YOLO_IMAGES.inc(len(images), model=self.model_name)
+        return [detections.filter(conf) for detections, conf in zip(predictions, confs)]
+
+    def detect_tiled(
+        self,
+        image: np.ndarray,
+        confidence: Optional[float] = None,
+        *,
+        tile_size: int = 640,
+        overlap: float = 0.2,
+        merge: str = "nms",
+        merge_threshold: float = 0.5,
+    ) -> Detections:
+        """Detect on overlapping tiles plus the whole image in one batch.
+
+        The whole-image pass keeps objects larger than a tile; the tiles
+        recover small objects that vanish when the image is downscaled.
+        """
+
+        from app.services.yolo_tiling import (
+            cut_tiles,
+            merge_detections,
+            offset_detections,
+            tile_windows,
+        )
+
+        height, width = image.shape[:2]
+        windows = tile_windows(height, width, tile_size, overlap)
+        if len(windows) > 1:
+            windows = np.vstack([windows, [[0, 0, width, height]]])
+        tiles = cut_tiles(image, windows)
+        per_tile = self.detect_batch(tiles, [confidence] * len(tiles))
+        labels, scores, boxes, clipped = offset_detections(per_tile, windows, (height, width))
+        return merge_detections(
+            labels, scores, boxes, clipped, method=merge, threshold=merge_threshold
+        )
+
+    def decode(self, image_bytes: ImageData) -> Tuple[np.ndarray, Scale]:
+        """Decode for inference; returns the image and the scale back to the source."""
+
+        started = time.perf_counter()
+        try:
+            return self._decode_reduced(image_bytes)
+        finally:
+            YOLO_STAGE.observe(time.perf_counter() - started, model=self.model_name, stage="decode")
+
+    def _decode_reduced(self, image_bytes: ImageData) -> Tuple[np.ndarray, Scale]:
+        size = jpeg_size(image_bytes) if self.decode_size else None
+        factor = 1
+        if size is not None:
+            while factor < 8 and max(size) // (factor * 2) >= self.decode_size:
+                factor *= 2
+        if factor == 1:
+            return self.decode_image(image_bytes), (1.0, 1.0)
+
+        import cv2
+
+        flag = getattr(cv2, f"IMREAD_REDUCED_COLOR_{factor}")
+        image = self.decode_image(image_bytes, flag)
+        height, width = size
+        if image.shape[0] < image.shape[1] and height > width:
+            # EXIF orientation rotated the image during decode.
+            height, width = width, height
+        return image, (width / image.shape[1], height / image.shape[0])
 
     @staticmethod
-    def _decode_image(image_bytes: bytes) -> np.ndarray:
-        array = np.frombuffer(image_bytes, dtype=np.uint8)
-        image = cv2.imdecode(array, cv2.IMREAD_COLOR)
+    def decode_image(image_bytes: ImageData, flag: Optional[int] = None) -> np.ndarray:
+        """Decode at full resolution; ``flag`` is a ``cv2.IMREAD_*`` mode."""
+
+        import cv2
+
+        # No local reference to the array: a failed decode's traceback would
+        # otherwise keep the upload buffer exported after the request ends.
+        image = cv2.imdecode(
+            np.frombuffer(image_bytes, dtype=np.uint8),
+            cv2.IMREAD_COLOR if flag is None else flag,
+        )
         if image is None:
             raise ValueError("Unable to decode image bytes. Ensure a valid image file is provided.")
         return image
+
+
+# Seconds spent per stage by the batch an image was part of.
+StageTimes = Dict[str, float]
+_Pending = Tuple[ImageData, Optional[float], "asyncio.Future[Tuple[Detections, StageTimes]]"]
+
+
+class BatchScheduler:
+    """Coalesce concurrent single-image requests into batched predictions.
+
+    Requests are collected until ``max_batch_size`` images are waiting or
+    ``max_wait_ms`` has passed since the first one arrived, whichever comes
+    first. Each batch is decoded and predicted as one job on the inference
+    pool, so pool backpressure applies per batch. Images whose caller was
+    cancelled (e.g. the client disconnected) are dropped before dispatch
+    and again before decoding, so abandoned requests cost no inference.
+    """
+
+    def __init__(
+        self,
+        runner: YoloRunner,
+        pool: InferencePool,
+        *,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.runner = runner
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "asyncio.Queue[_Pending]" = asyncio.Queue()
+        self._collector: Optional[asyncio.Task[None]] = None
+        self._inflight: set[asyncio.Task[None]] = set()
+        self._batches = 0
+        self._images = 0
+        self._dropped = 0
+
+    def start(self) -> None:
+        if self._collector is None:
+            self._collector = asyncio.create_task(self._collect_loop())
+
+    async def stop(self) -> None:
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def detect(
+        self, image_bytes: ImageData, confidence: Optional[float] = None
+    ) -> Detections:
+        """Queue one image for the next batch and wait for its detections."""
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[Tuple[Detections, StageTimes]]" = loop.create_future()
+        started = loop.time()
+        await self._queue.put((image_bytes, confidence, future))
+        detections, stages = await future
+        waited = loop.time() - started - sum(stages.values())
+        YOLO_STAGE.observe(max(waited, 0.0), model=self.runner.model_name, stage="queue")
+        record_stage("queue", max(waited, 0.0))
+        for stage, seconds in stages.items():
+            record_stage(stage, seconds)
+        return detections
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "waiting": self._queue.qsize(),
+            "batches": self._batches,
+            "images": self._images,
+            "avg_batch_size": (self._images / self._batches) if self._batches else 0.0,
+            "dropped": self._dropped,
+        }
+
+    async def _collect_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[_Pending]) -> None:
+        live = [item for item in batch if not item[2].cancelled()]
+        self._drop(len(batch) - len(live))
+        if not live:
+            return
+        batch = live
+        self._batches += 1
+        self._images += len(batch)
+        try:
+            outcomes, stages = await self.pool.submit(
+                self._run_batch,
+                [(data, conf, future.cancelled) for data, conf, future in batch],
+            )
+        except Exception as exc:  # noqa: BLE001 - every caller gets the failure
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self._drop(sum(outcome is None for outcome in outcomes))
+        for (_, _, future), outcome in zip(batch, outcomes):
+            if future.done() or outcome is None:
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result((outcome, stages))
+
+    def _drop(self, count: int) -> None:
+        if count:
+            self._dropped += count
+            YOLO_DROPPED.inc(count, model=self.runner.model_name)
+
+    def _run_batch(
+        self, items: List[Tuple[ImageData, Optional[float], Callable[[], bool]]]
+    ) -> Tuple[List[Union[Detections, Exception, None]], StageTimes]:
+        """Decode and predict a batch on a worker thread.
+
+        Undecodable images fail individually instead of failing the batch;
+        images cancelled while the batch waited for a worker are skipped and
+        come back as ``None``; a remote prediction stops waiting once all of
+        them are. Also returns the batch's decode and predict time for
+        ``Server-Timing``.
+        """
+
+        started = time.perf_counter()
+        outcomes: List[Union[Detections, Exception, None]] = []
+        images: List[np.ndarray] = []
+        scales: List[Scale] = []
+        confidences: List[Optional[float]] = []
+        slots: List[int] = []
+        waiting: List[Callable[[], bool]] = []
+        for data, conf, cancelled in items:
+            # Reading a future's state from this thread is safe; only
+            # completing it has to happen on the event loop.
+            if cancelled():
+                outcomes.append(None)
+                continue
+            try:
+                image, scale = self.runner.decode(data)
+            except ValueError as exc:
+                outcomes.append(exc)
+                continue
+            images.append(image)
+            scales.append(scale)
+            confidences.append(conf)
+            slots.append(len(outcomes))
+            waiting.append(cancelled)
+            outcomes.append(Detections.empty())
+        decoded = time.perf_counter()
+        with abandon_when(lambda: all(cancelled() for cancelled in waiting)):
+            predictions = self.runner.detect_batch(images, confidences)
+        for slot, detections, scale in zip(slots, predictions, scales):
+            outcomes[slot] = detections.rescale(scale)
+        stages = {"decode": decoded - started, "predict": time.perf_counter() - decoded}
+        return outcomes, stages
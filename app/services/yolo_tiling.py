@@ -0,0 +1,145 @@
+"""Tiled inference helpers for images much larger than the model input.
+
+Tiles are NumPy views into the decoded image, so cutting them copies
+nothing. Per-tile boxes are shifted back to image coordinates and merged
+with greedy class-aware NMS or weighted box fusion (WBF). Overlap is
+measured as intersection over the *smaller* box, so a box truncated by a
+tile edge still matches the full box from the neighbouring tile, and such
+truncated boxes give way to uncut ones when a group is merged.
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, List, Literal, Sequence, Tuple
+
+import numpy as np
+
+from app.services.yolo_runner import Detections
+
+MergeMethod = Literal["nms", "wbf"]
+
+# Pixels from a tile edge within which a box counts as cut off by the tile.
+_EDGE_TOLERANCE = 2.0
+
+
+def tile_windows(height: int, width: int, tile_size: int, overlap: float) -> np.ndarray:
+    """``(K, 4)`` ``x0, y0, x1, y1`` windows covering the image.
+
+    Consecutive tiles overlap by ``overlap`` of ``tile_size``; the last tile
+    in each direction is aligned to the image edge instead of padding.
+    """
+
+    if not 0.0 <= overlap < 1.0:
+        raise ValueError("overlap must be in [0, 1)")
+    stride = max(1, int(tile_size * (1.0 - overlap)))
+
+    def starts(length: int) -> np.ndarray:
+        if length <= tile_size:
+            return np.zeros(1, dtype=np.int64)
+        positions = np.arange(0, length - tile_size, stride)
+        return np.append(positions, length - tile_size)
+
+    ys, xs = np.meshgrid(starts(height), starts(width), indexing="ij")
+    x0, y0 = xs.ravel(), ys.ravel()
+    return np.stack(
+        [x0, y0, np.minimum(x0 + tile_size, width), np.minimum(y0 + tile_size, height)], axis=1
+    )
+
+
+def cut_tiles(image: np.ndarray, windows: np.ndarray) -> List[np.ndarray]:
+    """Zero-copy views of ``image`` for each window."""
+
+    return [image[y0:y1, x0:x1] for x0, y0, x1, y1 in windows.tolist()]
+
+
+def offset_detections(
+    detections: Sequence[Detections], windows: np.ndarray, shape: Tuple[int, int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Concatenate per-tile detections with boxes in image coordinates.
+
+    Also returns a mask of boxes touching a tile edge that is not an image
+    edge, i.e. boxes that were probably cut off by the tile.
+    """
+
+    counts = np.array([len(d) for d in detections], dtype=np.int64)
+    if not counts.sum():
+        empty = Detections.empty()
+        return empty.labels, empty.scores, empty.boxes, np.zeros(0, dtype=bool)
+    tile_bounds = np.repeat(windows.astype(np.float32), counts, axis=0)
+    boxes = np.concatenate([d.boxes for d in detections]) + tile_bounds[:, [0, 1, 0, 1]]
+    scores = np.concatenate([d.scores for d in detections])
+    labels = np.concatenate([d.labels for d in detections])
+    height, width = shape
+    interior = np.stack(
+        [
+            tile_bounds[:, 0] > 0,
+            tile_bounds[:, 1] > 0,
+            tile_bounds[:, 2] < width,
+            tile_bounds[:, 3] < height,
+        ],
+        axis=1,
+    )
+    touching = np.abs(boxes - tile_bounds) <= _EDGE_TOLERANCE
+    clipped = (touching & interior).any(axis=1)
+    return labels, scores, boxes, clipped
+
+
+def _groups(
+    boxes: np.ndarray, priority: np.ndarray, threshold: float
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Greedy clustering by priority: yield ``(best, members)`` index groups."""
+
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = priority.argsort(kind="stable")[::-1]
+    while order.size:
+        best, rest = order[0], order[1:]
+        inter_w = (np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest])).clip(0)
+        inter_h = (np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest])).clip(0)
+        overlap = inter_w * inter_h / (np.minimum(areas[best], areas[rest]) + 1e-9)
+        matched = overlap > threshold
+        yield int(best), np.concatenate(([best], rest[matched]))
+        order = rest[~matched]
+
+
+def merge_detections(
+    labels: np.ndarray,
+    scores: np.ndarray,
+    boxes: np.ndarray,
+    clipped: np.ndarray,
+    *,
+    method: MergeMethod = "nms",
+    threshold: float = 0.5,
+) -> Detections:
+    """Merge overlapping same-label boxes from different tiles.
+
+    NMS keeps the best uncut box of each group (falling back to the best
+    cut one); WBF averages the group's uncut boxes weighted by score.
+    """
+
+    if len(scores) == 0:
+        return Detections.empty()
+    # Scores are at most 1, so every uncut box outranks every cut one.
+    priority = scores - clipped.astype(scores.dtype) * 2.0
+    # Shift each label into its own coordinate range so groups never mix labels.
+    _, class_ids = np.unique(labels, return_inverse=True)
+    offsets = class_ids[:, None].astype(np.float32) * (float(boxes.max()) + 1.0)
+    keep: List[int] = []
+    fused_boxes: List[np.ndarray] = []
+    fused_scores: List[float] = []
+    for best, members in _groups(boxes + offsets, priority, threshold):
+        keep.append(best)
+        if method == "wbf":
+            uncut = members[~clipped[members]]
+            fused = uncut if uncut.size else members
+            weights = scores[fused]
+            fused_boxes.append((boxes[fused] * weights[:, None]).sum(axis=0) / weights.sum())
+            fused_scores.append(float(scores[members].mean()))
+    index = np.asarray(keep, dtype=np.int64)
+    if method == "wbf":
+        return Detections(
+            labels=labels[index],
+            scores=np.asarray(fused_scores, dtype=np.float32),
+            boxes=np.stack(fused_boxes).astype(np.float32),
+        )
+    return Detections(labels=labels[index], scores=scores[index], boxes=boxes[index])
@@ -0,0 +1,200 @@
+"""Pipelined video detection: threaded decode, frame sampling, batching, tracking.
+
+A producer thread decodes frames with ``cv2.VideoCapture`` into a bounded
+queue, the inference pool runs one batch at a time, and the event loop
+serializes the previous batch while the next one is being inferred, so
+decode, inference and output overlap.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Literal, Optional, Tuple
+
+import numpy as np
+
+from app.services.inference_pool import InferencePool, QueueFullError
+from app.services.yolo_runner import Detections
+
+SampleMode = Literal["stride", "keyframe"]
+TRACKERS = {"bytetrack": "bytetrack.yaml", "botsort": "botsort.yaml"}
+
+_END = object()
+
+
+@dataclass
+class VideoFrame:
+    index: int
+    timestamp_ms: float
+    keyframe: bool
+    image: np.ndarray
+
+
+class VideoOpenError(ValueError):
+    """Raised when a video cannot be opened or decoded."""
+
+
+class FrameReader:
+    """Decode sampled frames on a background thread into a bounded queue.
+
+    ``sample="stride"`` keeps every ``stride``-th frame; ``"keyframe"`` keeps
+    every ``stride``-th keyframe. Skipped frames are only grabbed, never
+    retrieved: with the FFmpeg backend ``grab()`` still decodes every frame,
+    so skipping saves the colour conversion, the copy into a NumPy array
+    and inference, not the video decode itself.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        stride: int = 1,
+        sample: SampleMode = "stride",
+        max_frames: Optional[int] = None,
+        buffer_size: int = 32,
+    ) -> None:
+        if stride < 1:
+            raise ValueError("stride must be at least 1")
+        self.path = path
+        self.stride = stride
+        self.sample = sample
+        self.max_frames = max_frames
+        self.decoded = 0
+        self.grabbed = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=buffer_size)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="video-decode", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def read_batch(self, size: int) -> List[VideoFrame]:
+        """Block for up to ``size`` frames; an empty list means the video ended."""
+
+        frames: List[VideoFrame] = []
+        while len(frames) < size:
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    break
+                continue
+            if item is _END:
+                # Leave the marker for the next call.
+                self._queue.put(_END)
+                break
+            if isinstance(item, Exception):
+                raise item
+            frames.append(item)
+        return frames
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self) -> None:
+        import cv2
+
+        capture = cv2.VideoCapture(self.path)
+        try:
+            if not capture.isOpened():
+                self._put(VideoOpenError("Unable to open video. Ensure a valid video is provided."))
+                return
+            index = -1
+            candidates = 0
+            kept = 0
+            while not self._stop.is_set():
+                if self.max_frames is not None and kept >= self.max_frames:
+                    break
+                if not capture.grab():
+                    break
+                index += 1
+                self.grabbed += 1
+                keyframe = bool(capture.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME))
+                if self.sample == "keyframe" and not keyframe:
+                    continue
+                candidates += 1
+                if (candidates - 1) % self.stride:
+                    continue
+                ok, image = capture.retrieve()
+                if not ok:
+                    break
+                self.decoded += 1
+                kept += 1
+                frame = VideoFrame(index, capture.get(cv2.CAP_PROP_POS_MSEC), keyframe, image)
+                if not self._put(frame):
+                    return
+        except Exception as exc:  # noqa: BLE001 - surfaced to the consumer
+            self._put(exc)
+            return
+        finally:
+            capture.release()
+        self._put(_END)
+
+
+class VideoTracker:
+    """A private Ultralytics model whose predictor keeps tracker state.
+
+    Trackers live on the predictor, so each video needs its own model
+    instance rather than the shared one from the registry.
+    """
+
+    def __init__(self, model_name: str, tracker: str = "bytetrack") -> None:
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_name)
+        self.tracker = TRACKERS[tracker]
+
+    def track(self, images: List[np.ndarray], confidence: float) -> List[Detections]:
+        results = self.model.track(
+            source=images, conf=confidence, persist=True, tracker=self.tracker, verbose=False
+        )
+        return [Detections.from_result(result) for result in results]
+
+
+async def submit_waiting(pool: InferencePool, fn: Callable[..., Any], *args: Any) -> Any:
+    # A video job should wait for capacity rather than fail half-way through.
+    while True:
+        try:
+            return await pool.submit(fn, *args)
+        except QueueFullError as exc:
+            await asyncio.sleep(min(exc.retry_after, 1))
+
+
+async def stream_video(
+    reader: FrameReader,
+    infer: Callable[[List[np.ndarray]], Awaitable[List[Detections]]],
+    *,
+    batch_size: int = 8,
+) -> AsyncIterator[Tuple[VideoFrame, Detections]]:
+    """Yield ``(frame, detections)`` in order, one batch inferring ahead."""
+
+    reader.start()
+    task: Optional["asyncio.Task[List[Detections]]"] = None
+    try:
+        frames = await asyncio.to_thread(reader.read_batch, batch_size)
+        if frames:
+            task = asyncio.ensure_future(infer([frame.image for frame in frames]))
+        while task is not None:
+            results = await task
+            current, task = frames, None
+            frames = await asyncio.to_thread(reader.read_batch, batch_size)
+            if frames:
+                task = asyncio.ensure_future(infer([frame.image for frame in frames]))
+            for frame, detections in zip(current, results):
+                yield frame, detections
+    finally:
+        reader.stop()
+        if task is not None:
+            task.cancel()
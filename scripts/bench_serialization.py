@@ -0,0 +1,160 @@
+"""Measure per-request response serialization overhead, before and after the fast path.
+
+"before" builds the response models and lets FastAPI validate and serialize
+them against ``response_model``, parsing upstream JSON via text as
+``httpx.Response.json()`` does. "after" is what the routers do now:
+detections and vectors are encoded directly, and upstream JSON is parsed
+once from bytes and validated once. Both variants run through a real
+FastAPI app over ASGI with no network, so the numbers include routing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, List, Tuple, Union
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, Response
+
+from app.schemas.ollama import EmbedResponse, GenerateResponse
+from app.schemas.yolo import ColumnarDetectionResponse, DetectionResponse
+from app.services.responses import FastJSONResponse, loads, model_response
+from app.services.yolo_runner import Detections
+
+DETECT_MODEL = Union[DetectionResponse, ColumnarDetectionResponse]
+
+
+def make_detections(count: int, seed: int = 0) -> Detections:
+    rng = np.random.default_rng(seed)
+    corners = rng.uniform(0, 600, size=(count, 2)).astype(np.float32)
+    sizes = rng.uniform(5, 200, size=(count, 2)).astype(np.float32)
+    return Detections(
+        labels=np.array(rng.choice(["person", "car", "dog"], count).tolist(), dtype=object),
+        scores=rng.uniform(0.35, 1.0, count).astype(np.float32),
+        boxes=np.hstack([corners, corners + sizes]),
+    )
+
+
+def upstream_generate(tokens: int) -> bytes:
+    return json.dumps(
+        {
+            "model": "phi3",
+            "created_at": "2024-01-01T00:00:00Z",
+            "response": "lorem ipsum " * tokens,
+            "done": True,
+            "context": list(range(tokens * 4)),
+            "eval_count": tokens,
+            "eval_duration": 123456789,
+            "total_duration": 223456789,
+        }
+    ).encode("utf-8")
+
+
+def build_app(detections: Detections, upstream: bytes, vectors: np.ndarray) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/before/detect", response_model=DETECT_MODEL)
+    async def before_detect() -> Any:
+        return DetectionResponse(model="m", confidence=0.35, detections=detections.to_dicts())
+
+    @app.get("/after/detect", response_model=DETECT_MODEL)
+    async def after_detect() -> Response:
+        body = {"model": "m", "confidence": 0.35, "detections": detections.to_dicts()}
+        return FastJSONResponse(body)
+
+    @app.get("/before/columnar", response_model=DETECT_MODEL)
+    async def before_columnar() -> Any:
+        return ColumnarDetectionResponse(model="m", confidence=0.35, **detections.to_columns())
+
+    @app.get("/after/columnar", response_model=DETECT_MODEL)
+    async def after_columnar() -> Response:
+        return FastJSONResponse(
+            {
+                "model": "m",
+                "confidence": 0.35,
+                "labels": detections.labels.tolist(),
+                "scores": detections.scores,
+                "boxes": detections.boxes,
+            }
+        )
+
+    @app.get("/before/generate", response_model=GenerateResponse)
+    async def before_generate() -> Any:
+        return GenerateResponse(**json.loads(upstream.decode("utf-8")))
+
+    @app.get("/after/generate", response_model=GenerateResponse)
+    async def after_generate() -> Response:
+        return model_response(GenerateResponse.model_validate(loads(upstream)))
+
+    @app.get("/before/embed", response_model=EmbedResponse)
+    async def before_embed() -> Any:
+        return EmbedResponse(model="m", embeddings=vectors.tolist(), cached=0)
+
+    @app.get("/after/embed", response_model=EmbedResponse)
+    async def after_embed() -> Response:
+        return FastJSONResponse({"model": "m", "embeddings": vectors, "cached": 0})
+
+    return app
+
+
+async def per_request_us(client: httpx.AsyncClient, path: str, requests: int) -> float:
+    for _ in range(min(requests, 20)):
+        await client.get(path)
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get(path)
+        response.raise_for_status()
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+async def run(args: argparse.Namespace) -> None:
+    vectors = np.random.default_rng(0).standard_normal((args.inputs, args.dim)).astype(np.float32)
+    upstream = upstream_generate(args.tokens)
+    rows: List[Tuple[str, float, float]] = []
+
+    async def compare(client: httpx.AsyncClient, route: str, name: str) -> None:
+        before = await per_request_us(client, f"/before/{route}", args.requests)
+        after = await per_request_us(client, f"/after/{route}", args.requests)
+        rows.append((name, before, after))
+
+    for count in args.detections:
+        app = build_app(make_detections(count), upstream, vectors)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await compare(client, "detect", f"detect json ({count} boxes)")
+            await compare(client, "columnar", f"detect columnar ({count} boxes)")
+            if count == args.detections[-1]:
+                await compare(client, "generate", f"generate ({args.tokens} tokens)")
+                await compare(client, "embed", f"embed ({args.inputs}x{args.dim})")
+
+    print(f"{'case':32} {'before us':>10} {'after us':>10} {'speedup':>8}")
+    for name, before, after in rows:
+        print(f"{name:32} {before:10.1f} {after:10.1f} {before / after:7.2f}x")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per case")
+    parser.add_argument(
+        "--detections",
+        type=int,
+        nargs="+",
+        default=[0, 10, 100, 1000],
+        help="Detection counts to measure",
+    )
+    parser.add_argument("--tokens", type=int, default=256, help="Tokens in a generate reply")
+    parser.add_argument("--inputs", type=int, default=32, help="Vectors in an embed reply")
+    parser.add_argument("--dim", type=int, default=768, help="Embedding width")
+    return parser.parse_args()
+
+
+def main() -> None:
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Check detection parity and compare latency/throughput across YOLO backends.
+
+Every backend in ``--backends`` is run on the same images as the reference
+(the first one, normally ``ultralytics``). Parity counts reference boxes
+matched by a box with the same label and IoU >= ``--match-iou``; the script
+exits non-zero when recall or precision falls below ``--min-match``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from app.services.yolo_runner import Detections, YoloRunner
+
+
+def load_images(paths: List[Path]) -> List[np.ndarray]:
+    if not paths:
+        from ultralytics.utils import ASSETS
+
+        paths = sorted(Path(ASSETS).glob("*.jpg"))
+    images = [cv2.imread(str(path), cv2.IMREAD_COLOR) for path in paths]
+    missing = [str(path) for path, image in zip(paths, images) if image is None]
+    if missing:
+        raise SystemExit(f"Could not read: {', '.join(missing)}")
+    return images
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between ``xyxy`` box sets ``a`` (N) and ``b`` (M)."""
+
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = (bottom_right - top_left).clip(0).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def matched(reference: Detections, candidate: Detections, min_iou: float) -> int:
+    if not len(reference) or not len(candidate):
+        return 0
+    iou = box_iou(reference.boxes, candidate.boxes)
+    iou[reference.labels[:, None] != candidate.labels[None, :]] = 0.0
+    used = set()
+    hits = 0
+    for row in iou:
+        for col in np.argsort(row)[::-1]:
+            if row[col] < min_iou:
+                break
+            if col not in used:
+                used.add(col)
+                hits += 1
+                break
+    return hits
+
+
+def time_calls(runner: YoloRunner, images: List[np.ndarray], batch: int, repeats: int) -> List[float]:
+    timings = []
+    for _ in range(repeats):
+        for start in range(0, len(images), batch):
+            chunk = images[start : start + batch]
+            started = time.perf_counter()
+            runner.detect_batch(chunk, [None] * len(chunk))
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="*", type=Path, help="Images (default: Ultralytics assets)")
+    parser.add_argument("--model", default="yolov8n.pt", help="YOLO weights to load")
+    parser.add_argument(
+        "--backends",
+        default="ultralytics,onnxruntime",
+        help="Comma-separated backends; the first is the reference",
+    )
+    parser.add_argument("--quantize", action="store_true", help="INT8 ONNX model")
+    parser.add_argument("--intra-op-threads", type=int, default=0)
+    parser.add_argument("--inter-op-threads", type=int, default=0)
+    parser.add_argument("--confidence", type=float, default=0.35)
+    parser.add_argument("--match-iou", type=float, default=0.9)
+    parser.add_argument("--min-match", type=float, default=0.9)
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per throughput call")
+    parser.add_argument("--repeats", type=int, default=10, help="Timed passes over the images")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    images = load_images(args.images)
+    onnx_options = {
+        "intra_op_threads": args.intra_op_threads,
+        "inter_op_threads": args.inter_op_threads,
+        "quantize": args.quantize,
+    }
+    kinds = [kind.strip() for kind in args.backends.split(",") if kind.strip()]
+    outputs: Dict[str, List[Detections]] = {}
+    failed = False
+    print(f"images={len(images)} repeats={args.repeats} batch={args.batch_size}")
+    print(f"{'backend':>12} {'p50 ms':>8} {'p95 ms':>8} {'img/s':>8} {'recall':>7} {'prec':>7}")
+    for kind in kinds:
+        runner = YoloRunner(
+            args.model,
+            confidence=args.confidence,
+            backend=kind,
+            backend_options={} if kind == "ultralytics" else onnx_options,
+        )
+        runner.load()
+        outputs[kind] = runner.detect_batch(images, [None] * len(images))
+
+        single = time_calls(runner, images, 1, args.repeats)
+        batched = time_calls(runner, images, args.batch_size, args.repeats)
+        throughput = len(images) * args.repeats / sum(batched)
+        runner.close()
+
+        reference = outputs[kinds[0]]
+        hits = sum(matched(ref, out, args.match_iou) for ref, out in zip(reference, outputs[kind]))
+        expected = sum(len(ref) for ref in reference)
+        produced = sum(len(out) for out in outputs[kind])
+        recall = hits / expected if expected else 1.0
+        precision = hits / produced if produced else 1.0
+        failed |= min(recall, precision) < args.min_match
+        print(
+            f"{kind:>12} {percentile(single, 50) * 1000:8.1f} "
+            f"{percentile(single, 95) * 1000:8.1f} {throughput:8.1f} "
+            f"{recall:7.3f} {precision:7.3f}"
+        )
+        if kind != kinds[0] and hits:
+            deltas = [
+                abs(float(a) - float(b))
+                for ref, out in zip(reference, outputs[kind])
+                for a, b in zip(sorted(ref.scores), sorted(out.scores))
+            ]
+            print(f"{'':>12} median |score delta| {statistics.median(deltas):.4f}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compare YOLO throughput for per-request inference versus micro-batching.
+
+Run from the repository root so ``app`` is importable::
+
+    python -m scripts.bench_yolo_batching
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List
+
+import cv2
+import numpy as np
+
+from app.services.inference_pool import InferencePool
+from app.services.yolo_runner import BatchScheduler, YoloRunner
+
+
+def make_image(size: int, seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 255, size=(size, size, 3), dtype=np.uint8)
+    success, buffer = cv2.imencode(".jpg", image)
+    if not success:
+        raise RuntimeError("Failed to encode benchmark image.")
+    return buffer.tobytes()
+
+
+async def drive(
+    call: Callable[[bytes], Awaitable[Any]],
+    images: List[bytes],
+    concurrency: int,
+) -> float:
+    """Send every image through ``call`` with bounded concurrency; return seconds."""
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(data: bytes) -> None:
+        async with semaphore:
+            await call(data)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_one(data) for data in images))
+    return time.perf_counter() - started
+
+
+async def run(args: argparse.Namespace) -> None:
+    runner = YoloRunner(args.model)
+    runner.load()
+    images = [make_image(args.size, seed) for seed in range(args.requests)]
+    # Enough queue room that the benchmark measures throughput, not rejection.
+    pool = InferencePool(args.workers, max_queue=args.requests)
+
+    warmup = images[: args.workers]
+    await asyncio.gather(*(pool.submit(runner.detect, data) for data in warmup))
+
+    per_request = await drive(
+        lambda data: pool.submit(runner.detect, data), images, args.concurrency
+    )
+
+    scheduler = BatchScheduler(
+        runner, pool, max_batch_size=args.batch_size, max_wait_ms=args.wait_ms
+    )
+    scheduler.start()
+    try:
+        batched = await drive(scheduler.detect, images, args.concurrency)
+    finally:
+        await scheduler.stop()
+        pool.shutdown()
+
+    print(f"images={args.requests} concurrency={args.concurrency} workers={args.workers}")
+    print(f"per-request: {args.requests / per_request:8.2f} img/s ({per_request:.2f}s)")
+    print(
+        f"batched:     {args.requests / batched:8.2f} img/s ({batched:.2f}s, "
+        f"avg batch {scheduler.stats()['avg_batch_size']:.1f})"
+    )
+    print(f"speedup:     {per_request / batched:8.2f}x")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="yolov8n.pt", help="YOLO weights to load")
+    parser.add_argument("--requests", type=int, default=64, help="Images to send")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent callers")
+    parser.add_argument("--workers", type=int, default=1, help="Inference pool workers")
+    parser.add_argument("--batch-size", type=int, default=8, help="Max images per batch")
+    parser.add_argument("--wait-ms", type=float, default=5.0, help="Max batch fill time")
+    parser.add_argument("--size", type=int, default=640, help="Square image edge in px")
+    return parser.parse_args()
+
+
+def main() -> None:
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Minimal stand-in for the Ollama HTTP API, for local testing and benchmarks."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+
+def create_fake_app(
+    models: List[str],
+    *,
+    token_latency_ms: float = 20.0,
+    tokens: int = 16,
+    load_latency_ms: float = 0.0,
+    embedding_dim: int = 64,
+) -> FastAPI:
+    """Build an app that answers generate/chat with ``tokens`` canned tokens.
+
+    Each token takes ``token_latency_ms``; the first request for a model
+    additionally waits ``load_latency_ms`` to mimic a cold load. Embeddings
+    are pseudo-random unit vectors seeded by the input text, one token of
+    latency per input.
+    """
+
+    app = FastAPI(title="Fake Ollama")
+    known = {name if ":" in name else f"{name}:latest" for name in models}
+    loaded: Dict[str, float] = {}
+    app.state.requests = 0
+
+    def _tagged(name: str) -> str:
+        return name if ":" in name else f"{name}:latest"
+
+    async def _ensure_loaded(model: str) -> None:
+        tagged = _tagged(model)
+        if tagged not in known:
+            raise HTTPException(status_code=404, detail=f"model '{model}' not found")
+        if tagged not in loaded:
+            await asyncio.sleep(load_latency_ms / 1000.0)
+        loaded[tagged] = time.time()
+
+    def _stamp() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _final(model: str, started: float, count: int) -> Dict[str, Any]:
+        elapsed = int((time.perf_counter() - started) * 1e9)
+        return {
+            "model": model,
+            "created_at": _stamp(),
+            "done": True,
+            "eval_count": count,
+            "eval_duration": elapsed,
+            "total_duration": elapsed,
+        }
+
+    async def _tokens(count: int) -> AsyncIterator[str]:
+        for index in range(count):
+            await asyncio.sleep(token_latency_ms / 1000.0)
+            yield f"tok{index} "
+
+    async def _handle(request: Request, chat: bool) -> Any:
+        app.state.requests += 1
+        body = await request.json()
+        model = body.get("model", "")
+        await _ensure_loaded(model)
+        started = time.perf_counter()
+        count = int((body.get("options") or {}).get("num_predict", tokens))
+        context: Optional[List[int]] = None if chat else list(body.get("context") or []) + [1] * count
+
+        def _piece(text: str) -> Dict[str, Any]:
+            if chat:
+                return {"message": {"role": "assistant", "content": text}}
+            return {"response": text}
+
+        if body.get("stream", True):
+
+            async def _lines() -> AsyncIterator[str]:
+                async for token in _tokens(count):
+                    chunk = {"model": model, "created_at": _stamp(), "done": False, **_piece(token)}
+                    yield json.dumps(chunk) + "\n"
+                final = {**_final(model, started, count), **_piece("")}
+                if context is not None:
+                    final["context"] = context
+                yield json.dumps(final) + "\n"
+
+            return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+        text = "".join([token async for token in _tokens(count)])
+        result = {**_final(model, started, count), **_piece(text)}
+        if context is not None:
+            result["context"] = context
+        return result
+
+    @app.post("/api/generate")
+    async def generate(request: Request) -> Any:
+        return await _handle(request, chat=False)
+
+    @app.post("/api/chat")
+    async def chat(request: Request) -> Any:
+        return await _handle(request, chat=True)
+
+    def _embedding(text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+        vector = np.random.default_rng(seed).standard_normal(embedding_dim)
+        return (vector / np.linalg.norm(vector)).round(6).tolist()
+
+    @app.post("/api/embed")
+    async def embed(request: Request) -> Dict[str, Any]:
+        app.state.requests += 1
+        body = await request.json()
+        model = body.get("model", "")
+        await _ensure_loaded(model)
+        started = time.perf_counter()
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        await asyncio.sleep(token_latency_ms * len(inputs) / 1000.0)
+        return {
+            "model": model,
+            "embeddings": [_embedding(text) for text in inputs],
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+            "prompt_eval_count": sum(len(text.split()) for text in inputs),
+        }
+
+    @app.get("/api/tags")
+    async def tags() -> Dict[str, Any]:
+        return {"models": [{"name": name, "model": name} for name in sorted(known)]}
+
+    @app.get("/api/ps")
+    async def ps() -> Dict[str, Any]:
+        return {"models": [{"name": name, "model": name} for name in sorted(loaded)]}
+
+    return app
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", default="phi3,nomic-embed-text", help="Comma-separated model names")
+    parser.add_argument("--token-latency-ms", type=float, default=20.0)
+    parser.add_argument("--tokens", type=int, default=16, help="Tokens per completion")
+    parser.add_argument("--load-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embedding-dim", type=int, default=64)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    app = create_fake_app(
+        [name.strip() for name in args.models.split(",") if name.strip()],
+        token_latency_ms=args.token_latency_ms,
+        tokens=args.tokens,
+        load_latency_ms=args.load_latency_ms,
+        embedding_dim=args.embedding_dim,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,529 @@
+"""Load-test the service with local stand-ins and report latency, throughput and RSS.
+
+Ollama is replaced by :mod:`scripts.fake_ollama` (configurable per-token
+latency) and YOLO by a stub backend that sleeps for a fixed inference time,
+so a run needs no network, GPU or weights. ``--yolo-backend ultralytics``
+uses a real model instead (``--yolo-model yolov8n.pt`` is the tiny one).
+
+The app runs in this process behind ``httpx.ASGITransport`` (``--server
+inprocess``, the default) or in a child ``uvicorn`` process over TCP
+(``--server uvicorn``), whose RSS is then measured on its own. Other
+settings come from the environment as usual, e.g. ``YOLO_WORKERS=2``.
+
+Mixed ``/ollama/*`` and ``/yolo/detect`` traffic is sent at each of
+``--concurrency`` levels and the report is written as JSON. ``--baseline``
+compares the run with an earlier report (``--compare OLD NEW`` compares two
+reports without running) and exits non-zero on a regression::
+
+    python -m scripts.load_test --concurrency 1,8,32 --output bench.json
+    python -m scripts.load_test --baseline bench.json --tolerance 0.15
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import httpx
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ("generate", "chat", "stream", "detect")
+DEFAULT_MIX = "generate=2,chat=1,stream=1,detect=4"
+
+
+class StubYoloBackend:
+    """Stand-in backend: sleeps like a forward pass and returns fixed boxes.
+
+    ``time.sleep`` releases the GIL, as real inference mostly does, so the
+    worker pool and batching behave as they would with a model.
+    """
+
+    def __init__(self, base_ms: float, per_image_ms: float) -> None:
+        self.base = base_ms / 1000.0
+        self.per_image = per_image_ms / 1000.0
+
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Any]:
+        from app.services.yolo_runner import Detections
+
+        time.sleep(self.base + self.per_image * len(images))
+        results = []
+        for image in images:
+            height, width = image.shape[:2]
+            boxes = np.array(
+                [[0.1, 0.1, 0.4, 0.5], [0.5, 0.3, 0.9, 0.9]], dtype=np.float32
+            ) * np.array([width, height, width, height], dtype=np.float32)
+            results.append(
+                Detections(np.array(["person", "dog"]), np.array([0.9, 0.6]), boxes)
+            )
+        return results
+
+    def memory_bytes(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+def install_stub_backend(args: argparse.Namespace) -> None:
+    if args.yolo_backend != "stub":
+        return
+    from app.services import yolo_backends
+
+    yolo_backends.create_backend = lambda *_, **__: StubYoloBackend(
+        args.stub_base_ms, args.stub_per_image_ms
+    )
+
+
+def build_settings(args: argparse.Namespace, ollama_port: int) -> Any:
+    from app.config import Settings
+
+    overrides: Dict[str, Any] = {
+        "ollama_host": "127.0.0.1",
+        "ollama_port": ollama_port,
+        "ollama_backends": None,
+        "ollama_model": args.ollama_model,
+        "yolo_model": args.yolo_model,
+        # Repeated images and prompts would otherwise measure the caches.
+        "yolo_cache_max_bytes": 0,
+        "ollama_cache_max_entries": 0,
+        "warmup_on_startup": False,
+    }
+    if args.yolo_backend != "stub":
+        overrides["yolo_backend"] = args.yolo_backend
+    return Settings(**overrides)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def fake_ollama(args: argparse.Namespace) -> Iterator[int]:
+    """Serve the fake Ollama API on a background thread; yields its port."""
+
+    import uvicorn
+
+    from scripts.fake_ollama import create_fake_app
+
+    app = create_fake_app(
+        [args.ollama_model], token_latency_ms=args.token_latency_ms, tokens=args.tokens
+    )
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+    )
+    thread = threading.Thread(target=server.run, name="fake-ollama", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Fake Ollama server failed to start.")
+        time.sleep(0.01)
+    try:
+        yield port
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+
+def rss_mib(pid: Optional[int] = None) -> Dict[str, Optional[float]]:
+    """Current and peak RSS of ``pid`` (default: this process) in MiB."""
+
+    try:
+        lines = Path(f"/proc/{pid or 'self'}/status").read_text().splitlines()
+    except OSError:
+        if pid is not None:
+            return {"current": None, "peak": None}
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux and bytes on macOS.
+        peak //= 1024 if sys.platform == "darwin" else 1
+        return {"current": None, "peak": peak / 1024.0}
+    fields = dict(line.split(":", 1) for line in lines if ":" in line)
+
+    def _mib(key: str) -> Optional[float]:
+        return int(fields[key].split()[0]) / 1024.0 if key in fields else None
+
+    return {"current": _mib("VmRSS"), "peak": _mib("VmHWM")}
+
+
+def make_images(count: int, size: int) -> List[bytes]:
+    images = []
+    for seed in range(count):
+        rng = np.random.default_rng(seed)
+        image = rng.integers(0, 255, size=(size, size, 3), dtype=np.uint8)
+        success, buffer = cv2.imencode(".jpg", image)
+        if not success:
+            raise RuntimeError("Failed to encode benchmark image.")
+        images.append(buffer.tobytes())
+    return images
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}'; choose from {', '.join(SCENARIOS)}.")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+async def send(
+    client: httpx.AsyncClient, scenario: str, index: int, images: List[bytes], model: str
+) -> int:
+    """Issue one request of ``scenario`` and return its status code."""
+
+    if scenario == "generate":
+        response = await client.post(
+            "/ollama/generate", json={"model": model, "prompt": f"request {index}"}
+        )
+    elif scenario == "chat":
+        response = await client.post(
+            "/ollama/chat",
+            json={"model": model, "messages": [{"role": "user", "content": f"request {index}"}]},
+        )
+    elif scenario == "stream":
+        async with client.stream(
+            "POST",
+            "/ollama/generate",
+            json={"model": model, "prompt": f"request {index}", "stream": True},
+        ) as response:
+            async for _ in response.aiter_bytes():
+                pass
+        return response.status_code
+    else:
+        image = images[index % len(images)]
+        response = await client.post("/yolo/detect", files={"file": ("bench.jpg", image)})
+    return response.status_code
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict[str, Any]:
+    values = np.asarray(latencies) * 1000.0
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "throughput_rps": (len(latencies) - errors) / seconds if seconds > 0 else 0.0,
+        "mean_ms": float(values.mean()) if values.size else 0.0,
+        "p50_ms": float(np.percentile(values, 50)) if values.size else 0.0,
+        "p95_ms": float(np.percentile(values, 95)) if values.size else 0.0,
+        "p99_ms": float(np.percentile(values, 99)) if values.size else 0.0,
+    }
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    args: argparse.Namespace,
+    concurrency: int,
+    images: List[bytes],
+    server_pid: Optional[int],
+) -> Dict[str, Any]:
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed + concurrency)
+    plan = rng.choices(list(mix), weights=list(mix.values()), k=args.requests)
+    samples: List[Tuple[str, float, Optional[int]]] = []
+    cursor = iter(enumerate(plan))
+
+    async def _worker() -> None:
+        for index, scenario in cursor:
+            started = time.perf_counter()
+            try:
+                code: Optional[int] = await send(client, scenario, index, images, args.ollama_model)
+            except httpx.HTTPError:
+                code = None
+            samples.append((scenario, time.perf_counter() - started, code))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+
+    scenarios: Dict[str, Any] = {}
+    for name in mix:
+        rows = [row for row in samples if row[0] == name]
+        failed = [row for row in rows if row[2] is None or row[2] >= 400]
+        summary = summarize([row[1] for row in rows], len(failed), seconds)
+        statuses: Dict[str, int] = {}
+        for row in rows:
+            key = str(row[2]) if row[2] is not None else "error"
+            statuses[key] = statuses.get(key, 0) + 1
+        scenarios[name] = {**summary, "statuses": statuses}
+    failed_total = sum(item["errors"] for item in scenarios.values())
+    return {
+        "concurrency": concurrency,
+        "seconds": seconds,
+        **summarize([row[1] for row in samples], failed_total, seconds),
+        "rss_mib": rss_mib(server_pid),
+        "scenarios": scenarios,
+    }
+
+
+@contextlib.asynccontextmanager
+async def app_client(
+    args: argparse.Namespace, ollama_port: int
+) -> AsyncIterator[Tuple[httpx.AsyncClient, Optional[int]]]:
+    """Yield a client for the app and the server's pid (``None`` in-process)."""
+
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    if args.server == "inprocess":
+        install_stub_backend(args)
+        from app.main import create_app
+
+        app = create_app(build_settings(args, ollama_port))
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench", timeout=timeout
+            ) as client:
+                yield client, None
+        return
+
+    port = free_port()
+    command = [
+        sys.executable, "-m", "scripts.load_test", "--serve",
+        "--port", str(port), "--ollama-port", str(ollama_port), *args.forward,
+    ]
+    child = subprocess.Popen(command, cwd=REPO_ROOT)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=timeout, limits=limits
+        ) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                if child.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {child.returncode}.")
+                try:
+                    if (await client.get("/ready")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError("Server did not become ready within 60s.")
+                await asyncio.sleep(0.1)
+            yield client, child.pid
+    finally:
+        child.terminate()
+        try:
+            child.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            child.kill()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    images = make_images(args.images, args.image_size)
+    levels = []
+    with fake_ollama(args) as ollama_port:
+        async with app_client(args, ollama_port) as (client, server_pid):
+            # One request per scenario so model loads are not measured.
+            for index, scenario in enumerate(parse_mix(args.mix)):
+                await send(client, scenario, index, images, args.ollama_model)
+            for concurrency in args.concurrency:
+                level = await run_level(client, args, concurrency, images, server_pid)
+                print_level(level)
+                levels.append(level)
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "server": args.server,
+            "mix": parse_mix(args.mix),
+            "requests_per_level": args.requests,
+            "yolo_backend": args.yolo_backend,
+            "token_latency_ms": args.token_latency_ms,
+            "tokens": args.tokens,
+            "image_size": args.image_size,
+        },
+        "levels": levels,
+    }
+
+
+def print_level(level: Dict[str, Any]) -> None:
+    rss = level["rss_mib"]["current"]
+    print(
+        f"concurrency={level['concurrency']:<4} {level['throughput_rps']:8.1f} req/s  "
+        f"p50={level['p50_ms']:.1f}ms p95={level['p95_ms']:.1f}ms p99={level['p99_ms']:.1f}ms  "
+        f"errors={level['errors']}  rss={rss if rss is None else f'{rss:.0f}MiB'}"
+    )
+    for name, item in level["scenarios"].items():
+        print(
+            f"  {name:<9} n={item['count']:<5} {item['throughput_rps']:8.1f} req/s  "
+            f"p50={item['p50_ms']:.1f}ms p95={item['p95_ms']:.1f}ms p99={item['p99_ms']:.1f}ms  "
+            f"statuses={item['statuses']}"
+        )
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print per-scenario changes and return descriptions of regressions.
+
+    A regression is p95 latency or peak RSS growing, or throughput falling,
+    by more than ``tolerance``; or an error rate that rises at all.
+    """
+
+    regressions: List[str] = []
+    differing = [
+        key for key in ("server", "mix", "requests_per_level", "yolo_backend",
+                        "token_latency_ms", "tokens", "image_size")
+        if old["meta"].get(key) != new["meta"].get(key)
+    ]
+    if differing:
+        print(f"warning: reports were run with different {', '.join(differing)}")
+    baseline = {level["concurrency"]: level for level in old["levels"]}
+    print(f"{'concurrency':>11} {'scenario':<9} {'p95 ms':>17} {'req/s':>17}")
+    for level in new["levels"]:
+        before = baseline.get(level["concurrency"])
+        if before is None:
+            continue
+        where = f"concurrency={level['concurrency']}"
+        for name, item in level["scenarios"].items():
+            prior = before["scenarios"].get(name)
+            if prior is None:
+                continue
+            print(
+                f"{level['concurrency']:>11} {name:<9} "
+                f"{prior['p95_ms']:7.1f} -> {item['p95_ms']:7.1f} "
+                f"{prior['throughput_rps']:7.1f} -> {item['throughput_rps']:7.1f}"
+            )
+            if prior["p95_ms"] and item["p95_ms"] > prior["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{where} {name}: p95 {prior['p95_ms']:.1f}ms -> {item['p95_ms']:.1f}ms"
+                )
+            if item["throughput_rps"] < prior["throughput_rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{where} {name}: throughput {prior['throughput_rps']:.1f} -> "
+                    f"{item['throughput_rps']:.1f} req/s"
+                )
+            old_rate = prior["errors"] / prior["count"] if prior["count"] else 0.0
+            new_rate = item["errors"] / item["count"] if item["count"] else 0.0
+            if new_rate > old_rate:
+                regressions.append(f"{where} {name}: error rate {old_rate:.1%} -> {new_rate:.1%}")
+        old_peak, new_peak = before["rss_mib"]["peak"], level["rss_mib"]["peak"]
+        if old_peak and new_peak and new_peak > old_peak * (1 + tolerance):
+            regressions.append(f"{where}: peak RSS {old_peak:.0f} -> {new_peak:.0f} MiB")
+    return regressions
+
+
+def report_regressions(regressions: List[str]) -> int:
+    if not regressions:
+        print("No regressions.")
+        return 0
+    print("Regressions:")
+    for line in regressions:
+        print(f"  {line}")
+    return 1
+
+
+def serve(args: argparse.Namespace) -> None:
+    """Child process for ``--server uvicorn``: run the app with the stub installed."""
+
+    import uvicorn
+
+    install_stub_backend(args)
+    from app.main import create_app
+
+    app = create_app(build_settings(args, args.ollama_port))
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    from app.services.yolo_backends import BACKENDS
+
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--server", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument(
+        "--concurrency",
+        type=lambda value: [int(part) for part in value.split(",")],
+        default=[1, 8, 32],
+        help="Comma-separated concurrency levels",
+    )
+    parser.add_argument("--requests", type=int, default=200, help="Requests per level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, name=weight,...")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the request mix")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout (s)")
+    parser.add_argument("--ollama-model", default="phi3")
+    parser.add_argument("--token-latency-ms", type=float, default=20.0)
+    parser.add_argument("--tokens", type=int, default=16, help="Tokens per completion")
+    parser.add_argument(
+        "--yolo-backend", choices=("stub", *BACKENDS), default="stub",
+        help="'stub' sleeps instead of running a model",
+    )
+    parser.add_argument("--yolo-model", default="yolov8n.pt")
+    parser.add_argument("--stub-base-ms", type=float, default=10.0, help="Stub time per batch")
+    parser.add_argument("--stub-per-image-ms", type=float, default=5.0, help="Stub time per image")
+    parser.add_argument("--images", type=int, default=16, help="Distinct images to cycle")
+    parser.add_argument("--image-size", type=int, default=640, help="Square image edge in px")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="Compare this run with a saved report")
+    parser.add_argument(
+        "--compare", type=Path, nargs=2, metavar=("OLD", "NEW"),
+        help="Compare two saved reports without running",
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.15, help="Allowed relative change before failing"
+    )
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--ollama-port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    # Settings the uvicorn child needs to build the same app.
+    args.forward = [
+        "--ollama-model", args.ollama_model,
+        "--yolo-backend", args.yolo_backend,
+        "--yolo-model", args.yolo_model,
+        "--stub-base-ms", str(args.stub_base_ms),
+        "--stub-per-image-ms", str(args.stub_per_image_ms),
+    ]
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    if args.serve:
+        serve(args)
+        return
+    if args.compare:
+        old, new = (json.loads(path.read_text(encoding="utf-8")) for path in args.compare)
+        sys.exit(report_regressions(compare(old, new, args.tolerance)))
+
+    report = asyncio.run(run(args))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Report written to {args.output}")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        sys.exit(report_regressions(compare(baseline, report, args.tolerance)))
+
+
+if __name__ == "__main__":
+    main()
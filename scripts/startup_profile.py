@@ -0,0 +1,100 @@
+"""Report import time per module and RSS after importing the app.
+
+Runs ``python -X importtime -c "import app.main"`` in a fresh interpreter,
+so feature flags such as ``ENABLE_YOLO=0`` can be passed as environment
+variables. ``--json`` writes the report for comparison across commits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+FEATURE_FLAGS = ("ENABLE_OLLAMA", "ENABLE_YOLO")
+
+# Printed by the child after the import; ru_maxrss is KiB on Linux.
+_CHILD = (
+    "import resource, sys\n"
+    "import app.main\n"
+    "rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+    "if sys.platform == 'darwin':\n"
+    "    rss //= 1024\n"
+    "print('RSS_KIB', rss)\n"
+)
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse ``-X importtime`` lines into ``{module, self_ms, cumulative_ms}``."""
+
+    rows: List[Dict[str, Any]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append(
+            {
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+                "self_ms": int(self_us) / 1000.0,
+                "cumulative_ms": int(cumulative_us) / 1000.0,
+            }
+        )
+    return rows
+
+
+def profile(env: Dict[str, str]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=Path(__file__).resolve().parent.parent,
+        check=False,
+    )
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing app.main failed:\n{completed.stderr[-2000:]}")
+    rss_kib = next(
+        int(line.split()[1]) for line in completed.stdout.splitlines() if line.startswith("RSS_KIB")
+    )
+    modules = parse_importtime(completed.stderr)
+    top_level = [row for row in modules if row["depth"] == 0]
+    return {
+        "flags": {key: env[key] for key in FEATURE_FLAGS if key in env},
+        "wall_seconds": wall,
+        "import_ms": sum(row["cumulative_ms"] for row in top_level),
+        "rss_mib": rss_kib / 1024.0,
+        "modules": sorted(modules, key=lambda row: row["cumulative_ms"], reverse=True),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top", type=int, default=20, help="Slowest modules to print")
+    parser.add_argument("--json", type=Path, help="Write the full report to this file")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    report = profile(dict(os.environ))
+    print(f"flags: {report['flags'] or '(defaults)'}")
+    print(f"import app.main: {report['import_ms']:.1f} ms (wall {report['wall_seconds']:.2f}s)")
+    print(f"peak RSS: {report['rss_mib']:.1f} MiB")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for row in report["modules"][: args.top]:
+        print(f"{row['cumulative_ms']:14.1f} {row['self_ms']:9.1f}  {row['module']}")
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
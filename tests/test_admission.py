@@ -0,0 +1,20 @@
+import asyncio
+
+from app.services import admission
+from app.services.admission import AdmissionController
+
+
+def test_idle_models_are_pruned_but_busy_ones_kept() -> None:
+    async def scenario() -> None:
+        controller = AdmissionController(max_concurrency=1)
+        await controller.acquire("busy", "client")
+        for index in range(admission._MAX_IDLE_MODELS * 3):
+            async with controller.slot(f"model-{index}", "client"):
+                pass
+        stats = controller.stats()
+        assert len(stats) <= admission._MAX_IDLE_MODELS + 1
+        assert stats["busy"]["inflight"] == 1
+        assert f"model-{admission._MAX_IDLE_MODELS * 3 - 1}" in stats
+        controller.release("busy")
+
+    asyncio.run(scenario())
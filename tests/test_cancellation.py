@@ -0,0 +1,103 @@
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.cancellation import (
+    CLIENT_CLOSED_REQUEST,
+    Deadline,
+    abandon_when,
+    guard,
+    request_deadline,
+    work_abandoned,
+)
+from app.services.metrics import CANCELLED_REQUESTS
+
+
+class StubRequest:
+    """Stands in for a request whose client disconnects when ``gone`` is set."""
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None) -> None:
+        self.headers = headers or {}
+        self.gone = asyncio.Event()
+
+    async def receive(self) -> Dict[str, Any]:
+        await self.gone.wait()
+        return {"type": "http.disconnect"}
+
+
+async def _slow(events: List[str]) -> str:
+    try:
+        await asyncio.sleep(10)
+    except asyncio.CancelledError:
+        events.append("cleaned up")
+        raise
+    return "late"
+
+
+def test_guard_returns_the_result_of_finished_work() -> None:
+    async def scenario() -> None:
+        request: Any = StubRequest()
+        assert await guard(request, asyncio.sleep(0, "ok"), service="test") == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_guard_cancels_work_when_the_client_disconnects() -> None:
+    async def scenario() -> None:
+        request: Any = StubRequest()
+        events: List[str] = []
+        asyncio.get_running_loop().call_later(0.02, request.gone.set)
+        with pytest.raises(HTTPException) as raised:
+            await guard(request, _slow(events), service="test")
+        assert raised.value.status_code == CLIENT_CLOSED_REQUEST
+        assert events == ["cleaned up"]
+
+    before = CANCELLED_REQUESTS._values.get(("test", "disconnect"), 0)
+    asyncio.run(scenario())
+    assert CANCELLED_REQUESTS._values[("test", "disconnect")] == before + 1
+
+
+def test_guard_cancels_work_at_the_deadline() -> None:
+    async def scenario() -> None:
+        request: Any = StubRequest({"x-request-timeout": "0.02"})
+        deadline = request_deadline(request, default=30)
+        assert deadline is not None and deadline.seconds == 0.02
+        events: List[str] = []
+        with pytest.raises(HTTPException) as raised:
+            await guard(request, _slow(events), service="test", deadline=deadline)
+        assert raised.value.status_code == 504
+        assert events == ["cleaned up"]
+
+    asyncio.run(scenario())
+
+
+def test_request_deadline_falls_back_to_the_default() -> None:
+    request: Any = StubRequest({"x-request-timeout": "soon"})
+    deadline = request_deadline(request, default=5)
+    assert deadline is not None and deadline.seconds == 5
+    assert request_deadline(StubRequest(), default=None) is None  # type: ignore[arg-type]
+    # A zero timeout means "no deadline", as for the settings.
+    unbounded: Any = StubRequest({"x-request-timeout": "0"})
+    assert request_deadline(unbounded, default=5) is None
+    assert Deadline(0).expired
+
+
+def test_abandon_when_is_scoped_to_its_thread_and_block() -> None:
+    gone = threading.Event()
+    seen: List[bool] = []
+    assert not work_abandoned()
+    with abandon_when(gone.is_set):
+        assert not work_abandoned()
+        gone.set()
+        assert work_abandoned()
+        thread = threading.Thread(target=lambda: seen.append(work_abandoned()))
+        thread.start()
+        thread.join()
+        with abandon_when(lambda: False):
+            assert not work_abandoned()
+        assert work_abandoned()
+    assert not work_abandoned()
+    assert seen == [False]
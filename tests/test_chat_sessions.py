@@ -0,0 +1,81 @@
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+
+from app.services.chat_sessions import SessionExpiredError, SessionStore, post_turn
+
+
+class RecordingClient:
+    """Answers every turn and grows the context by two tokens."""
+
+    def __init__(self) -> None:
+        self.calls: List[Dict[str, Any]] = []
+
+    async def generate(self, **kwargs: Any) -> Dict[str, Any]:
+        self.calls.append(kwargs)
+        context = list(kwargs["context"]) + [7, 7]
+        return {"response": f"reply {len(self.calls)}", "context": context, "done": True}
+
+    async def chat(self, **kwargs: Any) -> Dict[str, Any]:
+        self.calls.append(kwargs)
+        reply = f"reply {len(self.calls)}"
+        return {"message": {"role": "assistant", "content": reply}, "done": True}
+
+
+def test_generate_sessions_send_only_the_new_turn_with_the_last_context() -> None:
+    client: Any = RecordingClient()
+    store = SessionStore()
+    session = store.create(model="m", system="be brief", options={"temperature": 0}, backend="b")
+
+    async def scenario() -> None:
+        await post_turn(client, store, session, "hi")
+        await post_turn(client, store, session, "again", options={"seed": 1})
+
+    asyncio.run(scenario())
+    first, second = client.calls
+    assert (first["prompt"], first["system"], list(first["context"])) == ("hi", "be brief", [])
+    assert (second["prompt"], second["system"], list(second["context"])) == ("again", None, [7, 7])
+    assert second["options"] == {"temperature": 0, "seed": 1}
+    assert second["backend"] == "b"
+    assert list(session.context) == [7, 7, 7, 7]
+    assert [m["content"] for m in session.messages] == ["hi", "reply 1", "again", "reply 2"]
+
+
+def test_chat_sessions_resend_the_history() -> None:
+    client: Any = RecordingClient()
+    store = SessionStore()
+    session = store.create(model="m", mode="chat", system="be brief")
+
+    async def scenario() -> None:
+        await post_turn(client, store, session, "hi")
+        await post_turn(client, store, session, "again")
+
+    asyncio.run(scenario())
+    assert [m["content"] for m in client.calls[1]["messages"]] == [
+        "be brief",
+        "hi",
+        "reply 1",
+        "again",
+    ]
+
+
+def test_sessions_expire_when_idle_and_are_evicted_oldest_first(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    now = [1000.0]
+    monkeypatch.setattr("app.services.chat_sessions.time.monotonic", lambda: now[0])
+    store = SessionStore(idle_seconds=60, max_bytes=2000)
+    old = store.create(model="m")
+    new = store.create(model="m")
+    new.messages.append({"role": "user", "content": "x" * 1000})
+    store.resize(new)
+    with pytest.raises(SessionExpiredError):
+        store.get(old.id)
+    assert store.stats()["evicted"] == 1
+
+    now[0] += 61
+    with pytest.raises(SessionExpiredError):
+        store.get(new.id)
+    assert store.stats()["expired"] == 1
+    assert store.stats()["bytes"] == 0
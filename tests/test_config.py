@@ -0,0 +1,14 @@
+from app.config import Settings
+
+
+def test_yolo_allowlist_defaults_to_the_configured_model() -> None:
+    assert Settings(yolo_model="a.pt").yolo_model_allowlist == ["a.pt"]
+    assert Settings(yolo_model="a.pt", yolo_models="b.pt, a.pt,,c.pt").yolo_model_allowlist == [
+        "a.pt",
+        "b.pt",
+        "c.pt",
+    ]
+
+
+def test_yolo_allowlist_wildcard_opts_in_to_any_model() -> None:
+    assert Settings(yolo_models="*").yolo_model_allowlist is None
@@ -0,0 +1,48 @@
+import asyncio
+from pathlib import Path
+
+import numpy as np
+
+from app.services.detection_cache import DetectionCache
+from app.services.yolo_runner import Detections
+
+
+def _detections() -> Detections:
+    return Detections(
+        labels=np.array(["cat", "dog"], dtype=object),
+        scores=np.array([0.9, 0.4], dtype=np.float32),
+        boxes=np.array([[0, 0, 10, 10], [5, 5, 20, 20]], dtype=np.float32),
+    )
+
+
+def test_disk_tier_survives_restart_only_in_the_same_namespace(tmp_path: Path) -> None:
+    path = str(tmp_path / "cache.db")
+
+    async def scenario() -> None:
+        cache = DetectionCache(1 << 20, namespace="onnxruntime,imgsz=640", disk_path=path)
+        await cache.put("digest", "m", 0.3, _detections())
+        cache.close()
+
+        reopened = DetectionCache(1 << 20, namespace="onnxruntime,imgsz=640", disk_path=path)
+        hit = await reopened.get("digest", "m", 0.5)
+        assert hit is not None
+        assert hit.labels.tolist() == ["cat"]
+        assert reopened.stats()["disk_hits"] == 1
+        reopened.close()
+
+        other = DetectionCache(1 << 20, namespace="onnxruntime,imgsz=1280", disk_path=path)
+        assert await other.get("digest", "m", 0.5) is None
+        other.close()
+
+    asyncio.run(scenario())
+
+
+def test_higher_threshold_is_answered_from_a_lower_one() -> None:
+    async def scenario() -> None:
+        cache = DetectionCache(1 << 20)
+        await cache.put("digest", "m", 0.3, _detections())
+        assert await cache.get("digest", "m", 0.2) is None
+        hit = await cache.get("digest", "m", 0.3)
+        assert hit is not None and len(hit.labels) == 2
+
+    asyncio.run(scenario())
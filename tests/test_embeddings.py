@@ -0,0 +1,133 @@
+import asyncio
+from pathlib import Path
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+import pytest
+
+from app.services.embeddings import EmbeddingCache, Embedder, VectorIndex, normalize
+
+
+class RecordingClient:
+    """Embeds each text as ``[len(text), 1]`` and records every batch."""
+
+    def __init__(self) -> None:
+        self.batches: List[List[str]] = []
+
+    async def embed(self, *, model: str, inputs: Sequence[str], **kwargs: Any) -> List[List[float]]:
+        self.batches.append(list(inputs))
+        return [[float(len(text)), 1.0] for text in inputs]
+
+    def metric_label(self, model: Optional[str]) -> str:
+        return "other"
+
+
+def test_embedder_batches_deduplicates_and_caches() -> None:
+    client: Any = RecordingClient()
+    embedder = Embedder(client, cache=EmbeddingCache(1 << 20), batch_size=2)
+
+    async def scenario() -> None:
+        vectors, cached = await embedder.embed("m", ["a", "bb", "a", "ccc"])
+        assert vectors.tolist() == [[1, 1], [2, 1], [1, 1], [3, 1]]
+        assert cached == 0
+        assert client.batches == [["a", "bb"], ["ccc"]]
+
+        vectors, cached = await embedder.embed("m", ["ccc", "dddd"])
+        assert vectors[:, 0].tolist() == [3, 4]
+        assert cached == 1
+        assert client.batches[-1] == ["dddd"]
+
+        # Vectors are cached per model.
+        await embedder.embed("other", ["a"])
+        assert client.batches[-1] == ["a"]
+
+    asyncio.run(scenario())
+
+
+def test_embedding_cache_evicts_least_recently_used_over_budget() -> None:
+    vector = np.zeros(4, dtype=np.float32)  # 16 bytes
+    cache = EmbeddingCache(max_bytes=32)
+    cache.put("a", vector)
+    cache.put("b", vector)
+    assert cache.get("a") is not None
+    cache.put("c", vector)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    cache.put("huge", np.zeros(100, dtype=np.float32))
+    assert cache.get("huge") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 32, 1)
+
+
+def test_exact_search_ranks_by_cosine_and_overwrites_ids() -> None:
+    index = VectorIndex(ivf_threshold=0)
+    added = index.add(
+        ["x", "y", "xy"],
+        np.array([[3, 0], [0, 2], [1, 1]], dtype=np.float32),
+        [{"n": 1}, None, None],
+    )
+    assert added == 3
+    hits, exact = index.search(np.array([1, 0.1], dtype=np.float32), k=2)
+    assert exact
+    assert [hit.id for hit in hits] == ["x", "xy"]
+    assert hits[0].score == pytest.approx(float(normalize(np.array([1, 0.1])) @ [1, 0]))
+    assert hits[0].metadata == {"n": 1}
+
+    assert index.add(["x"], np.array([[0, 1]], dtype=np.float32)) == 0
+    assert len(index) == 3
+    hits, _ = index.search(np.array([0, 1], dtype=np.float32), k=3)
+    assert {hit.id for hit in hits[:2]} == {"x", "y"}
+
+    with pytest.raises(ValueError):
+        index.add(["z"], np.ones((1, 3), dtype=np.float32))
+    with pytest.raises(ValueError):
+        index.search(np.ones(3, dtype=np.float32), k=1)
+
+
+def test_memory_mapped_index_survives_a_restart(tmp_path: Path) -> None:
+    path = tmp_path / "index.npy"
+    index = VectorIndex(path=str(path), ivf_threshold=0)
+    index.add(["a", "b"], np.eye(2, dtype=np.float32), [{"t": "first"}, None])
+    index.add(["a"], np.eye(2, dtype=np.float32)[:1], [{"t": "second"}])
+    index.close()
+    # An interrupted write leaves a torn final sidecar line.
+    with path.with_suffix(".jsonl").open("a", encoding="utf-8") as handle:
+        handle.write('{"id": "c", "ro')
+
+    reopened = VectorIndex(path=str(path), ivf_threshold=0)
+    assert len(reopened) == 2
+    hits, _ = reopened.search(np.array([1, 0], dtype=np.float32), k=1)
+    assert (hits[0].id, hits[0].metadata) == ("a", {"t": "second"})
+    reopened.close()
+
+
+def test_ivf_search_finds_neighbours_and_rows_added_after_training() -> None:
+    rng = np.random.default_rng(1)
+    centres = normalize(rng.normal(size=(16, 32)))
+    labels = rng.integers(0, 16, size=4000)
+    vectors = normalize(centres[labels] + 0.05 * rng.normal(size=(4000, 32)))
+    ids = [str(i) for i in range(4000)]
+    exact = VectorIndex(ivf_threshold=0)
+    approx = VectorIndex(ivf_threshold=1000, ivf_probes=8)
+    exact.add(ids, vectors)
+    approx.add(ids, vectors)
+
+    queries = normalize(centres[rng.integers(0, 16, size=50)] + 0.05 * rng.normal(size=(50, 32)))
+    agree = 0
+    for query in queries:
+        truth, _ = exact.search(query, k=1)
+        found, was_exact = approx.search(query, k=1)
+        assert not was_exact
+        agree += truth[0].id == found[0].id
+    assert agree >= 45
+    assert approx.stats()["ivf_builds"] == 1
+
+    # A new row is searchable before the lists are retrained.
+    approx.add(["new"], -vectors[:1])
+    hits, _ = approx.search(-vectors[0], k=1)
+    assert hits[0].id == "new"
+    assert approx.stats()["ivf_builds"] == 1
+
+    approx.add([str(i) for i in range(500)], vectors[:500])
+    approx.search(queries[0], k=1)
+    assert approx.stats()["ivf_builds"] == 2
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.inference_pool import InferencePool, QueueFullError
+
+
+def test_cancelled_queued_job_releases_its_slot() -> None:
+    async def scenario() -> None:
+        pool = InferencePool(1, max_queue=1)
+        gate = threading.Event()
+        try:
+            running = asyncio.ensure_future(pool.submit(gate.wait))
+            await asyncio.sleep(0.05)
+            queued = asyncio.ensure_future(pool.submit(lambda: "never"))
+            await asyncio.sleep(0.05)
+            assert pool.stats()["queued"] == 1
+            with pytest.raises(QueueFullError):
+                await pool.submit(lambda: None)
+
+            queued.cancel()
+            await asyncio.gather(queued, return_exceptions=True)
+            stats = pool.stats()
+            assert stats["queued"] == 0
+            assert stats["running"] == 1
+
+            gate.set()
+            await running
+            assert await pool.submit(lambda: 42) == 42
+            stats = pool.stats()
+            assert (stats["queued"], stats["running"]) == (0, 0)
+        finally:
+            gate.set()
+            pool.shutdown()
+
+    asyncio.run(scenario())
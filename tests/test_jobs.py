@@ -0,0 +1,97 @@
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import pytest
+
+from app.services.jobs import CANCELLED, Job, JobQueueFullError, JobScheduler, JobStore
+from app.services.ollama_jobs import ollama_handler
+
+
+def test_payload_byte_budget_rejects_until_jobs_leave_the_queue() -> None:
+    async def scenario() -> None:
+        jobs = JobScheduler(JobStore(), concurrency=1, max_queue=10, max_queue_bytes=100)
+        jobs.register("echo", lambda job: asyncio.sleep(0))
+        first, _ = await jobs.submit("echo", {"n": 1}, payload=b"x" * 60)
+        with pytest.raises(JobQueueFullError):
+            await jobs.submit("echo", {"n": 2}, payload=b"x" * 60)
+        # Replays of an existing job reserve nothing.
+        await jobs.submit("echo", {"n": 3}, payload=b"x" * 20, idempotency_key="k")
+        await jobs.submit("echo", {"n": 3}, payload=b"x" * 20, idempotency_key="k")
+        assert jobs.depth()["queued_bytes"] == 80
+
+        assert (await jobs.cancel(first.id)).status == CANCELLED
+        assert jobs.depth()["queued_bytes"] == 20
+        await jobs.submit("echo", {"n": 4}, payload=b"x" * 60)
+        jobs.store.close()
+
+    asyncio.run(scenario())
+
+
+class RecordingAdmission:
+    def __init__(self) -> None:
+        self.clients: List[str] = []
+
+    def slot(self, model: str, client: str) -> Any:
+        self.clients.append(client)
+        return NullSlot()
+
+
+class NullSlot:
+    async def __aenter__(self) -> None:
+        return None
+
+    async def __aexit__(self, *exc: Any) -> None:
+        return None
+
+
+class FakeClient:
+    async def generate(self, **kwargs: Any) -> Dict[str, Any]:
+        return {"model": kwargs["model"], "response": "ok", "done": True}
+
+
+def test_ollama_jobs_are_admitted_as_their_submitter() -> None:
+    admission = RecordingAdmission()
+    handler = ollama_handler(FakeClient(), admission, "ollama.generate")  # type: ignore[arg-type]
+    request = {"model": "m", "prompt": "hi"}
+    asyncio.run(handler(Job("1", "ollama.generate", request, client="10.0.0.7")))
+    asyncio.run(handler(Job("2", "ollama.generate", request)))
+    assert admission.clients == ["10.0.0.7", "jobs:2"]
+
+
+def test_wait_sees_a_change_made_while_the_store_read_was_in_flight() -> None:
+    async def scenario() -> None:
+        store = JobStore()
+        jobs = JobScheduler(store, concurrency=1)
+        gate = asyncio.Event()
+
+        async def handler(job: Job) -> str:
+            await gate.wait()
+            return "done"
+
+        jobs.register("gated", handler)
+        jobs.start()
+        record, _ = await jobs.submit("gated", {})
+        while (await jobs.get(record.id)).status != "running":
+            await asyncio.sleep(0.01)
+
+        loop = asyncio.get_running_loop()
+        read = store.get
+
+        def stale_get(job_id: str) -> Any:
+            store.get = read  # type: ignore[method-assign]
+            found = read(job_id)
+            # The job finishes while this read is still returning.
+            loop.call_soon_threadsafe(gate.set)
+            time.sleep(0.2)
+            return found
+
+        store.get = stale_get  # type: ignore[method-assign]
+        started = time.monotonic()
+        finished = await jobs.wait(record.id, 5)
+        assert finished is not None and finished.status == "succeeded"
+        assert time.monotonic() - started < 2
+        await jobs.stop()
+        store.close()
+
+    asyncio.run(scenario())
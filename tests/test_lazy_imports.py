@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Set
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Imports app.main (which builds the app) in a fresh interpreter and prints
+# which of the watched modules ended up loaded.
+_CHILD = """
+import json, sys
+import app.main
+watched = {watched!r}
+print(json.dumps(sorted(name for name in watched if name in sys.modules)))
+"""
+
+HEAVY = {
+    "cv2",
+    "torch",
+    "ultralytics",
+    "onnxruntime",
+    "app.routers.yolo",
+    "app.routers.ollama",
+    "app.services.yolo_runner",
+    "app.services.ollama_client",
+    "app.services.inference_pool",
+    "app.services.admission",
+}
+
+
+def _loaded(flags: Dict[str, str]) -> Set[str]:
+    env = {**os.environ, **flags}
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD.format(watched=sorted(HEAVY))],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return set(json.loads(output.splitlines()[-1]))
+
+
+def test_disabled_features_are_never_imported() -> None:
+    loaded = _loaded({"ENABLE_YOLO": "0", "ENABLE_OLLAMA": "0", "ENABLE_JOBS": "0"})
+    assert loaded == set()
+
+
+def test_enabled_yolo_defers_opencv_and_model_runtimes() -> None:
+    loaded = _loaded({"ENABLE_YOLO": "1", "ENABLE_OLLAMA": "0", "ENABLE_JOBS": "0"})
+    assert "app.routers.yolo" in loaded
+    assert "app.services.ollama_client" not in loaded
+    assert not loaded & {"cv2", "torch", "ultralytics", "onnxruntime"}
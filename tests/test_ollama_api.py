@@ -0,0 +1,129 @@
+import json
+from contextlib import contextmanager
+from typing import Any, Iterator, Tuple
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.config import Settings, get_settings
+from app.main import create_app
+from scripts.fake_ollama import create_fake_app
+
+URL = "http://ollama.test"
+
+
+@contextmanager
+def serve(
+    monkeypatch: pytest.MonkeyPatch, **fake_options: Any
+) -> Iterator[Tuple[TestClient, FastAPI]]:
+    """Run the app against the fake Ollama app, reached over ASGI instead of TCP."""
+
+    # Routes default to the model configured in the environment.
+    models = [get_settings().ollama_model, get_settings().ollama_embed_model]
+    fake = create_fake_app(models, **{"token_latency_ms": 0, "tokens": 3, **fake_options})
+    client_class = httpx.AsyncClient
+
+    def async_client(**kwargs: Any) -> httpx.AsyncClient:
+        return client_class(transport=httpx.ASGITransport(fake), **kwargs)
+
+    monkeypatch.setattr(httpx, "AsyncClient", async_client)
+    app = create_app(
+        Settings(
+            enable_yolo=False,
+            enable_jobs=False,
+            warmup_on_startup=False,
+            ollama_backends=URL,
+        )
+    )
+    with TestClient(app) as client:
+        yield client, fake
+
+
+def test_generate_streams_ndjson_and_sse(monkeypatch: pytest.MonkeyPatch) -> None:
+    with serve(monkeypatch) as (client, _):
+        response = client.post("/ollama/generate", json={"prompt": "hi", "stream": True})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        chunks = [json.loads(line) for line in response.text.splitlines()]
+        assert "".join(chunk.get("response", "") for chunk in chunks) == "tok0 tok1 tok2 "
+        assert chunks[-1]["done"] is True
+
+        response = client.post(
+            "/ollama/chat",
+            json={"messages": [{"role": "user", "content": "hi"}], "stream": True},
+            headers={"accept": "text/event-stream"},
+        )
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [frame for frame in response.text.split("\n\n") if frame]
+        assert all(frame.startswith("data: ") for frame in events)
+        assert json.loads(events[-1][len("data: ") :])["done"] is True
+
+
+def test_stream_failures_before_the_first_chunk_are_bad_gateway(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    with serve(monkeypatch) as (client, _):
+        response = client.post(
+            "/ollama/generate", json={"model": "missing", "prompt": "hi", "stream": True}
+        )
+        assert response.status_code == 502
+        # The admission slot taken for the stream is given back.
+        assert client.get("/ollama/admission").json()["missing"]["inflight"] == 0
+
+
+def test_session_turns_carry_the_returned_context(monkeypatch: pytest.MonkeyPatch) -> None:
+    with serve(monkeypatch) as (client, fake):
+        session = client.post("/ollama/sessions", json={"system": "be brief"}).json()
+        turns = f"/ollama/sessions/{session['id']}/turns"
+        for content in ("hi", "again"):
+            response = client.post(turns, json={"content": content})
+            assert response.status_code == 200
+            assert response.json()["message"]["content"] == "tok0 tok1 tok2 "
+        assert fake.state.requests == 2
+
+        stored = client.get(f"/ollama/sessions/{session['id']}").json()
+        assert [m["role"] for m in stored["messages"]] == ["user", "assistant"] * 2
+        # The fake daemon appends a token per generated token to the context.
+        sessions = client.app.state.chat_sessions  # type: ignore[attr-defined]
+        assert len(sessions.get(session["id"]).context) == 6
+
+        assert client.delete(f"/ollama/sessions/{session['id']}").status_code == 204
+        assert client.post(turns, json={"content": "gone"}).status_code == 404
+
+
+def test_request_timeout_header_bounds_an_upstream_call(monkeypatch: pytest.MonkeyPatch) -> None:
+    with serve(monkeypatch, token_latency_ms=1000) as (client, _):
+        response = client.post(
+            "/ollama/generate", json={"prompt": "hi"}, headers={"X-Request-Timeout": "0.1"}
+        )
+        assert response.status_code == 504
+        model = get_settings().ollama_model
+        # The cancelled call gave its admission slot back.
+        assert client.get("/ollama/admission").json()[model]["inflight"] == 0
+
+
+def test_indexed_documents_are_searchable_and_reuse_cached_vectors(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    with serve(monkeypatch) as (client, fake):
+        documents = [
+            {"id": "a", "text": "the cat sat"},
+            {"id": "b", "text": "stock prices fell", "metadata": {"topic": "markets"}},
+            {"id": "c", "text": "a recipe for bread"},
+        ]
+        body = client.post("/ollama/index", json={"documents": documents}).json()
+        assert (body["added"], body["updated"], body["cached"], body["size"]) == (3, 0, 0, 3)
+
+        # The fake daemon's vectors are seeded by the text, so a repeat is an exact match.
+        hits = client.post("/ollama/search", json={"query": "stock prices fell", "k": 2}).json()
+        assert hits["exact"] is True
+        assert hits["hits"][0]["id"] == "b"
+        assert hits["hits"][0]["score"] == pytest.approx(1.0, abs=1e-4)
+        assert hits["hits"][0]["metadata"] == {"topic": "markets"}
+
+        requests = fake.state.requests
+        body = client.post("/ollama/index", json={"documents": documents}).json()
+        assert (body["added"], body["updated"], body["cached"]) == (0, 3, 3)
+        assert fake.state.requests == requests
@@ -0,0 +1,102 @@
+import asyncio
+from typing import Any, Dict
+
+import pytest
+
+from app.services.ollama_cache import ResponseCache, cache_key, is_cacheable
+
+
+def test_only_deterministic_options_are_cacheable() -> None:
+    assert is_cacheable({"temperature": 0})
+    assert is_cacheable({"seed": 7, "temperature": 0.8})
+    assert not is_cacheable({"temperature": 0.8})
+    assert not is_cacheable(None)
+    assert cache_key("/api/chat", {"a": 1, "b": 2}) == cache_key("/api/chat", {"b": 2, "a": 1})
+
+
+def test_concurrent_identical_calls_share_one_upstream_request() -> None:
+    async def scenario() -> None:
+        cache = ResponseCache()
+        calls = 0
+
+        async def call() -> Dict[str, Any]:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"response": "hi"}
+
+        results = await asyncio.gather(*(cache.get_or_call("k", call) for _ in range(5)))
+        assert results == [{"response": "hi"}] * 5
+        assert await cache.get_or_call("k", call) == {"response": "hi"}
+        assert calls == 1
+        stats = cache.stats()
+        assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 4, 1)
+
+    asyncio.run(scenario())
+
+
+def test_shared_call_is_cancelled_once_the_last_waiter_leaves() -> None:
+    async def scenario() -> None:
+        cache = ResponseCache()
+        cancelled = asyncio.Event()
+
+        async def call() -> Dict[str, Any]:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return {}
+
+        first = asyncio.ensure_future(cache.get_or_call("k", call))
+        second = asyncio.ensure_future(cache.get_or_call("k", call))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled.is_set()  # The second caller still waits on it.
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert cache.stats()["inflight"] == 0
+
+        async def quick() -> Dict[str, Any]:
+            return {"response": "fresh"}
+
+        assert await cache.get_or_call("k", quick) == {"response": "fresh"}
+
+    asyncio.run(scenario())
+
+
+def test_each_caller_keeps_its_own_timeout() -> None:
+    async def scenario() -> None:
+        cache = ResponseCache()
+
+        async def call() -> Dict[str, Any]:
+            await asyncio.sleep(0.2)
+            return {"response": "slow"}
+
+        patient = asyncio.ensure_future(cache.get_or_call("k", call, 5))
+        with pytest.raises(asyncio.TimeoutError):
+            await cache.get_or_call("k", call, 0.01)
+        assert await patient == {"response": "slow"}
+
+    asyncio.run(scenario())
+
+
+def test_entries_expire_and_are_bounded_by_count() -> None:
+    async def scenario() -> None:
+        cache = ResponseCache(max_entries=2, ttl_seconds=0.05)
+        for key in ("a", "b", "c"):
+            await cache.get_or_call(key, lambda: asyncio.sleep(0, {"k": key}))
+        assert cache.stats()["entries"] == 2
+        assert cache.stats()["evictions"] == 1
+        await asyncio.sleep(0.06)
+        calls = []
+
+        async def call() -> Dict[str, Any]:
+            calls.append(1)
+            return {}
+
+        await cache.get_or_call("c", call)
+        assert calls == [1]
+
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.ollama_cache import ResponseCache
+from app.services.ollama_client import OllamaClient, OllamaResponseError
+from scripts.fake_ollama import create_fake_app
+
+
+def test_metric_label_only_names_models_known_upstream() -> None:
+    async def scenario() -> None:
+        client = OllamaClient("http://127.0.0.1:9", known_models=["llama3"])
+        try:
+            assert client.metric_label("llama3:latest") == "llama3:latest"
+            assert client.metric_label("made-up-model") == "other"
+            client.pool.backends[0].available_models.add("phi3:latest")
+            assert client.metric_label("phi3") == "phi3"
+            client._mark_served("served:7b")
+            assert client.metric_label("served:7b") == "served:7b"
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def _dead(request: httpx.Request) -> httpx.Response:
+    raise httpx.ConnectError("connection refused", request=request)
+
+
+def _attach(client: OllamaClient, url: str, transport: httpx.AsyncBaseTransport) -> None:
+    for backend in client.pool.backends:
+        if backend.url == url:
+            backend.client = httpx.AsyncClient(transport=transport, base_url=url)
+
+
+def test_streams_fail_over_when_a_backend_refuses_connections() -> None:
+    async def scenario() -> None:
+        client = OllamaClient(["http://dead", "http://live"], health_interval=0)
+        _attach(client, "http://dead", httpx.MockTransport(_dead))
+        fake = create_fake_app(["llama3"], token_latency_ms=0, tokens=3)
+        _attach(client, "http://live", httpx.ASGITransport(fake))
+        # The dead backend looks warm, so it is tried first.
+        client.pool.backends[0].loaded_models.add("llama3:latest")
+        try:
+            chunks = [
+                chunk async for chunk in client.stream_generate(model="llama3", prompt="hi")
+            ]
+            assert chunks[-1]["done"] is True
+            assert "".join(chunk.get("response", "") for chunk in chunks) == "tok0 tok1 tok2 "
+            assert client.pool.backends[0].failures == 1
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_a_non_json_success_body_is_an_upstream_error() -> None:
+    async def scenario() -> None:
+        client = OllamaClient("http://garbled", health_interval=0)
+        _attach(
+            client,
+            "http://garbled",
+            httpx.MockTransport(lambda request: httpx.Response(200, text="<html>proxy</html>")),
+        )
+        try:
+            with pytest.raises(OllamaResponseError):
+                await client.generate(model="llama3", prompt="hi")
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_repeated_deterministic_requests_reach_ollama_once() -> None:
+    async def scenario() -> None:
+        client = OllamaClient("http://cached", health_interval=0, cache=ResponseCache())
+        fake = create_fake_app(["llama3"], token_latency_ms=5, tokens=3)
+        _attach(client, "http://cached", httpx.ASGITransport(fake))
+        request = {"model": "llama3", "prompt": "hi", "options": {"temperature": 0}}
+        try:
+            replies = await asyncio.gather(*(client.generate(**request) for _ in range(4)))
+            assert await client.generate(**request) == replies[0]
+            assert fake.state.requests == 1
+            await client.generate(model="llama3", prompt="hi", options={"temperature": 0.7})
+            assert fake.state.requests == 2
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import httpx
+
+from app.services.ollama_client import OllamaClient
+from app.services.ollama_pool import BackendPool
+from scripts.fake_ollama import create_fake_app
+
+
+def _fake(pool: BackendPool, url: str, **options: float) -> None:
+    fake = create_fake_app(["llama3", "phi3"], **{"token_latency_ms": 0, "tokens": 1, **options})
+    for backend in pool.backends:
+        if backend.url == url:
+            backend.client = httpx.AsyncClient(transport=httpx.ASGITransport(fake), base_url=url)
+
+
+def _refuse(request: httpx.Request) -> httpx.Response:
+    raise httpx.ConnectError("connection refused", request=request)
+
+
+def test_routes_to_warm_idle_backends_that_have_the_model() -> None:
+    async def scenario() -> None:
+        pool = BackendPool(["http://a", "http://b"], health_interval=0)
+        a, b = pool.backends
+        try:
+            for url in ("http://a", "http://b"):
+                _fake(pool, url)
+            await asyncio.gather(*(pool.check(backend) for backend in pool.backends))
+            assert a.available_models == {"llama3:latest", "phi3:latest"}
+
+            a.loaded_models = {"llama3:latest"}
+            assert pool.choose("llama3") is a
+            assert pool.choose("phi3", exclude=[a]) is b
+            assert pool.choose("llama3", prefer="http://b/") is b
+
+            # Busy beats cold only once the queue outweighs a model load.
+            a.inflight = 1
+            assert pool.choose("llama3") is a
+            a.inflight = 3
+            assert pool.choose("llama3") is b
+
+            a.inflight = 0
+            b.available_models = {"llama3:latest", "mistral:latest"}
+            a.available_models = {"llama3:latest"}
+            assert pool.choose("mistral") is b
+        finally:
+            await pool.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_failing_backends_are_ejected_and_readmitted_by_a_probe() -> None:
+    async def scenario() -> None:
+        pool = BackendPool(["http://a", "http://b"], health_interval=0, eject_after=2)
+        a, b = pool.backends
+        a.client = httpx.AsyncClient(transport=httpx.MockTransport(_refuse), base_url=a.url)
+        _fake(pool, "http://b")
+        try:
+            await pool.check(a)
+            assert a.healthy
+            await pool.check(a)
+            assert not a.healthy
+            assert all(pool.choose("llama3") is b for _ in range(10))
+
+            # Everything down still routes somewhere rather than refusing.
+            b.healthy = False
+            assert pool.choose("llama3") in (a, b)
+
+            _fake(pool, "http://a")
+            await pool.check(a)
+            assert a.healthy and a.failures == 0
+        finally:
+            await pool.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_hedged_request_is_answered_by_the_faster_backend() -> None:
+    async def scenario() -> None:
+        client = OllamaClient(["http://slow", "http://fast"], health_interval=0, hedge_delay=0.05)
+        slow, fast = client.pool.backends
+        _fake(client.pool, "http://slow", token_latency_ms=1000)
+        _fake(client.pool, "http://fast")
+        slow.loaded_models = {"llama3:latest"}
+        try:
+            started = time.monotonic()
+            # Only deterministic requests are hedged.
+            reply = await client.generate(model="llama3", prompt="hi", options={"temperature": 0})
+            assert reply["done"] is True
+            assert time.monotonic() - started < 0.5
+            await asyncio.sleep(0)
+            # The losing request is cancelled, so the slow backend is idle again.
+            assert slow.inflight == 0 and fast.inflight == 0
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
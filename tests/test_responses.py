@@ -0,0 +1,121 @@
+import json
+from typing import List, Sequence
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.responses as responses
+import app.services.yolo_backends as yolo_backends
+from app.config import Settings
+from app.main import create_app
+from app.schemas.yolo import (
+    BatchDetectionItem,
+    ColumnarDetectionResponse,
+    Detection,
+    DetectionResponse,
+)
+from app.services.responses import FastJSONResponse, dumps, loads, model_response
+from app.services.yolo_runner import Detections
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> str:
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(responses, "orjson", None)
+    return request.param
+
+
+def test_numpy_values_encode_like_their_python_equivalents(encoder: str) -> None:
+    boxes = np.arange(12, dtype=np.float32).reshape(3, 4)
+    content = {
+        "boxes": boxes,
+        "column": boxes[:, 1],  # Not contiguous.
+        "scores": np.array([0.5, 0.25], dtype=np.float32),
+        "count": np.int64(3),
+        "label": "café",
+    }
+    decoded = json.loads(dumps(content))
+    assert decoded == {
+        "boxes": boxes.tolist(),
+        "column": [1.0, 5.0, 9.0],
+        "scores": [0.5, 0.25],
+        "count": 3,
+        "label": "café",
+    }
+    assert loads(dumps(content)) == decoded
+    assert FastJSONResponse(content).body == dumps(content)
+
+    with pytest.raises(TypeError):
+        dumps({"unknown": object()})
+
+
+def test_model_response_matches_the_validated_model() -> None:
+    item = BatchDetectionItem(
+        index=0,
+        filename="a.png",
+        model="m.pt",
+        confidence=0.3,
+        detections=[Detection(label="car", confidence=0.9, box=[0, 0, 4, 4])],
+    )
+    response = model_response(item, status_code=201)
+    assert response.status_code == 201
+    assert response.media_type == "application/json"
+    assert BatchDetectionItem.model_validate_json(response.body) == item
+
+
+def test_loads_reads_wire_bytes_and_text() -> None:
+    assert loads(b'{"x": [1, 2]}') == loads('{"x": [1, 2]}') == {"x": [1, 2]}
+
+
+class OneCar:
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]:
+        return [
+            Detections(
+                labels=np.array(["car"], dtype=object),
+                scores=np.array([0.9], dtype=np.float32),
+                boxes=np.array([[0, 0, 4, 4]], dtype=np.float32),
+            )
+            for _ in images
+        ]
+
+    def memory_bytes(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+def test_directly_encoded_bodies_match_the_documented_models(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(yolo_backends, "create_backend", lambda *a, **k: OneCar())
+    app = create_app(
+        Settings(
+            enable_ollama=False,
+            enable_jobs=False,
+            warmup_on_startup=False,
+            yolo_cache_max_bytes=0,
+        )
+    )
+    image = cv2.imencode(".png", np.zeros((16, 16, 3), dtype=np.uint8))[1].tobytes()
+    with TestClient(app) as client:
+        response = client.post("/yolo/detect", files={"file": ("a.png", image)})
+        DetectionResponse.model_validate_json(response.content)
+        columnar = client.post(
+            "/yolo/detect", params={"format": "columnar"}, files={"file": ("a.png", image)}
+        )
+        ColumnarDetectionResponse.model_validate_json(columnar.content)
+
+        response = client.post(
+            "/yolo/detect/batch", files=[("files", ("a.png", image)), ("files", ("b.png", image))]
+        )
+        items = [BatchDetectionItem.model_validate_json(line) for line in response.iter_lines()]
+        assert [item.filename for item in items] == ["a.png", "b.png"]
+
+        documented = client.get("/openapi.json").json()["paths"]["/yolo/detect/batch"]
+        content = documented["post"]["responses"]["200"]["content"]
+        assert content["application/x-ndjson"]["schema"]["title"] == "BatchDetectionItem"
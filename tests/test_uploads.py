@@ -0,0 +1,72 @@
+from typing import Annotated, Iterator
+
+from fastapi import FastAPI, File, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from app.services.uploads import MaxBodySizeMiddleware, upload_buffer
+
+LIMIT = 64 * 1024
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(MaxBodySizeMiddleware, max_bytes=LIMIT)
+
+    @app.post("/upload")
+    async def upload(file: Annotated[UploadFile, File()]) -> dict:
+        with upload_buffer(file) as data:
+            return {"size": len(data), "head": bytes(data[:4]).decode()}
+
+    @app.post("/raw")
+    async def raw(request: Request) -> dict:
+        return {"size": len(await request.body())}
+
+    return TestClient(app)
+
+
+def _chunks(total: int, size: int = 8192) -> Iterator[bytes]:
+    for start in range(0, total, size):
+        yield b"x" * min(size, total - start)
+
+
+def test_body_within_the_limit_is_accepted() -> None:
+    client = _client()
+    response = client.post("/upload", files={"file": ("a.bin", b"head" + b"\0" * 1000)})
+    assert response.status_code == 200
+    assert response.json() == {"size": 1004, "head": "head"}
+    assert client.post("/raw", content=_chunks(LIMIT)).json() == {"size": LIMIT}
+
+
+def test_oversized_body_with_content_length_is_rejected() -> None:
+    response = _client().post("/upload", files={"file": ("a.bin", b"\0" * (LIMIT + 1))})
+    assert response.status_code == 413
+    assert "byte limit" in response.json()["detail"]
+
+
+def test_oversized_chunked_body_is_rejected() -> None:
+    client = _client()
+    for path in ("/raw", "/upload"):
+        response = client.post(
+            path,
+            content=_chunks(LIMIT * 4),
+            headers={"content-type": "multipart/form-data; boundary=x"},
+        )
+        assert "content-length" not in response.request.headers
+        assert response.status_code == 413
+        assert "byte limit" in response.json()["detail"]
+
+
+def test_large_uploads_are_mapped_from_disk() -> None:
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: Annotated[UploadFile, File()]) -> dict:
+        with upload_buffer(file) as data:
+            tail = bytes(data[-4:]).decode()
+            return {"type": type(data).__name__, "size": len(data), "tail": tail}
+
+    size = 3 * 1024 * 1024
+    response = TestClient(app).post(
+        "/upload", files={"file": ("a.bin", b"\0" * (size - 4) + b"tail")}
+    )
+    assert response.json() == {"type": "memoryview", "size": size, "tail": "tail"}
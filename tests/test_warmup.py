@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+from typing import List, Sequence
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.yolo_backends as yolo_backends
+from app.config import Settings
+from app.main import create_app
+from app.services.warmup import WarmupReport, warm_up
+from app.services.yolo_runner import Detections
+
+
+class GatedBackend:
+    """Blocks every forward pass until ``gate`` is set and records input shapes."""
+
+    def __init__(self, gate: threading.Event) -> None:
+        self.gate = gate
+        self.shapes: List[tuple] = []
+
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]:
+        self.gate.wait(5)
+        self.shapes.extend(image.shape[:2] for image in images)
+        return [Detections.empty() for _ in images]
+
+    def memory_bytes(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+def test_ready_turns_green_only_after_warm_up(monkeypatch: pytest.MonkeyPatch) -> None:
+    gate = threading.Event()
+    backend = GatedBackend(gate)
+    monkeypatch.setattr(yolo_backends, "create_backend", lambda *a, **k: backend)
+    app = create_app(
+        Settings(
+            enable_ollama=False,
+            enable_jobs=False,
+            warmup_on_startup=True,
+            yolo_warmup_sizes="32x48",
+            yolo_cache_max_bytes=0,
+        )
+    )
+    with TestClient(app) as client:
+        try:
+            assert client.get("/hello").status_code == 200
+            response = client.get("/ready")
+            assert response.status_code == 503
+            assert response.json()["ready"] is False
+        finally:
+            gate.set()
+        deadline = time.monotonic() + 5
+        while (response := client.get("/ready")).status_code != 200:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    steps = response.json()["steps"]
+    assert set(steps) == {"yolo_load", "yolo_infer_32x48"}
+    assert all(step["ok"] for step in steps.values())
+    assert backend.shapes == [(48, 32)]  # WIDTHxHEIGHT, so 48 rows of 32
+
+
+def test_failed_steps_are_reported_without_blocking_readiness() -> None:
+    class Unreachable:
+        async def preload(self, **kwargs: object) -> None:
+            raise ConnectionError("ollama is down")
+
+    report = WarmupReport()
+    asyncio.run(warm_up(report, ollama=Unreachable(), ollama_model="m"))  # type: ignore[arg-type]
+    assert report.ready
+    assert report.steps["ollama_preload_m"]["ok"] is False
+    assert "ollama is down" in report.steps["ollama_preload_m"]["error"]
@@ -0,0 +1,77 @@
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.yolo_backends import batched_nms, create_backend, letterbox, nms, unletterbox
+
+
+def test_nms_keeps_highest_score_first_and_suppresses_overlaps() -> None:
+    boxes = np.array(
+        [
+            [0, 0, 10, 10],
+            [1, 1, 11, 11],  # IoU ~0.68 with the first
+            [50, 50, 60, 60],
+            [0, 0, 10, 9],  # IoU 0.9 with the first
+        ],
+        dtype=np.float32,
+    )
+    scores = np.array([0.6, 0.9, 0.7, 0.5], dtype=np.float32)
+    assert nms(boxes, scores, 0.5).tolist() == [1, 2]
+    # Looser threshold: only the near-duplicate of the top box is dropped.
+    assert nms(boxes, scores, 0.8).tolist() == [1, 2, 0]
+    assert nms(boxes, scores, 0.5, max_det=1).tolist() == [1]
+    assert nms(np.empty((0, 4), np.float32), np.empty(0, np.float32), 0.5).size == 0
+
+
+def test_batched_nms_only_suppresses_within_a_class() -> None:
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [0, 0, 10, 10]], dtype=np.float32)
+    scores = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+    class_ids = np.array([0, 0, 1])
+    assert batched_nms(boxes, scores, class_ids, 0.5).tolist() == [0, 2]
+
+
+@pytest.mark.parametrize("shape", [(480, 640), (640, 480), (100, 1000), (640, 640)])
+def test_letterbox_round_trip(shape: tuple) -> None:
+    height, width = shape
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    original = np.array([[width * 0.25, height * 0.3, width * 0.6, height * 0.8]])
+    x1, y1, x2, y2 = original[0].astype(int)
+    image[y1:y2, x1:x2] = 255
+
+    canvas, ratio, pad = letterbox(image, 320)
+    assert canvas.shape == (320, 320, 3)
+
+    ys, xs = np.nonzero(canvas[..., 0] > 200)
+    found = np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]], dtype=np.float64)
+    restored = unletterbox(found, ratio, pad, (height, width))
+    np.testing.assert_allclose(restored, original, atol=1.5 / ratio)
+
+    projected = original * ratio + np.array([pad[0], pad[1], pad[0], pad[1]])
+    np.testing.assert_allclose(unletterbox(projected, ratio, pad, shape), original, atol=1e-6)
+
+
+def test_unletterbox_clips_to_the_image() -> None:
+    boxes = np.array([[-20.0, -20.0, 400.0, 400.0]])
+    restored = unletterbox(boxes, 0.5, (0, 80), (320, 640))
+    assert restored.tolist() == [[0.0, 0.0, 640.0, 320.0]]
+
+
+def test_openvino_without_its_provider_fails_instead_of_running_on_cpu(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fake = SimpleNamespace(
+        SessionOptions=lambda: SimpleNamespace(),
+        GraphOptimizationLevel=SimpleNamespace(ORT_ENABLE_ALL=99),
+        get_available_providers=lambda: ["CPUExecutionProvider"],
+    )
+    monkeypatch.setitem(sys.modules, "onnxruntime", fake)
+    with pytest.raises(RuntimeError, match="onnxruntime-openvino"):
+        create_backend("openvino", "model.onnx")
+
+
+def test_missing_onnxruntime_names_the_optional_package(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(sys.modules, "onnxruntime", None)
+    with pytest.raises(RuntimeError, match="optional onnxruntime"):
+        create_backend("onnxruntime", "model.onnx")
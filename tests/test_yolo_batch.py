@@ -0,0 +1,52 @@
+import io
+import tarfile
+import zipfile
+from typing import Dict
+
+from app.services.yolo_batch import ArchiveLimitError, iter_images
+
+
+def _zip(files: Dict[str, bytes]) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def _tar(files: Dict[str, bytes]) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return buffer
+
+
+def test_oversized_archive_member_is_reported_and_skipped() -> None:
+    files = {"a.jpg": b"a" * 10, "big.jpg": b"\0" * 1000, "b.png": b"b" * 10}
+    for name, archive in (("in.zip", _zip(files)), ("in.tar.gz", _tar(files))):
+        out = list(iter_images([(name, archive)], max_member_bytes=100))
+        assert [item for item, _ in out] == [f"{name}/a.jpg", f"{name}/big.jpg", f"{name}/b.png"]
+        assert out[0][1] == b"a" * 10
+        assert isinstance(out[1][1], ArchiveLimitError)
+        assert out[2][1] == b"b" * 10
+
+
+def test_total_limit_stops_expansion_across_archives() -> None:
+    first = _zip({"a.jpg": b"a" * 60, "skip.txt": b"x" * 500})
+    second = _tar({"b.jpg": b"b" * 60, "c.jpg": b"c" * 10})
+    out = list(
+        iter_images([("one.zip", first), ("two.tar.gz", second)], max_total_bytes=100)
+    )
+    assert [name for name, _ in out] == ["one.zip/a.jpg", "two.tar.gz/b.jpg"]
+    assert out[0][1] == b"a" * 60
+    assert isinstance(out[1][1], ArchiveLimitError)
+
+
+def test_plain_files_pass_through() -> None:
+    out = list(iter_images([("x.jpg", io.BytesIO(b"img"))], max_total_bytes=1))
+    assert out == [("x.jpg", b"img")]
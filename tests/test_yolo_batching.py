@@ -0,0 +1,101 @@
+import asyncio
+from typing import List, Sequence, Tuple
+
+import cv2
+import numpy as np
+import pytest
+
+from app.services.inference_pool import InferencePool
+from app.services.yolo_runner import BatchScheduler, Detections, YoloRunner
+
+
+class CountingBackend:
+    """Finds one box scored 0.6 per image and records each batch's size."""
+
+    def __init__(self) -> None:
+        self.batches: List[int] = []
+
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]:
+        self.batches.append(len(images))
+        return [
+            Detections(
+                labels=np.array(["object"], dtype=object),
+                scores=np.array([0.6], dtype=np.float32),
+                boxes=np.array([[1, 1, 4, 4]], dtype=np.float32),
+            )
+            for _ in images
+        ]
+
+    def memory_bytes(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+IMAGE = cv2.imencode(".png", np.zeros((8, 8, 3), dtype=np.uint8))[1].tobytes()
+
+
+def _scheduler(**options: float) -> Tuple[BatchScheduler, CountingBackend, InferencePool]:
+    backend = CountingBackend()
+    runner = YoloRunner("counting")
+    runner._backend = backend
+    pool = InferencePool(1)
+    return BatchScheduler(runner, pool, **options), backend, pool  # type: ignore[arg-type]
+
+
+def test_concurrent_requests_share_batches_up_to_the_size_limit() -> None:
+    async def scenario() -> None:
+        scheduler, backend, pool = _scheduler(max_batch_size=2, max_wait_ms=50)
+        try:
+            results = await asyncio.gather(*(scheduler.detect(IMAGE) for _ in range(5)))
+            assert [len(result.labels) for result in results] == [1] * 5
+            assert sorted(backend.batches) == [1, 2, 2]
+            stats = scheduler.stats()
+            assert (stats["batches"], stats["images"]) == (3, 5)
+        finally:
+            await scheduler.stop()
+            pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_each_image_keeps_its_own_confidence_and_decode_failure() -> None:
+    async def scenario() -> None:
+        scheduler, backend, pool = _scheduler(max_batch_size=8, max_wait_ms=50)
+        try:
+            low, high, broken = await asyncio.gather(
+                scheduler.detect(IMAGE, 0.5),
+                scheduler.detect(IMAGE, 0.9),
+                scheduler.detect(b"not an image"),
+                return_exceptions=True,
+            )
+            assert backend.batches == [2]
+            assert len(low.labels) == 1  # type: ignore[union-attr]
+            assert len(high.labels) == 0  # type: ignore[union-attr]
+            assert isinstance(broken, ValueError)
+        finally:
+            await scheduler.stop()
+            pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_requests_are_dropped_before_inference() -> None:
+    async def scenario() -> None:
+        scheduler, backend, pool = _scheduler(max_batch_size=8, max_wait_ms=50)
+        try:
+            abandoned = asyncio.ensure_future(scheduler.detect(IMAGE))
+            kept = asyncio.ensure_future(scheduler.detect(IMAGE))
+            await asyncio.sleep(0.01)
+            abandoned.cancel()
+            assert len((await kept).labels) == 1
+            assert backend.batches == [1]
+            assert scheduler.stats()["dropped"] == 1
+            with pytest.raises(asyncio.CancelledError):
+                await abandoned
+        finally:
+            await scheduler.stop()
+            pool.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,100 @@
+from types import SimpleNamespace
+from typing import List, Sequence
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.yolo_backends as yolo_backends
+from app.config import Settings
+from app.main import create_app
+from app.services.yolo_runner import Detections
+
+
+class TensorStandIn:
+    """Just enough of a torch tensor for ``Detections.from_result``."""
+
+    def __init__(self, data: np.ndarray) -> None:
+        self.data = data
+
+    def cpu(self) -> "TensorStandIn":
+        return self
+
+    def numpy(self) -> np.ndarray:
+        return self.data
+
+
+class BoxesStandIn:
+    def __init__(self, rows: List[List[float]]) -> None:
+        self.data = TensorStandIn(np.array(rows, dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.data.data)
+
+
+def _result(rows: List[List[float]]) -> SimpleNamespace:
+    return SimpleNamespace(boxes=BoxesStandIn(rows), names={0: "person", 2: "car"})
+
+
+def test_from_result_maps_rows_to_columns() -> None:
+    detections = Detections.from_result(
+        _result([[0, 0, 10, 10, 0.9, 2], [5, 5, 20, 20, 0.4, 0], [1, 1, 2, 2, 0.7, 1]])
+    )
+    assert detections.labels.tolist() == ["car", "person", "1"]
+    assert detections.scores.tolist() == pytest.approx([0.9, 0.4, 0.7])
+    assert detections.boxes.shape == (3, 4)
+    assert detections.track_ids is None
+
+    tracked = Detections.from_result(_result([[0, 0, 10, 10, 42, 0.9, 0]]))
+    assert tracked.track_ids is not None and tracked.track_ids.tolist() == [42]
+
+    kept = detections.filter(0.5)
+    assert kept.labels.tolist() == ["car", "1"]
+    assert kept.to_dicts()[0] == {
+        "label": "car",
+        "confidence": pytest.approx(0.9),
+        "box": [0.0, 0.0, 10.0, 10.0],
+    }
+
+
+class TwoObjects:
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]:
+        return [
+            Detections(
+                labels=np.array(["car", "person"], dtype=object),
+                scores=np.array([0.9, 0.5], dtype=np.float32),
+                boxes=np.array([[0, 0, 4, 4], [2, 2, 6, 6]], dtype=np.float32),
+            ).filter(confidence)
+            for _ in images
+        ]
+
+    def memory_bytes(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+def test_columnar_format_carries_the_same_detections(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(yolo_backends, "create_backend", lambda *a, **k: TwoObjects())
+    app = create_app(
+        Settings(
+            enable_ollama=False,
+            enable_jobs=False,
+            warmup_on_startup=False,
+            yolo_cache_max_bytes=0,
+        )
+    )
+    image = cv2.imencode(".png", np.zeros((16, 16, 3), dtype=np.uint8))[1].tobytes()
+    with TestClient(app) as client:
+        rows = client.post("/yolo/detect", files={"file": ("a.png", image)}).json()
+        columns = client.post(
+            "/yolo/detect", params={"format": "columnar"}, files={"file": ("a.png", image)}
+        ).json()
+
+    assert "detections" not in columns
+    assert columns["labels"] == [row["label"] for row in rows["detections"]]
+    assert columns["scores"] == pytest.approx([row["confidence"] for row in rows["detections"]])
+    assert columns["boxes"] == [row["box"] for row in rows["detections"]]
+    assert columns["labels"] == ["car", "person"]
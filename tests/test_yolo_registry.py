@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from app.services.inference_pool import InferencePool
+from app.services.yolo_registry import UnknownModelError, YoloRegistry
+
+
+def test_only_the_default_model_is_allowed_unless_configured() -> None:
+    async def scenario() -> None:
+        pool = InferencePool(1)
+        try:
+            registry = YoloRegistry(pool, default_model="a.pt")
+            with pytest.raises(UnknownModelError):
+                await registry.get("../../elsewhere.pt")
+            registry = YoloRegistry(pool, default_model="a.pt", allowed=["b.pt"])
+            with pytest.raises(UnknownModelError):
+                await registry.get("c.pt")
+        finally:
+            pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_metric_label_folds_unvalidated_names() -> None:
+    pool = InferencePool(1)
+    try:
+        registry = YoloRegistry(pool, default_model="a.pt", allowed=["b.pt"])
+        assert registry.metric_label(None) == "a.pt"
+        assert registry.metric_label("b.pt") == "b.pt"
+        assert registry.metric_label("../../elsewhere.pt") == "other"
+        wildcard = YoloRegistry(pool, default_model="a.pt", allowed=None)
+        assert wildcard.metric_label("x.pt") == "other"
+    finally:
+        pool.shutdown()
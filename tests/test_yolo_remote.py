@@ -0,0 +1,150 @@
+import os
+import stat
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from pathlib import Path
+from typing import List, Sequence
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.yolo_backends as yolo_backends
+from app.config import Settings
+from app.main import create_app
+from app.services.cancellation import abandon_when
+from app.services.metrics import YOLO_ERRORS
+from app.services.yolo_remote import InferenceServer, RemoteClient, RemoteInferenceError
+from app.services.yolo_runner import Detections
+
+KEY = b"secret"
+
+
+class SlowBackend:
+    """Sleeps ``delay`` seconds per forward pass and reports 100 bytes of weights."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.closed = False
+
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]:
+        time.sleep(self.delay)
+        return [Detections.empty() for _ in images]
+
+    def memory_bytes(self) -> int:
+        return 100
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _serve(server: InferenceServer) -> None:
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    deadline = time.monotonic() + 5
+    while not os.path.exists(server.address):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_socket_is_private_and_needs_the_authkey(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(yolo_backends, "create_backend", lambda *a, **k: SlowBackend())
+    address = str(tmp_path / "inference.sock")
+    _serve(InferenceServer(address, authkey=KEY, confidence=0.3))
+    assert stat.S_IMODE(os.stat(address).st_mode) == 0o600
+
+    with pytest.raises(AuthenticationError):
+        Client(address, family="AF_UNIX", authkey=b"wrong")
+
+    client = RemoteClient(address, authkey=KEY, slots=2, slot_bytes=1024)
+    try:
+        out = client.predict("m.pt", [np.zeros((8, 8, 3), np.uint8)], 0.3)
+        assert len(out) == 1
+    finally:
+        client.close()
+
+
+def test_predict_gives_up_at_its_timeout_or_when_abandoned(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(yolo_backends, "create_backend", lambda *a, **k: SlowBackend(0.5))
+    address = str(tmp_path / "inference.sock")
+    _serve(InferenceServer(address, authkey=KEY, confidence=0.3, max_wait_ms=0))
+    client = RemoteClient(address, authkey=KEY, slots=2, slot_bytes=1024, timeout=0.1)
+    image = np.zeros((8, 8, 3), np.uint8)
+    try:
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            client.predict("m.pt", [image], 0.3)
+        assert time.monotonic() - started < 0.4
+
+        client.timeout = None
+        started = time.monotonic()
+        with abandon_when(lambda: time.monotonic() - started > 0.1):
+            with pytest.raises(TimeoutError):
+                client.predict("m.pt", [image], 0.3)
+        assert time.monotonic() - started < 0.4
+
+        # Cancelled requests are still answered, so their slots come back.
+        time.sleep(1.2)
+        assert sorted(client.ring._free) == [0, 1]
+        assert client.predict("m.pt", [image], 0.3)[0].labels.size == 0
+    finally:
+        client.close()
+
+
+def test_server_unloads_least_recently_used_models_over_budget(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    backends = {}
+
+    def create_backend(kind: str, model: str, **options: object) -> SlowBackend:
+        backends[model] = SlowBackend()
+        return backends[model]
+
+    monkeypatch.setattr(yolo_backends, "create_backend", create_backend)
+    server = InferenceServer(
+        "unused", authkey=KEY, confidence=0.3, default_model="a.pt", max_bytes=350
+    )
+    for model in ("a.pt", "b.pt", "c.pt"):
+        server.runner(model)
+    server.runner("b.pt")
+    server.runner("d.pt")
+    assert list(server._runners) == ["a.pt", "b.pt", "d.pt"]
+    assert backends["c.pt"].closed and not backends["a.pt"].closed
+
+
+class FailingRemote(SlowBackend):
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]:
+        raise RemoteInferenceError("FileNotFoundError: b.pt")
+
+
+def test_remote_inference_failures_are_bad_gateway(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(yolo_backends, "create_backend", lambda *a, **k: FailingRemote())
+    app = create_app(
+        Settings(
+            enable_ollama=False,
+            enable_jobs=False,
+            warmup_on_startup=False,
+            yolo_cache_max_bytes=0,
+        )
+    )
+    image = cv2.imencode(".png", np.zeros((16, 16, 3), dtype=np.uint8))[1].tobytes()
+    before = sum(YOLO_ERRORS._values.values())
+    with TestClient(app) as client:
+        response = client.post("/yolo/detect", files={"file": ("a.png", image)})
+        assert response.status_code == 502
+        assert "b.pt" in response.json()["detail"]
+
+        response = client.post(
+            "/yolo/detect/batch", files=[("files", ("a.png", image)), ("files", ("b.png", image))]
+        )
+        assert response.status_code == 200
+        lines = [line for line in response.text.splitlines() if line]
+        assert len(lines) == 2
+        assert all("b.pt" in line for line in lines)
+    assert sum(YOLO_ERRORS._values.values()) - before == 3
@@ -0,0 +1,96 @@
+from typing import List, Sequence
+
+import numpy as np
+import pytest
+
+from app.services.yolo_runner import Detections, YoloRunner
+from app.services.yolo_tiling import merge_detections, offset_detections, tile_windows
+
+
+class PaintedObjects:
+    """Backend that "detects" each filled rectangle by its pixel value.
+
+    A rectangle cut by a tile edge is reported as the visible part only,
+    like a real model would.
+    """
+
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]:
+        results = []
+        for image in images:
+            values = [value for value in np.unique(image[..., 0]) if value]
+            boxes = []
+            for value in values:
+                ys, xs = np.nonzero(image[..., 0] == value)
+                boxes.append([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1])
+            results.append(
+                Detections(
+                    labels=np.array(["object"] * len(values), dtype=object),
+                    scores=np.full(len(values), 0.9, dtype=np.float32),
+                    boxes=np.array(boxes, dtype=np.float32).reshape(-1, 4),
+                )
+            )
+        return results
+
+    def memory_bytes(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+def _runner() -> YoloRunner:
+    runner = YoloRunner("painted")
+    runner._backend = PaintedObjects()
+    return runner
+
+
+@pytest.mark.parametrize("shape", [(1000, 1500), (641, 1919), (640, 640), (300, 2000)])
+def test_windows_cover_the_edge_remainders(shape: tuple) -> None:
+    height, width = shape
+    windows = tile_windows(height, width, 640, 0.2)
+    covered = np.zeros(shape, dtype=bool)
+    for x0, y0, x1, y1 in windows:
+        assert x1 - x0 <= 640 and y1 - y0 <= 640
+        covered[y0:y1, x0:x1] = True
+    assert covered.all()
+    assert windows[:, 2].max() == width and windows[:, 3].max() == height
+
+
+def test_box_split_across_two_tiles_merges_into_one() -> None:
+    image = np.zeros((640, 1152, 3), dtype=np.uint8)
+    image[300:400, 600:700] = 1  # Straddles the x=640 edge of the first tile.
+    result = _runner().detect_tiled(image, tile_size=640, overlap=0.2)
+    assert len(result) == 1
+    assert result.boxes.tolist() == [[600.0, 300.0, 700.0, 400.0]]
+
+
+@pytest.mark.parametrize("method", ["nms", "wbf"])
+def test_nearby_distinct_objects_stay_separate(method: str) -> None:
+    image = np.zeros((640, 1152, 3), dtype=np.uint8)
+    image[300:400, 560:630] = 1
+    image[300:400, 636:700] = 2  # Six pixels apart, on both sides of the tile edge.
+    result = _runner().detect_tiled(
+        image, tile_size=640, overlap=0.2, merge=method, merge_threshold=0.5
+    )
+    boxes = result.boxes[np.argsort(result.boxes[:, 0])]
+    np.testing.assert_allclose(boxes, [[560, 300, 630, 400], [636, 300, 700, 400]], rtol=1e-5)
+
+
+def test_cut_box_gives_way_to_the_uncut_one() -> None:
+    windows = np.array([[0, 0, 640, 640], [512, 0, 1152, 640]])
+    per_tile = [
+        Detections(
+            labels=np.array(["car"], dtype=object),
+            scores=np.array([0.95], dtype=np.float32),
+            boxes=np.array([[600, 300, 640, 400]], dtype=np.float32),
+        ),
+        Detections(
+            labels=np.array(["car"], dtype=object),
+            scores=np.array([0.6], dtype=np.float32),
+            boxes=np.array([[88, 300, 188, 400]], dtype=np.float32),
+        ),
+    ]
+    labels, scores, boxes, clipped = offset_detections(per_tile, windows, (640, 1152))
+    assert clipped.tolist() == [True, False]
+    merged = merge_detections(labels, scores, boxes, clipped, threshold=0.5)
+    assert merged.boxes.tolist() == [[600.0, 300.0, 700.0, 400.0]]
@@ -0,0 +1,92 @@
+import asyncio
+from pathlib import Path
+from typing import AsyncIterator, List, Sequence
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
+from starlette.types import Message
+
+import app.services.yolo_backends as yolo_backends
+from app.config import Settings
+from app.main import create_app
+from app.routers.yolo import SpooledVideoResponse
+from app.services.yolo_runner import Detections
+
+
+class EmptyBackend:
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]:
+        return [Detections.empty() for _ in images]
+
+    def memory_bytes(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def video(tmp_path: Path) -> bytes:
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 64))
+    for value in range(0, 200, 40):
+        writer.write(np.full((64, 64, 3), value, dtype=np.uint8))
+    writer.release()
+    return Path(path).read_bytes()
+
+
+def _client(monkeypatch: pytest.MonkeyPatch, **settings: object) -> TestClient:
+    monkeypatch.setattr(yolo_backends, "create_backend", lambda *a, **k: EmptyBackend())
+    return TestClient(
+        create_app(
+            Settings(
+                enable_ollama=False, enable_jobs=False, warmup_on_startup=False, **settings
+            )
+        )
+    )
+
+
+def test_frames_are_streamed_and_the_model_released(
+    monkeypatch: pytest.MonkeyPatch, video: bytes
+) -> None:
+    with _client(monkeypatch) as client:
+        response = client.post("/yolo/video?stride=2", files={"file": ("clip.avi", video)})
+        assert response.status_code == 200
+        frames = [line for line in response.text.splitlines() if line]
+        assert len(frames) == 3
+        models = client.app.state.yolo_registry.stats()["models"]
+        assert all(model["active"] == 0 for model in models.values())
+
+
+def test_tracking_is_refused_without_the_ultralytics_backend(
+    monkeypatch: pytest.MonkeyPatch, video: bytes
+) -> None:
+    with _client(monkeypatch, yolo_backend="onnxruntime") as client:
+        response = client.post("/yolo/video?track=bytetrack", files={"file": ("clip.avi", video)})
+        assert response.status_code == 400
+        assert "ultralytics" in response.json()["detail"]
+
+
+def test_spooled_upload_is_removed_even_if_the_body_never_starts(tmp_path: Path) -> None:
+    spooled = tmp_path / "upload.mp4"
+    spooled.write_bytes(b"video")
+    started = []
+
+    async def body() -> AsyncIterator[bytes]:
+        started.append(True)
+        yield b"{}\n"
+
+    async def receive() -> Message:
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        raise OSError("client went away")
+
+    response = SpooledVideoResponse(body(), str(spooled), media_type="application/x-ndjson")
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(response(scope, receive, send))
+    assert not started
+    assert not spooled.exists()
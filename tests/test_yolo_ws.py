@@ -0,0 +1,56 @@
+from typing import List, Sequence
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.yolo_backends as yolo_backends
+from app.config import Settings
+from app.main import create_app
+from app.services.yolo_runner import Detections
+
+
+class FailingBackend:
+    """Answers the first frame, then loses its inference process."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def predict(self, images: Sequence[np.ndarray], confidence: float) -> List[Detections]:
+        self.calls += 1
+        if self.calls > 1:
+            raise ConnectionError("Inference process is not reachable.")
+        return [Detections.empty() for _ in images]
+
+    def memory_bytes(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+def test_backend_failure_sends_an_error_frame_and_releases_the_model(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(yolo_backends, "create_backend", lambda *a, **k: FailingBackend())
+    app = create_app(
+        Settings(
+            enable_ollama=False,
+            enable_jobs=False,
+            warmup_on_startup=False,
+            yolo_cache_max_bytes=0,
+        )
+    )
+    frame = cv2.imencode(".png", np.zeros((32, 32, 3), dtype=np.uint8))[1].tobytes()
+    with TestClient(app) as client:
+        with client.websocket_connect("/yolo/ws") as websocket:
+            websocket.send_bytes(frame)
+            assert websocket.receive_json()["error"] is None
+            websocket.send_bytes(frame)
+            failed = websocket.receive_json()
+            assert failed["frame"] == 1
+            assert "not reachable" in failed["error"]
+            assert websocket.receive()["type"] == "websocket.close"
+        models = app.state.yolo_registry.stats()["models"]
+        assert all(model["active"] == 0 for model in models.values())